@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmark of loaders against local stub server with recorded pages of tests/resources.
+Every loader is run in separate process, results are written as JSON, for example:
+
+    python -m benchmarks.run_benchmark --loaders lenta banki mail --latency 0.01 --error-rate 0.01 -o results.json
+"""
+import io
+import sys
+import json
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from os.path import join
+from time import monotonic, thread_time
+
+from data_loader import AnswerMailRuLoader, BankiRuLoader, HttpClient, LentaRuLoader, __version__
+from benchmarks.stub_server import SITES, BenchmarkServer, get_dates
+
+
+class TimedHttpClient(HttpClient):
+    """ HttpClient, that keeps latencies of all requests """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = []
+
+    async def get(self, url, headers=None, stop=None):
+        start = monotonic()
+        response = await super().get(url, headers=headers, stop=stop)
+        self.latencies.append(monotonic() - start)
+        return response
+
+
+class ParseTimerMixin:
+    """ Counts cpu time of parsing in event loop, time of parse workers is taken from rusage of children """
+
+    parse_cpu_time = 0.0
+
+    async def parse(self, method_name, content, *args):
+        start = thread_time()
+        result = await super().parse(method_name, content, *args)
+        if self.parse_executor is None:
+            self.parse_cpu_time += thread_time() - start
+        return result
+
+
+class BenchmarkLentaRuLoader(ParseTimerMixin, LentaRuLoader):
+    pass
+
+
+class BenchmarkBankiRuLoader(ParseTimerMixin, BankiRuLoader):
+    pass
+
+
+class BenchmarkAnswerMailRuLoader(ParseTimerMixin, AnswerMailRuLoader):
+    pass
+
+
+def percentile(values, q):
+    if not values:
+        return
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def create_loader(name, server, http_client, config, folder):
+    kwargs = dict(
+        save=False,
+        n_processes=config['n_processes'],
+        queue_maxsize=config['queue_maxsize'],
+        http_client=http_client,
+        n_parse_workers=config['n_parse_workers'],
+        fast_parse=True,
+        log_file_path=join(folder, f'{name}.log'),
+    )
+    if name == 'mail':
+        return BenchmarkAnswerMailRuLoader(
+            ids=range(config['ids']), data_folder_path=folder, sub_url=f'{server.host}/question/{{external_id}}',
+            **kwargs
+        )
+
+    loader_cls = BenchmarkLentaRuLoader if name == 'lenta' else BenchmarkBankiRuLoader
+    loader = loader_cls(year=2018, host=server.host, timeout=0, **kwargs)
+    dates = get_dates(server.site.START, config['days'])
+    loader._get_all_dates = lambda: dates
+    return loader
+
+
+async def benchmark(name, config):
+    site = SITES[name](articles_per_day=config['articles_per_day'])
+    server = BenchmarkServer(site, latency=config['latency'], error_rate=config['error_rate'],
+                             page_size=config['page_size'], seed=config['seed'])
+    with tempfile.TemporaryDirectory() as folder:
+        async with server:
+            http_client = TimedHttpClient(limit_per_host=config['n_processes'])
+            loader = create_loader(name, server, http_client, config, folder)
+            start = monotonic()
+            try:
+                await loader.run_async()
+            finally:
+                await http_client.close()
+            seconds = monotonic() - start
+
+    # only completed loads, list of articles has also articles, whose loading failed
+    items = loader.metrics.get('loader_items_total', stage='load', result='done', **loader._labels) or 0
+    pages = server.requests - server.errors
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    p50, p99 = percentile(http_client.latencies, 50), percentile(http_client.latencies, 99)
+    return {
+        'loader': name,
+        'items': items,
+        'requests': server.requests,
+        'errors': server.errors,
+        'pages': pages,
+        'seconds': round(seconds, 4),
+        'pages_per_sec': round(pages / seconds, 2) if seconds else None,
+        'fetch_p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+        'fetch_p99_ms': round(p99 * 1000, 3) if p99 is not None else None,
+        'parse_cpu_sec': round(loader.parse_cpu_time + children.ru_utime + children.ru_stime, 4),
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 2),
+        'workers_peak_rss_mb': round(children.ru_maxrss / 1024, 2),
+    }
+
+
+def run_scenario(name, config):
+    """ Runs benchmark of one loader, it is executed in separate process, so rusage belongs only to it """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with redirect_stdout(io.StringIO()):
+            return loop.run_until_complete(benchmark(name, config))
+    finally:
+        loop.close()
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='Offline benchmark of loaders.')
+    parser.add_argument('--loaders', nargs='+', choices=sorted(SITES), default=['lenta', 'banki', 'mail'])
+    parser.add_argument('--latency', type=float, default=0.0, help='delay of stub server in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='part of responses with status 503')
+    parser.add_argument('--page-size', type=int, default=0, help='min size of page in bytes')
+    parser.add_argument('--seed', type=int, default=0, help='seed of errors')
+    parser.add_argument('--days', type=int, default=5, help='count of days for article loaders')
+    parser.add_argument('--articles-per-day', type=int, default=20, help='count of articles on generated day page')
+    parser.add_argument('--ids', type=int, default=500, help='count of ids for AnswerMailRuLoader')
+    parser.add_argument('--n-processes', type=int, default=10)
+    parser.add_argument('--queue-maxsize', type=int, default=100)
+    parser.add_argument('--n-parse-workers', type=int, default=0)
+    parser.add_argument('-o', '--output', help='path of JSON file with results, default - stdout')
+    return parser
+
+
+def main(argv=None):
+    config = vars(get_parser().parse_args(argv))
+    output = config.pop('output')
+    results = []
+    for name in config['loaders']:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_scenario, name, config).result()
+        print(f'{name}: {result["pages_per_sec"]} pages/sec, p50 {result["fetch_p50_ms"]} ms, '
+              f'p99 {result["fetch_p99_ms"]} ms, parse {result["parse_cpu_sec"]} s, rss {result["peak_rss_mb"]} MB',
+              file=sys.stderr)
+        results.append(result)
+
+    report = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'config': config,
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
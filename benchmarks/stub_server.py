@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import random
+import tarfile
+import zlib
+from datetime import datetime, timedelta
+from os.path import abspath, basename, dirname, exists, join
+
+from aiohttp import web
+
+
+RESOURCES = join(dirname(dirname(abspath(__file__))), 'tests', 'resources')
+
+WORDS = (
+    'market bank rate credit deposit client news report year price oil ruble dollar government company share '
+    'growth index percent analyst economy region city court law project contract budget tax'
+).split()
+
+
+def get_text(seed, n_words):
+    """ :return: deterministic text from WORDS """
+    return ' '.join(WORDS[(seed * 7 + i * 13) % len(WORDS)] for i in range(n_words))
+
+
+def get_dates(start, days):
+    """ :return: list of [day, month, year] for "days" days from "start" ('YYYY-MM-DD'), like _get_all_dates """
+    start = datetime.strptime(start, '%Y-%m-%d')
+    dates = []
+    for i in range(days):
+        date = start + timedelta(days=i)
+        dates.append([str(date.day).zfill(2), str(date.month).zfill(2), str(date.year)])
+    return dates
+
+
+def load_archive_pages(path):
+    """
+    :return: dict {<name>: <bytes>} of recorded pages from tar archive of tests/resources,
+        name of page is url of page (path with query) with '/' replaced by '-'
+    """
+    pages = {}
+    if not exists(path):
+        return pages
+    with tarfile.open(path) as tar:
+        for member in tar.getmembers():
+            if member.isfile() and member.name.endswith('.html'):
+                pages[basename(member.name)[:-len('.html')]] = tar.extractfile(member).read()
+    return pages
+
+
+class Site:
+
+    NAME = None
+    ARCHIVE = None
+
+    def __init__(self, articles_per_day=20, resources=RESOURCES):
+        """
+        Pages of one site for stub server: recorded pages from archive of tests/resources, if they are there,
+        other pages are generated with the same markup, that is parsed by loader.
+
+        :param int articles_per_day: count of articles on generated day page
+        :param str resources: path of tests/resources
+        """
+        self.articles_per_day = articles_per_day
+        self.pages = load_archive_pages(join(resources, self.ARCHIVE)) if self.ARCHIVE else {}
+
+    def get_page(self, path_qs):
+        """ :return: bytes of page or None """
+        page = self.pages.get(path_qs.replace('/', '-'))
+        if page is None:
+            page = self.make_page(path_qs)
+        return page
+
+    def make_page(self, path_qs):
+        raise NotImplementedError
+
+
+class LentaRuSite(Site):
+
+    NAME = 'lenta'
+    ARCHIVE = 'lenta_ru/2018-07-02/lenta_ru_articles.tar.gz'
+    START = '2018-07-02'
+
+    def make_page(self, path_qs):
+        parts = path_qs.strip('/').split('/')
+        if len(parts) == 4:
+            return ''.join(
+                f'<div class="b-tabloid__topic_news"><a href="{path_qs}n{i}/">Header {i}</a></div>'
+                for i in range(self.articles_per_day)
+            ).encode()
+        if len(parts) == 5:
+            return f'<div class="b-text" itemprop="articleBody"><p>{get_text(len(path_qs), 300)}</p></div>'.encode()
+
+
+class BankiRuSite(Site):
+
+    NAME = 'banki'
+    ARCHIVE = 'banki_ru/2018-07-03/banki_ru_articles.tar.gz'
+    START = '2018-07-03'
+    DAY_PAGE = '-news-lenta-?d=03&m=07&y=2018'
+
+    def make_page(self, path_qs):
+        if path_qs.startswith('/news/lenta/?d='):
+            if self.DAY_PAGE in self.pages:
+                return self.pages[self.DAY_PAGE]
+            seed = zlib.crc32(path_qs.encode()) % 10 ** 6
+            return ''.join(
+                f'<a class="text-list-link" href="/news/lenta/?id={seed * 1000 + i}">Header {i}</a>'
+                for i in range(self.articles_per_day)
+            ).encode()
+        if path_qs.startswith('/news/lenta/?id='):
+            return f'<article class="article-text"><p>{get_text(len(path_qs), 300)}</p></article>'.encode()
+
+
+class AnswerMailRuSite(Site):
+
+    NAME = 'mail'
+
+    def make_page(self, path_qs):
+        if not path_qs.startswith('/question/'):
+            return
+        external_id = path_qs.rsplit('/', 1)[-1]
+        answers = ''.join(
+            f'<div class="a--atext atext">{get_text(int(external_id) + i, 50)}</div>' for i in range(5)
+        )
+        return (
+            f'<h1 class="q--qtext">Question {external_id}?</h1>'
+            f'<div class="q--qcomment medium">{get_text(int(external_id), 20)}</div>'
+            f'<a class="black list__title list__title">Category</a>'
+            f'<a class="medium item item_link selected">Sub category</a>{answers}'
+        ).encode()
+
+
+SITES = {site.NAME: site for site in (LentaRuSite, BankiRuSite, AnswerMailRuSite)}
+
+
+def pad_page(page, page_size):
+    """ :return: page with boilerplate markup appended, so that it has at least "page_size" bytes """
+    if len(page) >= page_size:
+        return page
+    filler = f'<div class="b-filler"><p>{get_text(0, 100)}</p></div>\n'.encode()
+    return page + filler * ((page_size - len(page)) // len(filler) + 1)
+
+
+class BenchmarkServer:
+
+    def __init__(self, site, latency=0.0, error_rate=0.0, page_size=0, seed=0, host='127.0.0.1', port=0):
+        """
+        Local aiohttp server with pages of site, usage: async with BenchmarkServer(site) as server: server.host
+
+        :param Site site: pages of site
+        :param float latency: delay in seconds before every response
+        :param float error_rate: part of responses with status 503
+        :param int page_size: min size of page in bytes, smaller pages are padded with boilerplate markup
+        :param int seed: seed of errors, the same seed gives the same sequence of errors
+        """
+        self.site = site
+        self.latency = latency
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.address = host
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self.runner = None
+
+    @property
+    def host(self):
+        return f'http://{self.address}:{self.port}'
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503)
+        page = self.site.get_page(request.path_qs)
+        if page is None:
+            return web.Response(status=404)
+        return web.Response(body=pad_page(page, self.page_size), content_type='text/html', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route('GET', '/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.address, self.port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -1,8 +1,35 @@
 # -*- coding: utf-8 -*-
 from . import base
+from .http import HttpClient
+from .egress import Egress, EgressPool
+from .rate_limit import HostRateLimiter, TokenBucket
+from .sinks import JsonFileSink, JsonLinesSink
+from .index import CompletionIndex
+from .seen import BloomFilter, IdBitmap
+from .logger import LoaderLogger
+from .cache import ResponseCache
+from .retry import AdaptiveConcurrency, RetryPolicy
+from .metrics import MetricsRegistry, MetricsServer, ProgressReporter
+from .sharding import ShardedRunner
+from .dedupe import FingerprintIndex, canonicalize_url
+from .checkpoint import CrawlCheckpoint
+from .archive import RawArchive, reextract
+from .probing import IdSpaceProber
+from .revisit import RevisitIndex
+from .work_queue import MemoryWorkQueue, SqliteWorkQueue, WorkQueue
+from .reader import CorpusReader
+from .parquet import ParquetSink, export_parquet
+from .scheduler import ConcurrencyBudget, CrawlScheduler
 from .banki_ru import BankiRuLoader
 from .lenta_ru import LentaRuLoader
 from .mail_ru import AnswerMailRuLoader
 
-__all__ = ['base', 'BankiRuLoader', 'LentaRuLoader', 'AnswerMailRuLoader']
+__all__ = [
+    'base', 'HttpClient', 'HostRateLimiter', 'TokenBucket', 'JsonFileSink', 'JsonLinesSink', 'CompletionIndex',
+    'BloomFilter', 'IdBitmap', 'LoaderLogger', 'ResponseCache', 'RetryPolicy', 'AdaptiveConcurrency',
+    'MetricsRegistry', 'MetricsServer', 'ProgressReporter', 'ShardedRunner', 'CrawlScheduler', 'ConcurrencyBudget',
+    'FingerprintIndex', 'canonicalize_url', 'CorpusReader', 'ParquetSink', 'export_parquet', 'CrawlCheckpoint',
+    'RawArchive', 'reextract', 'IdSpaceProber', 'RevisitIndex', 'WorkQueue', 'SqliteWorkQueue', 'MemoryWorkQueue',
+    'Egress', 'EgressPool', 'BankiRuLoader', 'LentaRuLoader', 'AnswerMailRuLoader'
+]
 __version__ = '0.3.0'
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os.path import join
+from time import time
+from uuid import uuid4
+
+from .dedupe import canonicalize_url
+from .metrics import ProgressReporter
+from .parsing import extract
+from .sinks import JsonFileSink, JsonLinesSink, _compress, get_compression, iter_members
+
+
+DAY_PAGE = 'parse_one_day_articles'
+ARTICLE_PAGE = 'parse_article_text'
+DATA_PAGE = 'parse_data'
+
+
+class RawArchive(JsonLinesSink):
+
+    EXTENSIONS = {'gzip': '.raw.gz', 'zstd': '.raw.zst'}
+
+    def __init__(self, data_folder_path, *, prefix='raw', max_records=100000, max_bytes=64 * 1024 ** 2,
+                 compression='gzip', batch_size=100, flush_interval=1.0, fsync=False):
+        """
+        Archive of raw fetched pages in compressed segments "<prefix>-<run id>-<number>.raw.gz" (like WARC):
+        every page is own gzip member / zstd frame with json header line and raw body, so archive can be read
+        from any page boundary and broken tail of killed run is only the last page. Pages are compressed and written
+        in background thread (see JsonLinesSink). Archive is used by "reextract" for offline extraction.
+
+        :param str data_folder_path: abs path of directory for segments
+        :param str prefix: prefix of segment names
+        :param int max_records: max count of pages in one segment
+        :param int max_bytes: max size of one segment in bytes
+        :param str compression: 'gzip' or 'zstd' (needs package "zstandard")
+        :param int batch_size: max count of pages in one write
+        :param float flush_interval: max seconds between getting of page and its write
+        :param bool fsync: True - call fsync after every write
+        """
+        if compression not in self.EXTENSIONS:
+            raise ValueError(f'Unknown compression "{compression}" of archive, use one of {list(self.EXTENSIONS)}')
+        super().__init__(data_folder_path, prefix=prefix, max_records=max_records, max_bytes=max_bytes,
+                         compression=compression, batch_size=batch_size, flush_interval=flush_interval, fsync=fsync)
+
+    def add(self, url, content, kind, args=(), **fields):
+        """
+        Puts page to queue of writer
+
+        :param str url: url of page
+        :param bytes content: raw body
+        :param str kind: name of parse method of page, for example 'parse_article_text'
+        :param args: other args of parse method, for example (year, month, day) of day page
+        :param fields: other fields of header, for example status and loader
+        """
+        header = dict(fields, url=url, kind=kind, args=list(args), length=len(content), fetched=round(time(), 3))
+        self.write((header, content))
+
+    def _encode(self, records):
+        return b''.join(
+            _compress(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n' + content, self.compression)
+            for header, content in records
+        )
+
+
+def get_segments(path):
+    """ :return: sorted paths of segments of archive in folder and its sub folders (for example of shards) """
+    segments = []
+    extensions = tuple(RawArchive.EXTENSIONS.values())
+    for folder, _, names in os.walk(path):
+        for name in names:
+            if name.endswith(extensions):
+                segments.append(join(folder, name))
+    return sorted(segments)
+
+
+def iter_pages(path):
+    """ :return: generator of (<header>, <raw body>) of complete pages of segment """
+    with open(path, 'rb') as file:
+        for _, data in iter_members(file, get_compression(path)):
+            header, content = data.split(b'\n', 1)
+            yield json.loads(header), content
+
+
+def get_data_path(external_id, data_folder_deep):
+    """ :return: relative path of json file of id, for example 1234567 -> '1/234/1234567.json' for deep 2 """
+    name, sub_id = [f'{external_id}.json'], external_id
+    for _ in range(data_folder_deep):
+        name.append(str(sub_id // 1000 % 1000))
+        sub_id = sub_id // 1000
+    return join(*name[::-1])
+
+
+def _extract_day_pages(loader_cls, path):
+    """
+    :return: (<dict {url of article: (fetched, header, date)}>, <set of urls of article pages of segment>,
+        <Counter of results>, <list of failures>)
+    """
+    articles, article_urls, results, failures = {}, set(), Counter(), []
+    for header, content in iter_pages(path):
+        if header['kind'] == ARTICLE_PAGE:
+            article_urls.add(header['url'])
+        if header['kind'] != DAY_PAGE:
+            continue
+        year, month, day = header['args']
+        try:
+            one_day_articles = extract(loader_cls, DAY_PAGE, content, year, month, day)
+        except Exception as e:
+            results['error'] += 1
+            failures.append({'url': header['url'], 'kind': DAY_PAGE, 'error': f'{type(e).__name__}: {e}'})
+            continue
+        results['day_pages'] += 1
+        for one_day_article in one_day_articles or []:
+            url = canonicalize_url(one_day_article['url'])
+            if url not in articles or articles[url][0] < header['fetched']:
+                articles[url] = (header['fetched'], one_day_article['header'], f'{day}.{month}.{year}')
+    return articles, article_urls, results, failures
+
+
+def _extract_pages(loader_cls, path, articles):
+    """
+    :param articles: dict {url of article: (fetched, header, date)} of article pages of segment
+    :return: (<list of records>, <Counter of results>, <list of failures>) of article or data pages of segment
+    """
+    records, results, failures = [], Counter(), []
+    for header, content in iter_pages(path):
+        kind = header['kind']
+        if kind not in (ARTICLE_PAGE, DATA_PAGE):
+            continue
+        url = header['url']
+        try:
+            if kind == ARTICLE_PAGE:
+                if url not in articles:
+                    raise LookupError('Day page of article is not in archive.')
+                _, article_header, date = articles[url]
+                text = extract(loader_cls, ARTICLE_PAGE, content)
+                record = {'url': url, 'header': article_header, 'date': date, 'text': text} if text else None
+            else:
+                record = extract(loader_cls, DATA_PAGE, content, *header['args'])
+        except Exception as e:
+            results['error'] += 1
+            failures.append({'url': url, 'kind': kind, 'error': f'{type(e).__name__}: {e}'})
+            continue
+        if not record:
+            results['empty'] += 1
+            failures.append({'url': url, 'kind': kind, 'error': 'Empty.'})
+            continue
+        results['done'] += 1
+        records.append((header, record))
+    return records, results, failures
+
+
+def reextract(loader_cls, archive_path, sink=None, *, data_folder_path=None, data_folder_deep=None, n_workers=None,
+              errors_path=None, progress_interval=1.0):
+    """
+    Offline extraction of records from archive of raw pages (see "archive_path" of loaders) with static parse methods
+    of loader class in "n_workers" processes, segments of archive are units of work. Articles of ArticleLoader are
+    extracted in two passes: day pages give headers and dates of articles, then article pages give texts.
+    Every url (id) is written once, the latest day page of article is used. Task of segment gets only articles
+    of its own article pages, so the whole dict of articles isn't sent to every worker.
+
+    :param loader_cls: class of loader, for example LentaRuLoader, it must be importable by worker
+    :param str archive_path: folder of archive
+    :param optional sink: sink of records, by default JsonFileSink of "data_folder_path", that is closed at the end
+    :param optional data_folder_path: folder for records, if "sink" isn't given
+    :param optional data_folder_deep: deep of folders of data of DataExternalIDLoader (see DataExternalIDLoader),
+        default DATA_FOLDER_DEEP of loader class
+    :param optional n_workers: count of worker processes, default count of cpu
+    :param optional errors_path: path of file, where failed pages {'url', 'kind', 'error'} are written as JSON lines
+    :param optional progress_interval: min seconds between updates of progress line, None - without progress
+    :return: dict {'segments': ..., 'day_pages': ..., 'done': ..., 'empty': ..., 'error': ..., 'duplicate': ...}
+    """
+    own_sink = sink is None
+    if own_sink:
+        sink = JsonFileSink(data_folder_path)
+    if data_folder_deep is None:
+        data_folder_deep = getattr(loader_cls, 'DATA_FOLDER_DEEP', 1)
+    segments = get_segments(archive_path)
+    progress = ProgressReporter(progress_interval)
+    results = Counter(segments=len(segments))
+    errors_file = open(errors_path, 'a') if errors_path else None
+
+    def account(segment_results, failures):
+        results.update(segment_results)
+        if errors_file is not None:
+            for failure in failures:
+                errors_file.write(json.dumps(failure, ensure_ascii=False) + '\n')
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            articles, article_urls = {}, {}
+            futures = {executor.submit(_extract_day_pages, loader_cls, path): path for path in segments}
+            for i, future in enumerate(as_completed(futures)):
+                segment_articles, article_urls[futures[future]], segment_results, failures = future.result()
+                for url, article in segment_articles.items():
+                    if url not in articles or articles[url][0] < article[0]:
+                        articles[url] = article
+                account(segment_results, failures)
+                progress.update(f'{i + 1} from {len(segments)} segments, {len(articles)} articles found')
+
+            written = set()
+            futures = [
+                executor.submit(_extract_pages, loader_cls, path,
+                                {url: articles[url] for url in article_urls.pop(path) if url in articles})
+                for path in segments
+            ]
+            for i, future in enumerate(as_completed(futures)):
+                records, segment_results, failures = future.result()
+                account(segment_results, failures)
+                for header, record in records:
+                    key = header['url'] if header['kind'] == ARTICLE_PAGE else header['args'][0]
+                    if key in written:
+                        results['duplicate'] += 1
+                        continue
+                    written.add(key)
+                    if header['kind'] == ARTICLE_PAGE:
+                        sink.write(record, f'{uuid4()}.json')
+                    else:
+                        sink.write(record, get_data_path(int(key), data_folder_deep))
+                progress.update(f'{i + 1} from {len(segments)} segments, {results["done"]} records')
+    finally:
+        if own_sink:
+            sink.close()
+        if errors_file is not None:
+            errors_file.close()
+
+    progress.write(f'\nExtraction finished! {dict(results)}')
+    return dict(results)
@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
+import re
+
+from bs4 import SoupStrainer
+
 from .base import ArticleLoader
+from .parsing import has_class
 
 
 class BankiRuLoader(ArticleLoader):
@@ -8,35 +13,41 @@ class BankiRuLoader(ArticleLoader):
 
     HOST = 'http://www.banki.ru'
     DEFAULT_URL_TEMPLATE = '/news/lenta/?d={day}&m={month}&y={year}'
+    NEWS_HREF = re.compile('^/news/lenta/')
+
+    PARSE_ONLY = {
+        'parse_one_day_articles': SoupStrainer('a', class_=has_class('text-list-link')),
+        'parse_article_text': SoupStrainer('article', class_=has_class('article-text')),
+    }
+    STOP_AFTER = {
+        'parse_article_text': ('article', {'class': 'article-text'}),
+    }
 
     def __init__(self, year, save=True, data_folder_path=None, log_file_path=None, timeout=1, host=HOST,
-                 url_template=DEFAULT_URL_TEMPLATE, queue_maxsize=1, n_processes=1):
+                 url_template=DEFAULT_URL_TEMPLATE, queue_maxsize=1, n_processes=1, **kwargs):
         super().__init__(year=year, host=host, url_template=url_template, save=save, data_folder_path=data_folder_path,
                          timeout=timeout, queue_maxsize=queue_maxsize, n_processes=n_processes,
-                         log_file_path=log_file_path)
+                         log_file_path=log_file_path, **kwargs)
 
-    async def prepare_one_day_articles(self, soup,  year, month, day):
+    @staticmethod
+    def parse_one_day_articles(soup, year, month, day):
         """
         :return: list of dict {'url': <url>, 'header': <header>}
         """
-        all_a = soup.find_all('a')
-        if not all_a:
-            return
-
         one_day_articles = []
-        for a in all_a:
-            if 'text-list-link' in a.attrs.get('class', []) and a['href'].startswith('/news/lenta/'):
-                one_day_articles.append({
-                    'url': a['href'],
-                    'header': a.text,
-                })
+        for a in soup.find_all('a', class_='text-list-link', href=BankiRuLoader.NEWS_HREF):
+            one_day_articles.append({
+                'url': a['href'],
+                'header': a.text,
+            })
 
         return one_day_articles
 
-    async def get_article_text(self, soup):
+    @staticmethod
+    def parse_article_text(soup):
         """
         :return: str text
         """
-        for a in soup.find_all('article'):
-            if 'article-text' in a.attrs.get('class', []):
-                return a.text
+        article = soup.find('article', class_='article-text')
+        if article is not None:
+            return article.text
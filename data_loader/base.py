@@ -1,54 +1,419 @@
 # -*- coding: utf-8 -*-
-import json
 import asyncio
 import itertools as it
+from concurrent.futures import ThreadPoolExecutor
 from os import makedirs
-from os.path import join, exists, basename, dirname
+from os.path import join, exists, basename
 from glob import glob
 from uuid import uuid4
-from time import sleep
 from datetime import datetime
+from time import monotonic
+
+from .http import HttpClient
+from .parsing import ElementEnd, make_soup, extract_timed, create_parse_executor
+from .sinks import JsonFileSink
+from .index import CompletionIndex
+from .seen import BloomFilter, IdBitmap
+from .logger import LoaderLogger
+from .rate_limit import HostRateLimiter
+from .retry import RetryPolicy
+from .metrics import MetricsRegistry, ProgressReporter, write_snapshots
+from .dedupe import canonicalize_url, get_fingerprint
+from .checkpoint import CrawlCheckpoint
+from .archive import RawArchive, get_data_path
+from .probing import IdSpaceProber
+from .revisit import RevisitIndex
+from .work_queue import SqliteWorkQueue, get_worker_id
+
+
+def to_date(value):
+    """ :return: date from 'YYYY-MM-DD', date or None """
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class FetchMixin:
+    """
+    Request path, that is shared by loaders:
+    response cache -> rate limiter -> adaptive concurrency -> http client -> retries with backoff.
+    Also run of loader with common setup and teardown: loader defines "_run_workers" coroutine and "_close_state",
+    that saves and closes own state (indexes, checkpoints), other owned resources are closed here.
+    """
+
+    def get_stop(self, method_name):
+        """ :return: function, that creates ElementEnd of "STOP_AFTER[method_name]", if "early_stop" is on, or None """
+        if self.early_stop and method_name in self.STOP_AFTER:
+            tag, attrs = self.STOP_AFTER[method_name]
+            return lambda: ElementEnd(tag, attrs)
+
+    async def request(self, url, stop=None):
+        """
+        :param optional stop: function, that creates object with method "feed(chunk)" for every attempt,
+            reading of body is stopped, when it returns True (see HttpClient.get)
+        :return: Response, status 304 of revalidated response is replaced by cached response with status 200
+        """
+        cached = None
+        if self.cache is not None:
+            cached = await asyncio.get_event_loop().run_in_executor(None, self.cache.get, url)
+            if cached is not None and self.cache.is_fresh(cached):
+                return cached.response
+
+        headers = self.cache.conditional_headers(cached) if cached is not None else None
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(url)
+            if self.concurrency is not None:
+                await self.concurrency.acquire()
+            start = monotonic()
+            try:
+                if stop is None:
+                    response = await self.http_client.get(url, headers=headers)
+                else:
+                    response = await self.http_client.get(url, headers=headers, stop=stop())
+            except self.retry_policy.retry_exceptions as e:
+                if self.concurrency is not None:
+                    self.concurrency.on_overload()
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                delay = self.retry_policy.get_delay(attempt)
+                self.metrics.inc('loader_retries_total', **self._labels)
+                await self._log('WARNING', f'{e, type(e)}', url=url, attempt=attempt + 1, delay=delay)
+            else:
+                if self.http_client.can_retry(url, response.status):
+                    # banned egress of pool is cooled down, request goes through other egress without delay
+                    self.metrics.inc('loader_retries_total', **self._labels)
+                    await self._log('WARNING', 'Retry by other egress.', url=url, status=response.status)
+                    continue
+                retryable = self.retry_policy.is_retryable_status(response.status)
+                if self.concurrency is not None:
+                    if retryable:
+                        self.concurrency.on_overload()
+                    else:
+                        self.concurrency.on_success(monotonic() - start)
+                if not retryable or attempt >= self.retry_policy.max_retries:
+                    break
+                delay = self.retry_policy.get_delay(attempt, response.headers.get('Retry-After'))
+                self.metrics.inc('loader_retries_total', **self._labels)
+                await self._log('WARNING', 'Retry.', url=url, status=response.status, attempt=attempt + 1,
+                                delay=delay)
+            finally:
+                if self.concurrency is not None:
+                    await self.concurrency.release()
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+        if self.cache is not None:
+            if response.status == 304 and cached is not None:
+                self.cache.touch(url)
+                return cached.response
+            if response.status == 200 and not response.truncated:
+                self.cache.put(url, response)
+        if response.truncated:
+            self.metrics.inc('loader_early_stops_total', **self._labels)
+        return response
+
+    async def get_soup(self, key):
+        """ :return: BeautifulSoup of page of url (id) with "bs4_features" of loader or None """
+        content = await self.fetch(key)
+        if content:
+            with self.metrics.time('loader_parse_seconds', **self._labels):
+                return make_soup(content, self.bs4_features)
+
+    async def parse(self, method_name, content, *args):
+        """
+        Calls static parse method with fast parsed soup from content: in process pool, if there is "parse_executor",
+        else in event loop. Returns only extracted result.
+        """
+        with self.metrics.track('loader_in_flight', stage='parse', **self._labels):
+            if self.parse_executor is None:
+                result, parse_time, extract_time = extract_timed(type(self), method_name, content, *args)
+            else:
+                result, parse_time, extract_time = await asyncio.get_event_loop().run_in_executor(
+                    self.parse_executor, extract_timed, type(self), method_name, content, *args)
+        self.metrics.observe('loader_parse_seconds', parse_time, **self._labels)
+        self.metrics.observe('loader_extract_seconds', extract_time, **self._labels)
+        return result
+
+    async def _log(self, level, msg, **fields):
+        self.logger.log(level, msg, **fields)
+
+    def _collect_metrics(self):
+        self.metrics.set('loader_queue_size', self.queue.qsize(), queue='main', **self._labels)
+        self.metrics.set('loader_progress', self.loading_progress, stage='load', **self._labels)
+        if self.concurrency is not None:
+            self.metrics.set('loader_concurrency_limit', self.concurrency.limit, **self._labels)
+
+    async def _run_workers(self):
+        raise NotImplementedError
+
+    def _close_state(self):
+        pass
+
+    async def run_async(self):
+        """ Coroutine version of "run", for starting loader inside of already running event loop """
+        if self.parse_executor is None and self.n_parse_workers:
+            self.parse_executor = create_parse_executor(self.n_parse_workers)
+            self._own_parse_executor = True
+        self.metrics.add_collector(self._collect_metrics)
+        metrics_task = None
+        if self.metrics_path:
+            metrics_task = asyncio.ensure_future(
+                write_snapshots(self.metrics, self.metrics_path, self.metrics_interval))
+        try:
+            await self._run_workers()
+        finally:
+            if self._own_http_client:
+                await self.http_client.close()
+            if self._own_parse_executor:
+                self.parse_executor.shutdown()
+                self.parse_executor = None
+                self._own_parse_executor = False
+            if self._own_sink:
+                self.sink.close()
+            if self._own_logger:
+                self.logger.close()
+            self._close_state()
+            if self.archive is not None:
+                self.archive.close()
+            self._close_work_queue()
+            if metrics_task is not None:
+                metrics_task.cancel()
+                self.metrics.write_snapshot(self.metrics_path)
+            self.metrics.remove_collector(self._collect_metrics)
+
+
+class WorkerMixin:
+    """
+    Worker of shared WorkQueue: tasks of loader are put to work queue instead of local queue, they are leased
+    by batches, leases are extended by heartbeat and handled tasks are acked. Loader defines "_work_names"
+    {<command>: <name of queue>} and "_get_work_key(command, args)". Handler of task returns True, if task
+    is finished (even without data, for example page without text or with status 404), or False, if it failed
+    (no response), then task is nacked and leased again, until "max_attempts" of work queue.
+    Operations of work queue (queries and waiting of lock of shared file) are run in own thread of loader.
+    """
+
+    _work_executor = None
+
+    async def _call_work(self, method, *args):
+        """ Calls method of work queue in own thread of loader """
+        if self._work_executor is None:
+            self._work_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='work-queue')
+        return await asyncio.get_event_loop().run_in_executor(self._work_executor, method, *args)
+
+    async def _put_work(self, command, tasks, reset=False):
+        """ Puts tasks (args of command) to work queue, "reset" - finished tasks are done again (see WorkQueue.put) """
+        name = self._work_names[command]
+        tasks = [(self._get_work_key(command, args), list(args)) for args in tasks]
+        added = await self._call_work(self.work_queue.put, name, tasks, reset)
+        self.metrics.inc('loader_work_tasks_total', added, result='put', **self._labels)
+
+    async def _ack_work(self, command, args, done=True):
+        """ Acks finished task or nacks failed one """
+        if self.work_queue is not None and command in self._work_names:
+            name, key = self._work_names[command], self._get_work_key(command, args)
+            await self._call_work(self.work_queue.ack if done else self.work_queue.nack, name, key)
+            self.metrics.inc('loader_work_tasks_total', result='acked' if done else 'nacked', **self._labels)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._call_work(self.work_queue.heartbeat, self.worker_id, self.lease_seconds)
+
+    async def lease_work(self):
+        """
+        Puts leased tasks to local queue, until all queues of loader have neither pending nor leased tasks
+        (of all workers), then stops local workers. New tasks are leased, when local queue has less than
+        "lease_size" tasks (it is checked every "poll_interval" / 10), so other workers get the rest.
+        """
+        heartbeat = asyncio.ensure_future(self._heartbeat())
+        try:
+            while True:
+                if self.queue.qsize() >= self.lease_size:
+                    await asyncio.sleep(self.poll_interval / 10)
+                    continue
+                leased = 0
+                for command, name in self._work_names.items():
+                    tasks = await self._call_work(self.work_queue.lease, name, self.worker_id, self.lease_size,
+                                                  self.lease_seconds)
+                    for _, args in tasks:
+                        await self.queue.put((command, tuple(args), monotonic()))
+                    leased += len(tasks)
+                if leased:
+                    self.metrics.inc('loader_work_tasks_total', leased, result='leased', **self._labels)
+                elif all([await self._call_work(self.work_queue.is_finished, name)
+                          for name in self._work_names.values()]):
+                    break
+                else:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            heartbeat.cancel()
 
-import aiohttp
-from bs4 import BeautifulSoup
+        for _ in range(self.n_processes):
+            await self.queue.put((self.KILL, None, monotonic()))
 
+    def _pop_not_found(self, key):
+        """ :return: True, if server answered 404 for url (id), then its task is finished without data """
+        not_found = key in self._not_found
+        self._not_found.discard(key)
+        return not_found
 
-class ArticleLoader:
+    def _close_work_queue(self):
+        if self._work_executor is not None:
+            self._work_executor.shutdown()
+            self._work_executor = None
+        if self.work_queue is not None:
+            self.work_queue.release(self.worker_id)
+            if self._own_work_queue:
+                self.work_queue.close()
+
+
+class ArticleLoader(FetchMixin, WorkerMixin):
 
     NAME = 'article'
+    BS4_FEATURES = 'html.parser'
+    PARSE_ONLY = {}
+    STOP_AFTER = {}
 
     PREPARE = 'prepare'
     LOAD = 'load'
+    LOAD_ARTICLE = 'load_article'
     KILL = 'kill'
 
     def __init__(self, *, year, host, url_template, save, data_folder_path, timeout, queue_maxsize, n_processes,
-                 log_file_path=None):
+                 log_file_path=None, http_client=None, rate_limit=None, burst=1, rate_limiter=None,
+                 n_parse_workers=0, parse_executor=None, sink=None, url_cache_capacity=1000000, seen_path=None,
+                 stream=False, log_level='INFO', logger=None, cache=None, retry_policy=None, concurrency=None,
+                 fast_parse=False, metrics=None, metrics_path=None, metrics_interval=10, progress_interval=1.0,
+                 start_date=None, end_date=None, dedupe=None, checkpoint_path=None, recent_days=3, early_stop=False,
+                 archive_path=None, work_queue=None, work_queue_path=None, worker_id=None, lease_size=10,
+                 lease_seconds=300, poll_interval=1.0, metrics_labels=None):
         """
         Base class for loading articles from resources, that have one day articles structure.
-        Needs to define methods "get_article_text" and "prepare_one_day_articles" with signature, that they have.
+        Needs to define static methods "parse_article_text" and "parse_one_day_articles" with signature, that they have
+        (or async methods "get_article_text" and "prepare_one_day_articles", then parse stage is not available).
+        Class attribute PARSE_ONLY {<name of parse method>: <SoupStrainer>} declares tags, that are needed for
+        parse method, only they are parsed by fast parser. Class attribute STOP_AFTER {<name of parse method>:
+        (<tag>, <attrs>)} declares element, after end of which the rest of page isn't needed for parse method.
 
         :param int or str year: year for loading
         :param str host: resource host
         :param str url_template: template for url, where articles are being. example: '/news/{year}/{month}/{day}/'
         :param bool save: True/False - save json or not
         :param str data_folder_path: abs path of directory for saving data
-        :param int timeout: timeout in seconds for waiting before requesting to server
+        :param int timeout: min interval in seconds between requests to host, used if "rate_limit" is not given
         :param int queue_maxsize: maxsize of queue for tasks
         :param int n_processes: processes count
         :param optional log_file_path: abs path of file for saving logs;
             default path: /tmp/data-loader/<name><year>-<H>:<M>:<S>-<d>.<m>.<Y>.log
+        :param optional http_client: HttpClient with configured connection pool, it is shared between all requests;
+            by default loader creates own client and closes it at the end of run
+        :param optional rate_limit: max requests per second to host, None - 1 / timeout (or without limits)
+        :param int burst: count of requests, that can be sent to host without waiting
+        :param optional rate_limiter: HostRateLimiter, that can be shared between loaders;
+            if it is given, "rate_limit", "burst" and "timeout" are ignored
+        :param int n_parse_workers: count of worker processes for parsing of pages with fast parser,
+            0 - parse in event loop
+        :param optional parse_executor: ProcessPoolExecutor for parsing, that can be shared between loaders
+        :param optional sink: object with methods "write(record, name)" and "close()" for saving of articles,
+            for example JsonLinesSink; by default JsonFileSink (one json file per article), that is closed by loader
+        :param int url_cache_capacity: expected count of urls in "url_cache" (BloomFilter with fixed memory)
+        :param optional seen_path: path of file, where "url_cache" is loaded from and saved to at the end of run
+        :param bool stream: True - articles of every prepared day are loaded at once by other "n_processes" workers,
+            they are given to sink and aren't kept in "self.articles"; False - load starts after preparing of all days
+        :param str log_level: min level of events in log: 'DEBUG', 'INFO', 'WARNING' or 'ERROR'
+        :param optional logger: LoaderLogger, that can be shared between loaders; "log_file_path" and "log_level"
+            are ignored, if it is given
+        :param optional cache: ResponseCache, that is consulted before requests to server
+        :param optional retry_policy: RetryPolicy for retryable statuses and errors, default RetryPolicy()
+        :param optional concurrency: AdaptiveConcurrency, that limits requests in flight (it can be shared between
+            loaders); in this case "n_processes" is max count of requests in flight
+        :param bool fast_parse: True - parse pages in event loop with lxml and PARSE_ONLY strainers
+            instead of "get_soup" (it is always used with "n_parse_workers")
+        :param optional metrics: MetricsRegistry, that can be shared between loaders (metrics have label "loader");
+            by default loader creates own registry, it is available as "self.metrics"
+        :param optional metrics_path: path of file, where snapshots of metrics are appended as JSON lines
+        :param float metrics_interval: seconds between snapshots of metrics
+        :param optional progress_interval: min seconds between updates of progress line, None - without progress
+        :param optional start_date: first day of loading in year, 'YYYY-MM-DD' or date; None - from the first day
+        :param optional end_date: last day of loading in year, 'YYYY-MM-DD' or date; None - to the last day
+        :param optional dedupe: FingerprintIndex of texts, that can be shared between loaders; duplicate articles
+            aren't saved and urls of added texts are skipped on next runs. Urls of articles are always canonicalized
+            and every url is loaded once per run.
+        :param optional checkpoint_path: path of CrawlCheckpoint for incremental loading: processed days are skipped
+            (except the last "recent_days" days) and unfinished articles of previous runs are loaded again
+        :param int recent_days: count of days before the last processed day, that are fetched again on next run
+        :param bool early_stop: True - reading of page is stopped after end of element of STOP_AFTER, chunks of body
+            are fed to incremental lxml parser while downloading; truncated pages aren't put to cache
+        :param optional archive_path: folder of RawArchive, where raw fetched pages are saved for offline extraction
+            (see archive.reextract)
+        :param optional work_queue: WorkQueue, that is shared by workers of one crawl (processes or machines):
+            day pages and articles are put to it, every worker leases them by batches and acks handled tasks,
+            tasks of dead workers are leased again after expiration of leases; "stream" is ignored
+        :param optional work_queue_path: path of SqliteWorkQueue, if "work_queue" isn't given, it is closed by loader
+        :param optional worker_id: unique id of worker in work queue, default '<host>:<pid>:<random>'
+        :param int lease_size: max count of tasks in one lease
+        :param float lease_seconds: seconds of lease, it is extended by heartbeat every "lease_seconds" / 3
+        :param float poll_interval: seconds between leases, when there are no pending tasks
+        :param optional metrics_labels: dict of other labels of metrics of loader, for example {'instance': 'a'};
+            metrics always have labels "loader" and "year"
         """
         self.year = int(year)
+        self.start_date = to_date(start_date)
+        self.end_date = to_date(end_date)
         self.save = save
         self.data_folder_path = data_folder_path
         self.host = host
+        self.bs4_features = self.BS4_FEATURES
         self.timeout = timeout
         self.n_processes = n_processes
         self.url_template = url_template
 
-        self.url_cache = set()
+        self.http_client = http_client if http_client is not None else HttpClient()
+        self._own_http_client = http_client is None
+
+        if rate_limiter is None:
+            if rate_limit is None and timeout:
+                rate_limit = 1 / timeout
+            rate_limiter = HostRateLimiter(rate=rate_limit, burst=burst)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.concurrency = concurrency
+
+        self.n_parse_workers = n_parse_workers
+        self.parse_executor = parse_executor
+        self._own_parse_executor = False
+        self.fast_parse = fast_parse
+        self.early_stop = early_stop
+        self.archive = RawArchive(archive_path, prefix=self.NAME) if archive_path else None
+        self._day_args = {}
+
+        self.work_queue = work_queue if work_queue is not None else (
+            SqliteWorkQueue(work_queue_path) if work_queue_path else None)
+        self._own_work_queue = work_queue is None
+        self.worker_id = worker_id or get_worker_id()
+        self.lease_size = lease_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        self.seen_path = seen_path
+        if seen_path and exists(seen_path):
+            self.url_cache = BloomFilter.load(seen_path)
+        else:
+            self.url_cache = BloomFilter(capacity=url_cache_capacity)
+        self.prepared_urls = BloomFilter(capacity=url_cache_capacity)
+        self._not_found = set()
+        self.dedupe = dedupe
+        self.checkpoint = CrawlCheckpoint(checkpoint_path) if checkpoint_path else None
+        self.recent_days = recent_days
         self.articles = []
         self.queue = asyncio.Queue(maxsize=queue_maxsize)
+        self.stream = stream
+        self.load_queue = asyncio.Queue(maxsize=queue_maxsize)
 
         self.preparing_progress = 0
         self.preparing_end = 0
@@ -71,176 +436,403 @@ class ArticleLoader:
 
         self.log_path = log_file_path if log_file_path else join(
             self.base_path, f'{name}.log')
+        self.logger = logger if logger is not None else LoaderLogger(self.log_path, level=log_level)
+        self._own_logger = logger is None
+
+        self.sink = sink if sink is not None else JsonFileSink(self.data_path)
+        self._own_sink = sink is None
+
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.progress = ProgressReporter(progress_interval)
+        self._labels = dict(metrics_labels or {}, loader=self.NAME, year=self.year)
 
     async def prepare(self):
-        print(f'\nPreparing to load {self.NAME} {self.year}...')
+        self.progress.write(f'\nPreparing to load {self.NAME} {self.year}...')
 
         all_dates = self._get_all_dates()
         self.preparing_end = len(all_dates)
 
+        days, refetch_from = set(), None
+        if self.checkpoint is not None:
+            days = self.checkpoint.get_days(self._checkpoint_name)
+            refetch_from = self.checkpoint.get_refetch_from(self._checkpoint_name, self.recent_days)
+            await self._resume_articles()
+
+        work, refetch = [], []
         for day, month, year in all_dates:
             url = self.url_template.format(year=year, month=month, day=day)
-            if url in self.url_cache:
+            self._day_args[url] = (year, month, day)
+            if self.checkpoint is not None:
+                iso_date = f'{year}-{month}-{day}'
+                skip = iso_date in days and iso_date < refetch_from
+            else:
+                skip = url in self.url_cache
+            if skip:
                 self.preparing_progress += 1
+                self.metrics.inc('loader_items_total', stage='prepare', result='skipped', **self._labels)
                 continue
 
-            await self.queue.put((self.PREPARE, (url, year, month, day)))
+            if self.work_queue is not None:
+                # processed days are fetched again, though they are done in work queue
+                (refetch if self.checkpoint is not None and iso_date in days else work).append((url, year, month, day))
+                continue
+            await self._put(self.queue, self.PREPARE, (url, year, month, day))
 
+        if self.work_queue is not None:
+            await self._put_work(self.PREPARE, work)
+            await self._put_work(self.PREPARE, refetch, reset=True)
+            return
         for _ in range(self.n_processes):
-            await self.queue.put((self.KILL, None))
+            await self._put(self.queue, self.KILL)
 
     async def load(self):
-        print('\nLoading...')
+        self.progress.write('\nLoading...')
         self.loading_end = len(self.articles)
 
         for i, article in enumerate(self.articles):
             url = article['url']
             if url in self.url_cache:
                 self.loading_progress += 1
+                self.metrics.inc('loader_items_total', stage='load', result='skipped', **self._labels)
                 continue
 
-            await self.queue.put((self.LOAD, (url, i)))
+            await self._put(self.queue, self.LOAD, (url, i))
 
         for _ in range(self.n_processes):
-            await self.queue.put((self.KILL, None))
+            await self._put(self.queue, self.KILL)
+
+    @property
+    def _checkpoint_name(self):
+        return f'{self.NAME}:{self.year}'
+
+    @property
+    def _work_names(self):
+        return {self.PREPARE: f'{self._checkpoint_name}:prepare', self.LOAD_ARTICLE: f'{self._checkpoint_name}:load'}
+
+    def _get_work_key(self, command, args):
+        return args[0] if command == self.PREPARE else args[0]['url']
+
+    async def _resume_articles(self):
+        """ Puts pending and failed articles of previous runs from checkpoint to loading """
+        for article in self.checkpoint.iter_unfinished(self._checkpoint_name):
+            self.prepared_urls.add(article['url'])
+            self.metrics.inc('loader_items_total', stage='prepare', result='resumed', **self._labels)
+            if self.work_queue is not None:
+                await self._put_work(self.LOAD_ARTICLE, [(article,)], reset=True)
+            elif not self.stream:
+                self.articles.append(article)
+            else:
+                await self._put(self.load_queue, self.LOAD_ARTICLE, (article,))
 
-    async def get(self):
+    def _set_status(self, url, status):
+        if self.checkpoint is not None:
+            self.checkpoint.set_status(url, status)
+
+    @staticmethod
+    async def _put(queue, command, data=None):
+        """ Puts task with time of putting, that is used for metric of waiting in queue """
+        await queue.put((command, data, monotonic()))
+
+    async def get(self, queue=None):
+        queue = self.queue if queue is None else queue
         while True:
-            command, data = await self.queue.get()
+            command, data, put_time = await queue.get()
+            if command != self.KILL:
+                self.metrics.observe('loader_queue_wait_seconds', monotonic() - put_time, command=command,
+                                     **self._labels)
             if command == self.PREPARE:
-                await self.get_prepare(*data)
+                done = await self.get_prepare(*data)
             elif command == self.LOAD:
-                await self.get_load(*data)
+                done = await self.get_load(*data)
+            elif command == self.LOAD_ARTICLE:
+                done = await self.get_load_article(*data)
             else:
                 break
+            await self._ack_work(command, data, done)
 
-    async def prepare_one_day_articles(self, soup,  year, month, day):
+    @staticmethod
+    def parse_one_day_articles(soup, year, month, day):
         """
         :return: list of dicts {'url': <url>, 'header': <header>}
         """
         raise NotImplementedError
 
+    async def prepare_one_day_articles(self, soup,  year, month, day):
+        """
+        :return: list of dicts {'url': <url>, 'header': <header>}
+        """
+        return self.parse_one_day_articles(soup, year, month, day)
+
     async def get_prepare(self, url, year, month, day):
 
         self.preparing_progress += 1
-
-        soup = await self.get_soup(url)
-        if not soup:
-            await self._log('PREPARING_ERROR', f'No soup for url "{url}"')
-            return
+        # day page can be leased from work queue, args of day pages define kind of page in "fetch"
+        self._day_args[url] = (year, month, day)
+
+        if self.parse_executor is None and not self.fast_parse:
+            soup = await self.get_soup(url)
+            if not soup:
+                self.metrics.inc('loader_items_total', stage='prepare', result='failed', **self._labels)
+                await self._log('PREPARING_ERROR', 'No soup.', url=url)
+                return self._pop_not_found(url)
+            with self.metrics.time('loader_extract_seconds', **self._labels):
+                one_day_articles = await self.prepare_one_day_articles(soup, year, month, day)
+        else:
+            content = await self.fetch(url)
+            if not content:
+                self.metrics.inc('loader_items_total', stage='prepare', result='failed', **self._labels)
+                await self._log('PREPARING_ERROR', 'No content.', url=url)
+                return self._pop_not_found(url)
+            one_day_articles = await self.parse('parse_one_day_articles', content, year, month, day)
 
         self.url_cache.add(url)
-        one_day_articles = await self.prepare_one_day_articles(soup, year, month, day)
         if not one_day_articles:
-            await self._log('PREPARING_WARNING', f'Articles was not found from url "{url}"')
-            return
+            if self.checkpoint is not None:
+                self.checkpoint.set_day(self._checkpoint_name, f'{year}-{month}-{day}', 0)
+            self.metrics.inc('loader_items_total', stage='prepare', result='empty', **self._labels)
+            await self._log('PREPARING_WARNING', 'Articles were not found.', url=url)
+            return True
+
+        self.metrics.inc('loader_items_total', stage='prepare', result='done', **self._labels)
 
+        work = []
         for one_day_article in one_day_articles:
-            self.articles.append({
-                'url': one_day_article['url'],
+            article_url = canonicalize_url(one_day_article['url'])
+            if article_url in self.prepared_urls:
+                self.metrics.inc('loader_items_total', stage='prepare', result='duplicate_url', **self._labels)
+                continue
+            self.prepared_urls.add(article_url)
+            article = {
+                'url': article_url,
                 'header': one_day_article['header'],
                 'date': f'{day}.{month}.{year}',
                 'text': ''
-            })
+            }
+            if self.checkpoint is not None:
+                if self.checkpoint.is_finished(article_url):
+                    self.metrics.inc('loader_items_total', stage='prepare', result='skipped', **self._labels)
+                    continue
+                self.checkpoint.add_article(self._checkpoint_name, article)
+            if self.work_queue is not None:
+                if article['url'] not in self.url_cache:
+                    work.append((article,))
+            elif not self.stream:
+                self.articles.append(article)
+            elif article['url'] not in self.url_cache:
+                await self._put(self.load_queue, self.LOAD_ARTICLE, (article,))
+        if work:
+            await self._put_work(self.LOAD_ARTICLE, work)
+        # day is marked after all its articles, so commit can't keep processed day without its articles
+        if self.checkpoint is not None:
+            self.checkpoint.set_day(self._checkpoint_name, f'{year}-{month}-{day}', len(one_day_articles))
 
         if self.preparing_progress < self.preparing_end:
-            print(f'\r{self.preparing_progress} from {self.preparing_end} days', end='')
+            self.progress.update(f'{self.preparing_progress} from {self.preparing_end} days')
         elif self.preparing_progress == self.preparing_end:
             self.preparing_progress += 1
-            print(f'\nPreparing {self.NAME} {self.year} finished!\n')
+            self.progress.write(f'\nPreparing {self.NAME} {self.year} finished!\n')
+        return True
 
-    async def get_article_text(self, soup):
+    @staticmethod
+    def parse_article_text(soup):
         """
         :return: str text
         """
         raise NotImplementedError
 
+    async def get_article_text(self, soup):
+        """
+        :return: str text
+        """
+        return self.parse_article_text(soup)
+
     async def get_load(self, url, i):
+        return await self.get_load_article(self.articles[i])
 
-        self.loading_progress += 1
+    async def get_load_article(self, article):
 
-        soup = await self.get_soup(url)
-        if not soup:
-            await self._log('WARNING', f'No soup for url "{url}"')
-            return
+        self.loading_progress += 1
+        url = article['url']
+        if self.dedupe is not None and await self.dedupe.contains_async(url):
+            self.metrics.inc('loader_items_total', stage='load', result='skipped', **self._labels)
+            self._set_status(url, CrawlCheckpoint.DONE)
+            return True
+
+        if self.parse_executor is None and not self.fast_parse:
+            soup = await self.get_soup(url)
+            if not soup:
+                self.metrics.inc('loader_items_total', stage='load', result='failed', **self._labels)
+                self._set_status(url, CrawlCheckpoint.FAILED)
+                await self._log('WARNING', 'No soup.', url=url)
+                return self._pop_not_found(url)
+            with self.metrics.time('loader_extract_seconds', **self._labels):
+                text = await self.get_article_text(soup)
+        else:
+            content = await self.fetch(url)
+            if not content:
+                self.metrics.inc('loader_items_total', stage='load', result='failed', **self._labels)
+                self._set_status(url, CrawlCheckpoint.FAILED)
+                await self._log('WARNING', 'No content.', url=url)
+                return self._pop_not_found(url)
+            text = await self.parse('parse_article_text', content)
 
-        text = await self.get_article_text(soup)
         if not text:
-            await self._log('WARNING', f'No text for url "{url}"')
-            return
-
-        self.articles[i]['text'] = text
+            self.metrics.inc('loader_items_total', stage='load', result='empty', **self._labels)
+            self._set_status(url, CrawlCheckpoint.EMPTY)
+            await self._log('WARNING', 'No text.', url=url)
+            return True
+
+        article['text'] = text
+        name = f'{uuid4()}.json'
+        if self.dedupe is not None:
+            fingerprint = None
+            if self.parse_executor is not None:
+                fingerprint = await asyncio.get_event_loop().run_in_executor(
+                    self.parse_executor, get_fingerprint, text, self.dedupe.near_duplicates)
+            fingerprint = await self.dedupe.add_async(url, text, fingerprint)
+            article['fingerprint'] = fingerprint.hash
+            name = f'{fingerprint.hash}.json'
+            if fingerprint.duplicate_of is not None:
+                article['duplicate_of'] = fingerprint.duplicate_of
+                self.metrics.inc('loader_items_total', stage='load', result='duplicate', **self._labels)
+                self._set_status(url, CrawlCheckpoint.DONE)
+                await self._log('INFO', 'Duplicate.', url=url, duplicate_of=fingerprint.duplicate_of)
+                return True
+        self.metrics.inc('loader_items_total', stage='load', result='done', **self._labels)
 
         if self.save:
-            name = f'{uuid4()}.json'
-            self._save_json(self.articles[i], name)
-            await self._log('INFO', f'Article with url "{url}" was saved as "{name}".')
-
-        if self.loading_progress < self.loading_end:
-            print(f'\r{self.loading_progress} from {self.loading_end} articles', end='')
+            with self.metrics.time('loader_save_seconds', **self._labels):
+                self.sink.write(article, name)
+            await self._log('INFO', 'Article was saved.', url=url, name=name)
+        self._set_status(url, CrawlCheckpoint.DONE)
+
+        if self.stream:
+            self.progress.update(f'{self.loading_progress} articles')
+        elif self.loading_progress < self.loading_end:
+            self.progress.update(f'{self.loading_progress} from {self.loading_end} articles')
         elif self.loading_progress == self.loading_end:
             self.loading_progress += 1
-            print(f'\nLoading {self.NAME} {self.year} finished!\n')
+            self.progress.write(f'\nLoading {self.NAME} {self.year} finished!\n')
+        return True
+
+    async def fetch(self, url):
+        """
+        Kind of page is chosen by url: urls of "get_prepare" are day pages (exact dict of their args),
+        other urls are article pages
 
-    async def get_soup(self, url):
-        sleep(self.timeout)
+        :return: bytes raw content of page or None
+        """
+        method_name = 'parse_one_day_articles' if url in self._day_args else 'parse_article_text'
         try:
-            async with aiohttp.ClientSession() as session:
-                raw_response = await session.get(url=f'{self.host}{url}')
-                if raw_response.status != 200:
-                    print('Bad status! Use correct timeout.')
-                    await self._log('ERROR', f'Bad status from server! "{url}"')
-                    return
-                content = await raw_response.content.read()
+            start = monotonic()
+            with self.metrics.track('loader_in_flight', stage='fetch', **self._labels):
+                response = await self.request(f'{self.host}{url}', stop=self.get_stop(method_name))
+            latency = monotonic() - start
+            self.metrics.observe('loader_fetch_seconds', latency, **self._labels)
+            self.metrics.inc('loader_responses_total', status=response.status, **self._labels)
+            if response.status != 200:
+                if response.status == 404:
+                    self._not_found.add(url)
+                await self._log('ERROR', 'Bad status from server!', url=url, status=response.status, latency=latency)
+                return
 
             self.url_cache.add(url)
-            return BeautifulSoup(content, 'html.parser')
+            if self.archive is not None:
+                args = self._day_args[url] if method_name == 'parse_one_day_articles' else ()
+                self.archive.add(url, response.content, method_name, args, loader=self.NAME, status=response.status,
+                                 truncated=response.truncated)
+            await self._log('DEBUG', 'Fetched.', url=url, status=response.status, latency=latency)
+            return response.content
         except Exception as e:
-            await self._log('ERROR', f'{e, type(e)}')
+            self.metrics.inc('loader_fetch_errors_total', error=type(e).__name__, **self._labels)
+            await self._log('ERROR', f'{e, type(e)}', url=url)
 
-    async def _log(self, status, msg):
-        with open(self.log_path, 'a+') as logger:
-            logger.write(f'{status}:{msg}\n')
+    def _collect_metrics(self):
+        super()._collect_metrics()
+        self.metrics.set('loader_queue_size', self.load_queue.qsize(), queue='load', **self._labels)
+        self.metrics.set('loader_progress', self.preparing_progress, stage='prepare', **self._labels)
 
     def _get_all_dates(self):
         all_dates = []
         for day, month, year in it.product(range(1, 32), range(1, 13), range(self.year, self.year + 1)):
             try:
-                if datetime(year=year, month=month, day=day) > datetime.now():
+                date = datetime(year=year, month=month, day=day)
+                if date > datetime.now():
                     raise ValueError
             except ValueError:
                 continue
+            if self.start_date and date.date() < self.start_date or self.end_date and date.date() > self.end_date:
+                continue
             day = str(day).zfill(2)
             month = str(month).zfill(2)
             year = str(year)
             all_dates.append([day, month, year])
         return all_dates
 
-    def _save_json(self, article, name):
-        file = open(join(self.data_path, name), 'w')
-        json.dump(article, file, ensure_ascii=False)
-        file.close()
-
     def run(self):
         """ Main method, after finished you can find data in self.articles or in folder with path <path> """
         loop = asyncio.get_event_loop()
-        loop.run_until_complete(asyncio.gather(
-            self.prepare(), *[self.get() for _ in range(self.n_processes)]))
-        loop.run_until_complete(asyncio.gather(
-            self.load(), *[self.get() for _ in range(self.n_processes)]))
+        loop.run_until_complete(self.run_async())
 
+    async def run_stream(self):
+        """ Prepares days and loads their articles at the same time, articles go through "load_queue" """
+        load_workers = [asyncio.ensure_future(self.get(self.load_queue)) for _ in range(self.n_processes)]
+        try:
+            await asyncio.gather(self.prepare(), *[self.get() for _ in range(self.n_processes)])
+            for _ in range(self.n_processes):
+                await self._put(self.load_queue, self.KILL)
+            await asyncio.gather(*load_workers)
+        finally:
+            for load_worker in load_workers:
+                load_worker.cancel()
+
+    async def _run_workers(self):
+        if self.work_queue is not None:
+            await self.prepare()
+            await asyncio.gather(self.lease_work(), *[self.get() for _ in range(self.n_processes)])
+        elif self.stream:
+            await self.run_stream()
+        else:
+            await asyncio.gather(self.prepare(), *[self.get() for _ in range(self.n_processes)])
+            await asyncio.gather(self.load(), *[self.get() for _ in range(self.n_processes)])
+
+    def _close_state(self):
+        if self.seen_path:
+            self.url_cache.save(self.seen_path)
+        if self.dedupe is not None:
+            self.dedupe.commit()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
 
-class DataExternalIDLoader:
+
+class DataExternalIDLoader(FetchMixin, WorkerMixin):
 
     NAME = 'data_external_id'
+    PARSE_ONLY = {}
+    STOP_AFTER = {}
+    REVISIT_FIELDS = None
+    DATA_FOLDER_DEEP = 1
 
     LOAD = 'load'
     KILL = 'kill'
 
     def __init__(self, *, ids, sub_url, save, bs4_features, data_folder_path, data_folder_deep, queue_maxsize,
-                 n_processes, log_file_path=None):
+                 n_processes, log_file_path=None, http_client=None, rate_limit=None, burst=1, rate_limiter=None,
+                 n_parse_workers=0, parse_executor=None, sink=None, index_path=None, seen_path=None, log_level='INFO',
+                 logger=None, cache=None, retry_policy=None, concurrency=None, fast_parse=False, metrics=None,
+                 metrics_path=None, metrics_interval=10, progress_interval=1.0, early_stop=False, archive_path=None,
+                 probe_block_size=None, probe_samples=16, probe_min_density=0.02, revisit_path=None,
+                 revisit_budget=None, revisit_min_probability=0.0, work_queue=None, work_queue_path=None,
+                 worker_id=None, lease_size=10, lease_seconds=300, poll_interval=1.0, metrics_labels=None):
         """
         Base class for loading data from external_id, that have one page structure.
+        Needs to define static method "parse_data" (or async method "get_data", then parse stage is not available).
+        Class attribute PARSE_ONLY {'parse_data': <SoupStrainer>} declares tags, that are parsed by fast parser,
+        STOP_AFTER {'parse_data': (<tag>, <attrs>)} - element, after end of which the rest of page isn't needed,
+        REVISIT_FIELDS - fields of data, that are compared for detection of changes of page (None - all data).
+        DATA_FOLDER_DEEP - "data_folder_deep" of loader, it is used by "reextract".
         :param ids: iterable object with ids
         :param sub_url: template url with external_id, example: 'https://otvet.mail.ru/question/{external_id}'
         :param save: bool, True - save data, False - don't
@@ -250,6 +842,55 @@ class DataExternalIDLoader:
         :param queue_maxsize: maxsize of queue for tasks
         :param n_processes: processes count
         :param log_file_path: default as {NAME}.log
+        :param http_client: optional HttpClient with configured connection pool, it is shared between all requests;
+            by default loader creates own client (without ssl verification) and closes it at the end of run
+        :param rate_limit: optional max requests per second to host, None - without limits
+        :param burst: count of requests, that can be sent to host without waiting
+        :param rate_limiter: optional HostRateLimiter, that can be shared between loaders
+        :param n_parse_workers: count of worker processes for parsing of pages with fast parser,
+            0 - parse in event loop
+        :param parse_executor: optional ProcessPoolExecutor for parsing, that can be shared between loaders
+        :param sink: optional object with methods "write(record, name)" and "close()" for saving of data,
+            for example JsonLinesSink; by default JsonFileSink with "data_folder_deep" tree, that is closed by loader
+        :param index_path: optional path of CompletionIndex file with statuses of ids; if it is given, finished ids
+            are taken from it instead of scanning of "data_folder_path"
+        :param seen_path: optional path of file, where IdBitmap "loaded_external_ids" is loaded from and saved to
+            at the end of run
+        :param log_level: min level of events in log: 'DEBUG', 'INFO', 'WARNING' or 'ERROR'
+        :param logger: optional LoaderLogger, that can be shared between loaders
+        :param cache: optional ResponseCache, that is consulted before requests to server
+        :param retry_policy: optional RetryPolicy for retryable statuses and errors, default RetryPolicy()
+        :param concurrency: optional AdaptiveConcurrency, that limits requests in flight (it can be shared between
+            loaders); in this case "n_processes" is max count of requests in flight
+        :param fast_parse: True - parse pages in event loop with lxml and PARSE_ONLY strainer instead of "get_soup"
+            (it is always used with "n_parse_workers")
+        :param metrics: optional MetricsRegistry, that can be shared between loaders (metrics have label "loader")
+        :param metrics_path: optional path of file, where snapshots of metrics are appended as JSON lines
+        :param metrics_interval: seconds between snapshots of metrics
+        :param progress_interval: min seconds between updates of progress line, None - without progress
+        :param early_stop: True - reading of page is stopped after end of element of STOP_AFTER
+        :param archive_path: optional folder of RawArchive, where raw fetched pages are saved for offline extraction
+        :param probe_block_size: optional size of blocks of sparse probing of id space (see IdSpaceProber):
+            "probe_samples" ids of every block are loaded first, then blocks are loaded from dense to sparse,
+            blocks with density less than "probe_min_density" are skipped; None - all ids are loaded in order.
+            Ids with known results (index or loaded ids) are used as probes without requests.
+        :param probe_samples: count of probed ids in one block
+        :param probe_min_density: min share of found ids among probed ids of block, 0 - blocks aren't skipped
+        :param revisit_path: optional path of RevisitIndex, where time of fetch and hash of data of every loaded id
+            are saved for estimation of rates of changes
+        :param revisit_budget: optional count of ids for revisit mode: "ids" are ignored, ids with the highest
+            probability of change are selected from RevisitIndex and loaded again, 404 ids are removed from index
+        :param revisit_min_probability: min probability of change of revisited ids
+        :param work_queue: optional WorkQueue, that is shared by workers of one crawl (processes or machines):
+            ids are put to it, every worker leases them by batches and acks handled ids,
+            ids of dead workers are leased again after expiration of leases; probing isn't supported
+        :param work_queue_path: optional path of SqliteWorkQueue, if "work_queue" isn't given, it is closed by loader
+        :param worker_id: optional unique id of worker in work queue, default '<host>:<pid>:<random>'
+        :param lease_size: max count of ids in one lease
+        :param lease_seconds: seconds of lease, it is extended by heartbeat every "lease_seconds" / 3
+        :param poll_interval: seconds between leases, when there are no pending ids
+        :param metrics_labels: optional dict of other labels of metrics of loader, for example {'instance': 'a'};
+            metrics always have label "loader"
         """
 
         self.data_folder_path = data_folder_path
@@ -257,99 +898,246 @@ class DataExternalIDLoader:
         self.bs4_features = bs4_features
         self.n_processes = n_processes
         self.ids = ids
-        self.loaded_external_ids = {basename(path)[:-5] for path in glob(
-            join(data_folder_path, *['*' for _ in range(data_folder_deep)], '*.json')
-        )}
+        self.prober = IdSpaceProber(ids, probe_block_size, probe_samples, probe_min_density) \
+            if probe_block_size else None
+        # count of LOAD tasks in local queue, it is tracked only while id space is probed
+        self._probing = False
+        self._pending = 0
+        self._not_found = set()
+        self._probed = asyncio.Event()
+        if revisit_budget is not None and not revisit_path:
+            raise ValueError('Revisit mode needs "revisit_path".')
+        self.revisit = RevisitIndex(revisit_path, self.REVISIT_FIELDS) if revisit_path else None
+        self.revisit_budget = revisit_budget
+        self.revisit_min_probability = revisit_min_probability
+        self.work_queue = work_queue if work_queue is not None else (
+            SqliteWorkQueue(work_queue_path) if work_queue_path else None)
+        if self.work_queue is not None and self.prober is not None:
+            raise ValueError('Probing of id space is not supported with work queue.')
+        self._own_work_queue = work_queue is None
+        self.worker_id = worker_id or get_worker_id()
+        self.lease_size = lease_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.index = CompletionIndex(index_path) if index_path else None
+        self.seen_path = seen_path
+        if seen_path and exists(seen_path):
+            self.loaded_external_ids = IdBitmap.load(seen_path)
+        else:
+            self.loaded_external_ids = IdBitmap()
+        if self.index is None:
+            self.loaded_external_ids.update(int(basename(path)[:-5]) for path in glob(
+                join(data_folder_path, *['*' for _ in range(data_folder_deep)], '*.json')
+            ))
         self.save = save
         self.loading_progress = 0
         self.queue = asyncio.Queue(maxsize=queue_maxsize)
         self.sub_url = sub_url
+        self.http_client = http_client if http_client is not None else HttpClient(verify_ssl=False)
+        self._own_http_client = http_client is None
+        self.rate_limiter = rate_limiter if rate_limiter is not None else HostRateLimiter(rate=rate_limit, burst=burst)
+        self.cache = cache
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.concurrency = concurrency
+        self.n_parse_workers = n_parse_workers
+        self.parse_executor = parse_executor
+        self._own_parse_executor = False
+        self.fast_parse = fast_parse
+        self.early_stop = early_stop
+        self.archive = RawArchive(archive_path, prefix=self.NAME) if archive_path else None
+        self.sink = sink if sink is not None else JsonFileSink(data_folder_path)
+        self._own_sink = sink is None
         self.log_path = log_file_path if log_file_path else f'{self.NAME}.log'
+        self.logger = logger if logger is not None else LoaderLogger(self.log_path, level=log_level)
+        self._own_logger = logger is None
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.progress = ProgressReporter(progress_interval)
+        self._labels = dict(metrics_labels or {}, loader=self.NAME)
 
     async def load(self):
-        print('\nLoading...')
+        self.progress.write('\nLoading...')
 
-        for external_id in self.ids:
-            print(self.loading_progress, end='\r')
-            if external_id in self.loaded_external_ids:
+        if self.revisit_budget is not None:
+            external_ids = self.revisit.select(self.revisit_budget, min_probability=self.revisit_min_probability)
+            if self.work_queue is not None:
+                await self._put_work(self.LOAD, [(external_id,) for external_id in external_ids], reset=True)
+            else:
+                for external_id in external_ids:
+                    await self.queue.put((self.LOAD, (external_id,), monotonic()))
+        elif self.prober is None:
+            await self._put_ids(self.ids)
+        else:
+            self._probing = True
+            await self._put_ids(self.prober.sample())
+            if self._pending:
+                self._probed.clear()
+                await self._probed.wait()
+            for block in self.prober.plan():
+                await self._put_ids(self.prober.iter_block(block))
+            dead = self.prober.dead_ids_count()
+            self.loading_progress += dead
+            self.metrics.inc('loader_items_total', dead, stage='load', result='dead_block', **self._labels)
+            await self._log('INFO', 'Dead blocks were skipped.', ids=dead)
+
+        if self.work_queue is not None:
+            await self.lease_work()
+            return
+        for _ in range(self.n_processes):
+            await self.queue.put((self.KILL, None, monotonic()))
+
+    @property
+    def _work_names(self):
+        return {self.LOAD: f'{self.NAME}:load'}
+
+    @staticmethod
+    def _get_work_key(command, args):
+        return str(args[0])
+
+    async def _put_ids(self, ids, batch_size=1000):
+        work = []
+        for external_id in ids:
+            if external_id in self.loaded_external_ids or (self.index is not None and external_id in self.index):
+                if self.prober is not None:
+                    self.prober.record(external_id, external_id in self.loaded_external_ids or
+                                       self.index.get(external_id) == CompletionIndex.DONE)
                 self.loading_progress += 1
+                self.metrics.inc('loader_items_total', stage='load', result='skipped', **self._labels)
                 continue
-            await self.queue.put((self.LOAD, (external_id,)))
-
-        for _ in range(self.n_processes):
-            await self.queue.put((self.KILL, None))
+            if self.work_queue is not None:
+                work.append((external_id,))
+                if len(work) >= batch_size:
+                    await self._put_work(self.LOAD, work)
+                    work = []
+                continue
+            if self._probing:
+                self._pending += 1
+            await self.queue.put((self.LOAD, (external_id,), monotonic()))
+        if work:
+            await self._put_work(self.LOAD, work)
 
     async def get(self):
         while True:
-            command, data = await self.queue.get()
+            command, data, put_time = await self.queue.get()
+            if command != self.KILL:
+                self.metrics.observe('loader_queue_wait_seconds', monotonic() - put_time, command=command,
+                                     **self._labels)
             if command == self.LOAD:
-                await self.get_load(*data)
+                try:
+                    done = await self.get_load(*data)
+                    await self._ack_work(command, data, done)
+                finally:
+                    if self._probing:
+                        self._pending -= 1
+                        if not self._pending:
+                            self._probed.set()
             else:
                 break
 
-    async def get_data(self, external_id, soup):
+    @staticmethod
+    def parse_data(soup, external_id):
         """ Method for parse data from soup. Return JSON  """
         raise NotImplementedError
 
+    async def get_data(self, external_id, soup):
+        """ Method for parse data from soup. Return JSON  """
+        return self.parse_data(soup, external_id)
+
     async def get_load(self, external_id):
 
         self.loading_progress += 1
+        self.progress.update(f'{self.loading_progress} ids')
+
+        if self.parse_executor is None and not self.fast_parse:
+            soup = await self.get_soup(external_id)
+            if not soup:
+                self.metrics.inc('loader_items_total', stage='load', result='failed', **self._labels)
+                await self._log('WARNING', 'No soup.', id=external_id)
+                return self._pop_not_found(external_id)
+            with self.metrics.time('loader_extract_seconds', **self._labels):
+                data = await self.get_data(external_id, soup)
+        else:
+            content = await self.fetch(external_id)
+            if not content:
+                self.metrics.inc('loader_items_total', stage='load', result='failed', **self._labels)
+                await self._log('WARNING', 'No content.', id=external_id)
+                return self._pop_not_found(external_id)
+            data = await self.parse('parse_data', content, external_id)
 
-        soup = await self.get_soup(external_id)
-        if not soup:
-            await self._log('WARNING', f'No soup for external_id "{external_id}"')
-            return
-
-        data = await self.get_data(external_id, soup)
         if not data:
-            await self._log('WARNING', f'No text for external_id "{external_id}"')
-            return
-
+            self._set_status(external_id, CompletionIndex.FAILED)
+            self.metrics.inc('loader_items_total', stage='load', result='empty', **self._labels)
+            await self._log('WARNING', 'No text.', id=external_id)
+            return True
+
+        self._set_status(external_id, CompletionIndex.DONE)
+        self.metrics.inc('loader_items_total', stage='load', result='done', **self._labels)
+        if self.revisit is not None:
+            changed = self.revisit.update(external_id, data)
+            if changed is not None:
+                self.metrics.inc('loader_revisits_total', changed=changed, **self._labels)
         if self.save:
-            name = [f'{external_id}.json']
-            for _ in range(self.data_folder_deep):
-                name.append(str(external_id // 1000 % 1000))
-                external_id = external_id // 1000
+            path = get_data_path(external_id, self.data_folder_deep)
+            with self.metrics.time('loader_save_seconds', **self._labels):
+                self.sink.write(data, path)
+            await self._log('INFO', 'Data was saved.', id=external_id, name=path)
+        return True
 
-            path = join(*name[::-1])
-            sub_folder_path = dirname(join(self.data_folder_path, path))
-            if not exists(sub_folder_path):
-                makedirs(sub_folder_path)
-
-            self._save_json(data, path)
-            await self._log('INFO', f'Data saved as "{path}".')
-
-    async def get_soup(self, external_id):
+    async def fetch(self, external_id):
+        """
+        :return: bytes raw content of page or None
+        """
+        url = self.sub_url.format(external_id=external_id)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url=self.sub_url.format(external_id=external_id), verify_ssl=False) \
-                        as raw_response:
-                    if raw_response.status == 404:
-                        await session.close()
-                        return
-                    elif raw_response.status != 200:
-                        print('Bad status! Use correct timeout.')
-                        await self._log('ERROR', f'Bad status from server! "{external_id}"')
-                        await session.close()
-                        return
-                    content = await raw_response.content.read()
+            start = monotonic()
+            with self.metrics.track('loader_in_flight', stage='fetch', **self._labels):
+                response = await self.request(url, stop=self.get_stop('parse_data'))
+            latency = monotonic() - start
+            self.metrics.observe('loader_fetch_seconds', latency, **self._labels)
+            self.metrics.inc('loader_responses_total', status=response.status, **self._labels)
+            if response.status == 404:
+                self._not_found.add(external_id)
+                self._set_status(external_id, CompletionIndex.NOT_FOUND)
+                if self.revisit is not None:
+                    self.revisit.remove(external_id)
+                await self._log('DEBUG', 'Not found.', id=external_id, status=404, latency=latency)
+                return
+            elif response.status != 200:
+                self._set_status(external_id, CompletionIndex.FAILED)
+                await self._log('ERROR', 'Bad status from server!', id=external_id, status=response.status,
+                                latency=latency)
+                return
 
             self.loaded_external_ids.add(external_id)
-            return BeautifulSoup(content, self.bs4_features)
+            if self.archive is not None:
+                self.archive.add(url, response.content, 'parse_data', (external_id,), loader=self.NAME,
+                                 status=response.status, truncated=response.truncated)
+            await self._log('DEBUG', 'Fetched.', id=external_id, status=response.status, latency=latency)
+            return response.content
         except Exception as e:
-            await self._log('ERROR', f'{e, type(e)}')
-
-    async def _log(self, status, msg):
-        with open(self.log_path, 'a+') as logger:
-            logger.write(f'{status}:{msg}\n')
+            self._set_status(external_id, CompletionIndex.FAILED)
+            self.metrics.inc('loader_fetch_errors_total', error=type(e).__name__, **self._labels)
+            await self._log('ERROR', f'{e, type(e)}', id=external_id)
 
-    def _save_json(self, article, name):
-        file = open(join(self.data_folder_path, name), 'w')
-        json.dump(article, file, ensure_ascii=False)
-        file.close()
+    def _set_status(self, external_id, status):
+        if self.index is not None:
+            self.index.set(external_id, status)
+        if self.prober is not None:
+            self.prober.record(external_id, {CompletionIndex.DONE: True, CompletionIndex.NOT_FOUND: False}.get(status))
 
     def run(self):
         """ Main method """
         loop = asyncio.get_event_loop()
-        loop.run_until_complete(asyncio.gather(
-            self.load(), *[self.get() for _ in range(self.n_processes)]))
+        loop.run_until_complete(self.run_async())
+
+    async def _run_workers(self):
+        await asyncio.gather(self.load(), *[self.get() for _ in range(self.n_processes)])
+
+    def _close_state(self):
+        if self.seen_path:
+            self.loaded_external_ids.save(self.seen_path)
+        if self.index is not None:
+            self.index.close()
+        if self.revisit is not None:
+            self.revisit.close()
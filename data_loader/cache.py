@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import gzip
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from hashlib import sha256
+from os import makedirs, replace
+from os.path import join, exists
+from time import monotonic, time
+
+from .http import Response
+
+
+CacheEntry = namedtuple('CacheEntry', ['response', 'etag', 'last_modified', 'fetched'])
+
+_STOP = object()
+
+
+class ResponseCache:
+
+    def __init__(self, path, max_age=None, revalidate=True, batch_size=100, flush_interval=1.0):
+        """
+        On-disk cache of raw http responses. Bodies are stored compressed and content-addressed
+        (<path>/bodies/<sha256[:2]>/<sha256>.gz), urls with headers ETag/Last-Modified are kept in SQLite table.
+        Bodies are compressed and written in background thread and rows are committed by batches (like JsonLinesSink),
+        responses, that aren't written yet, are got from memory. Loaders call "get" in thread executor.
+
+        :param str path: directory of cache
+        :param optional max_age: seconds, while cached response is used without request; None - forever,
+            0 - every time ask server
+        :param bool revalidate: True - stale response is requested with If-None-Match/If-Modified-Since headers
+            and is taken from cache on status 304; False - stale response is loaded again
+        :param int batch_size: max count of responses in one commit
+        :param float flush_interval: max seconds between putting of response and its commit
+        """
+        self.path = path
+        self.max_age = max_age
+        self.revalidate = revalidate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if not exists(join(path, 'bodies')):
+            makedirs(join(path, 'bodies'))
+        self.connection = sqlite3.connect(join(path, 'cache.sqlite'), check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body_hash TEXT NOT NULL, '
+            'content_type TEXT, etag TEXT, last_modified TEXT, fetched REAL NOT NULL)'
+        )
+        self.connection.commit()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._error = None
+
+    def _body_path(self, body_hash):
+        return join(self.path, 'bodies', body_hash[:2], f'{body_hash}.gz')
+
+    def get(self, url):
+        """ :return: CacheEntry or None """
+        with self._lock:
+            entry = self._pending.get(url)
+            if entry is not None:
+                return entry
+            row = self.connection.execute(
+                'SELECT body_hash, content_type, etag, last_modified, fetched FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return
+        body_hash, content_type, etag, last_modified, fetched = row
+        try:
+            with gzip.open(self._body_path(body_hash), 'rb') as file:
+                content = file.read()
+        except (OSError, EOFError):
+            return
+        headers = {'Content-Type': content_type} if content_type else {}
+        return CacheEntry(Response(200, content, headers), etag, last_modified, fetched)
+
+    def is_fresh(self, entry):
+        return self.max_age is None or time() - entry.fetched < self.max_age
+
+    def conditional_headers(self, entry):
+        """ :return: headers for revalidation of stale entry or None """
+        if not self.revalidate:
+            return
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers or None
+
+    def put(self, url, response):
+        """ Puts response to queue of writer """
+        headers = response.headers or {}
+        entry = CacheEntry(Response(200, response.content, {'Content-Type': headers.get('Content-Type')}
+                                    if headers.get('Content-Type') else {}),
+                           headers.get('ETag'), headers.get('Last-Modified'), time())
+        self._write(url, entry)
+
+    def touch(self, url):
+        """ Marks cached response as fresh after status 304 """
+        with self._lock:
+            if url in self._pending:
+                self._pending[url] = self._pending[url]._replace(fetched=time())
+        self._write(url, None)
+
+    def _write(self, url, entry):
+        if self._error is not None:
+            raise self._error
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name='cache-writer', daemon=True)
+            self._thread.start()
+        if entry is not None:
+            with self._lock:
+                self._pending[url] = entry
+        self._queue.put((url, entry, time()))
+
+    def _work(self):
+        try:
+            stopped = False
+            while not stopped:
+                batch, flushed = [], None
+                item = self._queue.get()
+                deadline = monotonic() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        stopped = True
+                        break
+                    if isinstance(item, threading.Event):
+                        flushed = item
+                        break
+                    batch.append(item)
+                    timeout = deadline - monotonic()
+                    if len(batch) >= self.batch_size or timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write_batch(batch)
+                if flushed is not None:
+                    flushed.set()
+        except Exception as e:
+            self._error = e
+
+    def _write_batch(self, batch):
+        rows, touched = [], []
+        for url, entry, fetched in batch:
+            if entry is None:
+                touched.append((fetched, url))
+                continue
+            body_hash = sha256(entry.response.content).hexdigest()
+            body_path = self._body_path(body_hash)
+            if not exists(body_path):
+                if not exists(join(self.path, 'bodies', body_hash[:2])):
+                    makedirs(join(self.path, 'bodies', body_hash[:2]), exist_ok=True)
+                with gzip.open(f'{body_path}.tmp', 'wb') as file:
+                    file.write(entry.response.content)
+                replace(f'{body_path}.tmp', body_path)
+            rows.append((url, body_hash, entry.response.headers.get('Content-Type'), entry.etag,
+                         entry.last_modified, entry.fetched))
+
+        with self._lock:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO responses (url, body_hash, content_type, etag, last_modified, fetched) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self.connection.executemany('UPDATE responses SET fetched = ? WHERE url = ?', touched)
+            self.connection.commit()
+            for url, entry, _ in batch:
+                if entry is not None and self._pending.get(url) is entry:
+                    del self._pending[url]
+
+    def flush(self):
+        """ Waits, until all put responses are written """
+        if self._thread is not None:
+            flushed = threading.Event()
+            self._queue.put(flushed)
+            while not flushed.wait(0.1) and self._thread.is_alive():
+                pass
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        self.connection.close()
+        if self._error is not None:
+            raise self._error
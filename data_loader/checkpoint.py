@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+from datetime import date, timedelta
+from os import makedirs
+from os.path import dirname, exists
+from time import time
+
+
+class CrawlCheckpoint:
+
+    PENDING = 0
+    DONE = 1
+    EMPTY = 2
+    FAILED = 3
+
+    FINISHED = (DONE, EMPTY)
+
+    def __init__(self, path, commit_every=1000):
+        """
+        Persistent checkpoint of incremental loading of ArticleLoader (SQLite): processed day pages and statuses
+        of found articles. On next run loader fetches only new days and the last "recent_days" days (late additions)
+        and loads articles, that were found, but weren't finished (pending and failed).
+
+        :param str path: path of SQLite file
+        :param int commit_every: count of updates between commits, not committed updates are lost on kill
+        """
+        if dirname(path) and not exists(dirname(path)):
+            makedirs(dirname(path))
+        self.path = path
+        self.commit_every = commit_every
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS days (loader TEXT NOT NULL, day TEXT NOT NULL, articles INTEGER NOT NULL, '
+            'updated REAL NOT NULL, PRIMARY KEY (loader, day))'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS articles (url TEXT PRIMARY KEY, loader TEXT NOT NULL, header TEXT, date TEXT, '
+            'status INTEGER NOT NULL, updated REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS articles_status ON articles (loader, status)')
+        self.connection.commit()
+        self._not_committed = 0
+
+    def _updated(self):
+        self._not_committed += 1
+        if self._not_committed >= self.commit_every:
+            self.commit()
+
+    def get_days(self, loader):
+        """ :return: set of processed days 'YYYY-MM-DD' of loader """
+        return set(day for day, in self.connection.execute('SELECT day FROM days WHERE loader = ?', (loader,)))
+
+    def get_refetch_from(self, loader, recent_days):
+        """ :return: 'YYYY-MM-DD', processed days from it are fetched again; None - there are no processed days """
+        row = self.connection.execute('SELECT MAX(day) FROM days WHERE loader = ?', (loader,)).fetchone()
+        if row[0] is None:
+            return
+        return (date(*map(int, row[0].split('-'))) - timedelta(days=recent_days)).isoformat()
+
+    def set_day(self, loader, day, articles):
+        """ Marks day 'YYYY-MM-DD' as processed with count of found articles """
+        self.connection.execute(
+            'INSERT OR REPLACE INTO days (loader, day, articles, updated) VALUES (?, ?, ?, ?)',
+            (loader, day, articles, time())
+        )
+        self._updated()
+
+    def add_article(self, loader, article):
+        """ Adds found article as pending, status of known article isn't changed """
+        self.connection.execute(
+            'INSERT OR IGNORE INTO articles (url, loader, header, date, status, updated) VALUES (?, ?, ?, ?, ?, ?)',
+            (article['url'], loader, article.get('header'), article.get('date'), self.PENDING, time())
+        )
+        self._updated()
+
+    def set_status(self, url, status):
+        self.connection.execute('UPDATE articles SET status = ?, updated = ? WHERE url = ?', (status, time(), url))
+        self._updated()
+
+    def get_status(self, url):
+        """ :return: status of article or None """
+        row = self.connection.execute('SELECT status FROM articles WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def is_finished(self, url):
+        return self.get_status(url) in self.FINISHED
+
+    def iter_unfinished(self, loader):
+        """ :return: generator of pending and failed articles {'url', 'header', 'date', 'text'} of loader """
+        cursor = self.connection.execute(
+            'SELECT url, header, date FROM articles WHERE loader = ? AND status IN (?, ?) ORDER BY updated',
+            (loader, self.PENDING, self.FAILED)
+        )
+        for url, header, article_date in cursor.fetchall():
+            yield {'url': url, 'header': header, 'date': article_date, 'text': ''}
+
+    def commit(self):
+        self.connection.commit()
+        self._not_committed = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import re
+import sqlite3
+import threading
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from os import makedirs
+from os.path import dirname, exists
+from time import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+TRACKING_PARAMS = frozenset(['fbclid', 'gclid', 'yclid', '_openstat'])
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+TOKEN_PATTERN = re.compile(r'\w+')
+
+SIMHASH_BITS = 64
+
+Fingerprint = namedtuple('Fingerprint', ['hash', 'simhash', 'duplicate_of'])
+
+
+def canonicalize_url(url):
+    """
+    :return: url without fragment, tracking params (utm_*, fbclid, ...) and default port, with lower case scheme
+        and host and sorted query params; relative urls stay relative
+    """
+    scheme, netloc, path, query, _ = urlsplit(url.strip())
+    scheme = scheme.lower()
+    netloc = netloc.lower()
+    if ':' in netloc and netloc.rsplit(':', 1)[1] == DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(':', 1)[0]
+    params = [
+        (name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+        if not name.startswith('utm_') and name not in TRACKING_PARAMS
+    ]
+    return urlunsplit((scheme, netloc, path or ('/' if netloc else ''), urlencode(sorted(params)), ''))
+
+
+def get_tokens(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def content_hash(text):
+    """ :return: hex blake2b of text with normalized case and whitespaces """
+    return blake2b(' '.join(get_tokens(text)).encode(), digest_size=16).hexdigest()
+
+
+def simhash(text, shingle_size=3):
+    """ :return: 64-bit SimHash of word shingles, texts with small edits have close SimHash """
+    tokens = get_tokens(text)
+    shingles = Counter(
+        ' '.join(tokens[i:i + shingle_size]) for i in range(max(len(tokens) - shingle_size + 1, 1))
+    )
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in shingles.items():
+        value = int.from_bytes(blake2b(shingle.encode(), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def get_fingerprint(text, near_duplicates=True):
+    """ :return: (<content hash>, <SimHash or None>), it can be computed in worker process of parse executor """
+    return content_hash(text), simhash(text) if near_duplicates else None
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def to_signed(value):
+    """ SQLite keeps signed 64-bit integers """
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class FingerprintIndex:
+
+    def __init__(self, path, near_duplicates=True, max_distance=3, commit_every=1000):
+        """
+        Persistent index of fingerprints of extracted texts (SQLite). Exact duplicates are found by hash
+        of normalized text, near duplicates - by SimHash with Hamming distance not greater than "max_distance"
+        (SimHash is split into max_distance + 1 bands, near duplicate has at least one equal band).
+        Urls of added texts are kept too, so loader can skip them on next run. Loaders call "add_async",
+        it runs "add" in own thread of index, so hashing and queries don't block event loop and adds are serialized.
+
+        :param str path: path of SQLite file, ':memory:' - index without file
+        :param bool near_duplicates: True - find near duplicates by SimHash, False - only exact duplicates
+        :param int max_distance: max count of different bits of SimHash of near duplicates
+        :param int commit_every: count of updates between commits
+        """
+        if dirname(path) and not exists(dirname(path)):
+            makedirs(dirname(path))
+        self.path = path
+        self.near_duplicates = near_duplicates
+        self.max_distance = max_distance
+        self.commit_every = commit_every
+        n_bands = max_distance + 1
+        size = SIMHASH_BITS // n_bands
+        self.bands = [(i * size, SIMHASH_BITS if i == n_bands - 1 else (i + 1) * size) for i in range(n_bands)]
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._executor = None
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints (hash TEXT PRIMARY KEY, simhash INTEGER, url TEXT NOT NULL, '
+            'added REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE TABLE IF NOT EXISTS bands (band INTEGER, value INTEGER, hash TEXT)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS bands_value ON bands (band, value)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT NOT NULL)')
+        self.connection.commit()
+        self._not_committed = 0
+
+    def _get_bands(self, value):
+        return [(i, value >> start & ((1 << (end - start)) - 1)) for i, (start, end) in enumerate(self.bands)]
+
+    def find(self, text, fingerprint=None):
+        """
+        :param optional fingerprint: (<content hash>, <SimHash>) of text from "get_fingerprint", if it is computed
+        :return: Fingerprint of text, "duplicate_of" is url of the first text with the same fingerprint or None
+        """
+        if fingerprint is None:
+            fingerprint = get_fingerprint(text, self.near_duplicates)
+        text_hash, text_simhash = fingerprint
+        with self._lock:
+            return self._find(text_hash, text_simhash)
+
+    def _find(self, text_hash, text_simhash):
+        row = self.connection.execute('SELECT url FROM fingerprints WHERE hash = ?', (text_hash,)).fetchone()
+        if not self.near_duplicates:
+            return Fingerprint(text_hash, None, row[0] if row else None)
+
+        if row:
+            return Fingerprint(text_hash, text_simhash, row[0])
+        for band, value in self._get_bands(text_simhash):
+            for url, other in self.connection.execute(
+                'SELECT f.url, f.simhash FROM bands b JOIN fingerprints f ON f.hash = b.hash '
+                'WHERE b.band = ? AND b.value = ?', (band, value)
+            ):
+                if hamming_distance(text_simhash, other % (1 << 64)) <= self.max_distance:
+                    return Fingerprint(text_hash, text_simhash, url)
+        return Fingerprint(text_hash, text_simhash, None)
+
+    def add(self, url, text, fingerprint=None):
+        """
+        Adds url and fingerprint of its text, if it is not duplicate
+
+        :param optional fingerprint: (<content hash>, <SimHash>) of text from "get_fingerprint", if it is computed
+        :return: Fingerprint, "duplicate_of" is url of the first text with the same fingerprint or None
+        """
+        if fingerprint is None:
+            fingerprint = get_fingerprint(text, self.near_duplicates)
+        with self._lock:
+            return self._add(url, *fingerprint)
+
+    async def _run_async(self, method, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dedupe')
+        return await asyncio.get_event_loop().run_in_executor(self._executor, method, *args)
+
+    async def add_async(self, url, text, fingerprint=None):
+        """ The same as "add", but in own thread of index """
+        return await self._run_async(self.add, url, text, fingerprint)
+
+    async def contains_async(self, url):
+        """ The same as "url in index", but in own thread of index """
+        return await self._run_async(self.__contains__, url)
+
+    def _add(self, url, text_hash, text_simhash):
+        fingerprint = self._find(text_hash, text_simhash)
+        if fingerprint.duplicate_of is None:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO fingerprints (hash, simhash, url, added) VALUES (?, ?, ?, ?)',
+                (fingerprint.hash, to_signed(fingerprint.simhash) if fingerprint.simhash is not None else None,
+                 url, time())
+            )
+            if fingerprint.simhash is not None:
+                self.connection.executemany(
+                    'INSERT INTO bands (band, value, hash) VALUES (?, ?, ?)',
+                    [(band, value, fingerprint.hash) for band, value in self._get_bands(fingerprint.simhash)]
+                )
+        self.connection.execute('INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)', (url, fingerprint.hash))
+        self._not_committed += 1
+        if self._not_committed >= self.commit_every:
+            self.commit()
+        return fingerprint
+
+    def __contains__(self, url):
+        """ :return: True, if text of url was added """
+        with self._lock:
+            return self.connection.execute('SELECT 1 FROM urls WHERE url = ?', (url,)).fetchone() is not None
+
+    def __len__(self):
+        """ :return: count of unique fingerprints """
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+
+    def commit(self):
+        with self._lock:
+            self.connection.commit()
+            self._not_committed = 0
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.commit()
+        self.connection.close()
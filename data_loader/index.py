@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+from os import makedirs
+from os.path import dirname, exists
+from time import time
+
+
+class CompletionIndex:
+
+    DONE = 1
+    NOT_FOUND = 2
+    FAILED = 3
+
+    FINISHED = (DONE, NOT_FOUND)
+
+    def __init__(self, path, commit_every=1000, mmap_size=256 * 1024 ** 2):
+        """
+        Persistent index of statuses of external ids (SQLite table with integer primary key).
+        Loader updates it during loading and consults it on restart instead of scanning of saved files.
+        Ids with statuses DONE and NOT_FOUND are finished, FAILED ids are loaded again.
+
+        :param str path: path of SQLite file
+        :param int commit_every: count of updates between commits, not committed updates are lost on kill
+        :param int mmap_size: bytes of file, that are read through memory mapping
+        """
+        if dirname(path) and not exists(dirname(path)):
+            makedirs(dirname(path))
+        self.path = path
+        self.commit_every = commit_every
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS ids (id INTEGER PRIMARY KEY, status INTEGER NOT NULL, updated REAL NOT NULL)'
+        )
+        self.connection.commit()
+        self._not_committed = 0
+
+    def get(self, external_id):
+        """ :return: status of id or None """
+        row = self.connection.execute('SELECT status FROM ids WHERE id = ?', (int(external_id),)).fetchone()
+        return row[0] if row else None
+
+    def set(self, external_id, status):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO ids (id, status, updated) VALUES (?, ?, ?)', (int(external_id), status, time())
+        )
+        self._not_committed += 1
+        if self._not_committed >= self.commit_every:
+            self.commit()
+
+    def add(self, external_id):
+        self.set(external_id, self.DONE)
+
+    def __contains__(self, external_id):
+        return self.get(external_id) in self.FINISHED
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM ids').fetchone()[0]
+
+    def iter_ids(self, statuses=FINISHED):
+        """ :return: generator of ids with given statuses in ascending order """
+        placeholders = ', '.join('?' for _ in statuses)
+        cursor = self.connection.execute(f'SELECT id FROM ids WHERE status IN ({placeholders}) ORDER BY id', statuses)
+        for external_id, in cursor:
+            yield external_id
+
+    def commit(self):
+        self.connection.commit()
+        self._not_committed = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
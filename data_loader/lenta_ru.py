@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
+from bs4 import SoupStrainer
+
 from .base import ArticleLoader
+from .parsing import has_class
 
 
 class LentaRuLoader(ArticleLoader):
@@ -9,18 +12,27 @@ class LentaRuLoader(ArticleLoader):
     HOST = 'https://lenta.ru'
     DEFAULT_URL_TEMPLATE = '/news/{year}/{month}/{day}/'
 
+    PARSE_ONLY = {
+        'parse_one_day_articles': SoupStrainer('div', class_=has_class('b-tabloid__topic_news')),
+        'parse_article_text': SoupStrainer('div', itemprop='articleBody'),
+    }
+    # text of article is split into several "articleBody" elements (around photos and embeds),
+    # so pages aren't stopped early
+    STOP_AFTER = {}
+
     def __init__(self, year, save=True, data_folder_path=None, log_file_path=None, timeout=0,
-                 host=HOST, url_template=DEFAULT_URL_TEMPLATE, queue_maxsize=200, n_processes=10):
+                 host=HOST, url_template=DEFAULT_URL_TEMPLATE, queue_maxsize=200, n_processes=10, **kwargs):
         super().__init__(year=year, host=host, url_template=url_template, save=save, data_folder_path=data_folder_path,
                          timeout=timeout, queue_maxsize=queue_maxsize, n_processes=n_processes,
-                         log_file_path=log_file_path)
+                         log_file_path=log_file_path, **kwargs)
 
-    async def prepare_one_day_articles(self, soup,  year, month, day):
+    @staticmethod
+    def parse_one_day_articles(soup, year, month, day):
         """
         :return: list of dict {'url': <url>, 'header': <header>}
         """
         one_day_articles = []
-        for div in soup.find_all('div', attrs='b-tabloid__topic_news'):
+        for div in soup.find_all('div', class_='b-tabloid__topic_news'):
             a = div.a
             url = a['href']
             if f'/{year}/{month}/' in url:
@@ -31,13 +43,13 @@ class LentaRuLoader(ArticleLoader):
 
         return one_day_articles
 
-    async def get_article_text(self, soup):
+    @staticmethod
+    def parse_article_text(soup):
         """
         :return: str text
         """
         text = ''
-        for div in soup.find_all('div', attrs=['b-text']):
-            if div['itemprop'] == 'articleBody':
-                text = f'{text} {div.text}'
+        for div in soup.find_all('div', class_='b-text', itemprop='articleBody'):
+            text = f'{text} {div.text}'
 
         return text
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import json
+import atexit
+import threading
+from collections import deque
+from os import makedirs
+from os.path import dirname, exists
+from time import time
+
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+
+def get_level_number(level):
+    """ :return: number of level by its name or name with prefix, for example 'PREPARING_WARNING' -> 30 """
+    return LEVELS.get(level, LEVELS.get(level.rsplit('_', 1)[-1], LEVELS['INFO']))
+
+
+class LoaderLogger:
+
+    def __init__(self, path, level='INFO', buffer_size=100000, flush_size=1000, flush_interval=1.0):
+        """
+        Buffered logger of loader events. Records are appended to in-memory ring buffer and are formatted and written
+        as JSON lines {"ts": ..., "level": ..., "msg": ..., <fields>} by background thread, when buffer has
+        "flush_size" records or every "flush_interval" seconds. Records with lower level are dropped before formatting.
+        If writer doesn't keep up, the oldest records are dropped and counted in "dropped".
+
+        :param str path: path of log file
+        :param str level: min level: 'DEBUG', 'INFO', 'WARNING' or 'ERROR'
+        :param int buffer_size: max count of records in buffer
+        :param int flush_size: count of records in buffer, that triggers flush
+        :param float flush_interval: max seconds between flushes
+        """
+        self.path = path
+        self.level = level
+        self.level_number = get_level_number(level)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.records = deque(maxlen=buffer_size)
+        self.dropped = 0
+
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._registered = False
+
+    def is_enabled(self, level):
+        return get_level_number(level) >= self.level_number
+
+    def log(self, level, msg, **fields):
+        if get_level_number(level) < self.level_number:
+            return
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append((time(), level, msg, fields))
+
+        if self._thread is None:
+            self._start()
+        if len(self.records) >= self.flush_size:
+            self._event.set()
+
+    def flush(self):
+        """ Writes all buffered records to file """
+        with self._lock:
+            lines = []
+            while self.records:
+                ts, level, msg, fields = self.records.popleft()
+                lines.append(json.dumps(dict(ts=round(ts, 6), level=level, msg=msg, **fields),
+                                        ensure_ascii=False, default=str))
+            if not lines:
+                return
+            if dirname(self.path) and not exists(dirname(self.path)):
+                makedirs(dirname(self.path))
+            with open(self.path, 'a') as file:
+                file.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        self._closed = True
+        if self._thread is not None:
+            self._event.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _start(self):
+        self._closed = False
+        self._thread = threading.Thread(target=self._work, name='loader-logger', daemon=True)
+        self._thread.start()
+        if not self._registered:
+            atexit.register(self.flush)
+            self._registered = True
+
+    def _work(self):
+        while not self._closed:
+            self._event.wait(self.flush_interval)
+            self._event.clear()
+            self.flush()
@@ -1,10 +1,23 @@
 # -*- coding: utf-8 -*-
+from bs4 import SoupStrainer
+
 from .base import DataExternalIDLoader
+from .parsing import has_class
 
 
 class AnswerMailRuLoader(DataExternalIDLoader):
 
-    def __init__(self, *, ids, save, data_folder_path, queue_maxsize, n_processes):
+    SUB_URL = 'https://otvet.mail.ru/question/{external_id}'
+    REVISIT_FIELDS = ('comments', 'answers')
+    DATA_FOLDER_DEEP = 2
+
+    PARSE_ONLY = {
+        'parse_data': SoupStrainer(
+            ['h1', 'div', 'a'], class_=has_class('q--qtext', 'q--qcomment', 'list__title', 'selected', 'a--atext')
+        ),
+    }
+
+    def __init__(self, *, ids, save, data_folder_path, queue_maxsize, n_processes, sub_url=SUB_URL, **kwargs):
         """
         Async multiprocessing loader of Answer Mail Ru
 
@@ -13,19 +26,23 @@ class AnswerMailRuLoader(DataExternalIDLoader):
         :param data_folder_path: folder for load data
         :param queue_maxsize: maxsize of queue for tasks
         :param n_processes: processes count
+        :param sub_url: template url with external_id
+        :param kwargs: other optional params of DataExternalIDLoader, for example http_client
         """
         super().__init__(
             ids=ids,
-            sub_url='https://otvet.mail.ru/question/{external_id}',
+            sub_url=sub_url,
             save=save,
             bs4_features='lxml',
             data_folder_path=data_folder_path,
-            data_folder_deep=2,
+            data_folder_deep=self.DATA_FOLDER_DEEP,
             queue_maxsize=queue_maxsize,
-            n_processes=n_processes
+            n_processes=n_processes,
+            **kwargs
         )
 
-    async def get_data(self, external_id, soup):
+    @staticmethod
+    def parse_data(soup, external_id):
 
         title = soup.find('h1', 'q--qtext').text.strip()
         raw_comments = soup.find_all('div', 'q--qcomment medium')
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import sys
+import json
+import asyncio
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import monotonic, time
+
+from aiohttp import web
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Histogram of values with fixed upper bounds of buckets (like in Prometheus)
+
+        :param buckets: sorted upper bounds of buckets, bucket +Inf is added
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """ :return: upper bound of bucket with q-th percentile (not greater than max value) or None """
+        if not self.count:
+            return
+        rank = q / 100 * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative_counts(self):
+        """ :return: list of (upper bound, count of values not greater than bound), the last bound is inf """
+        result, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            result.append((bound, cumulative))
+        return result
+
+
+def format_labels(labels, **extra):
+    labels = list(labels) + list(extra.items())
+    if not labels:
+        return ''
+    values = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        values.append(f'{name}="{value}"')
+    return '{' + ','.join(values) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        In-memory registry of counters, gauges and histograms with labels, that can be shared between loaders.
+        It is changed only from event loop, values are read by "get", "snapshot" (dict for JSON)
+        or "to_prometheus" (text format of Prometheus).
+
+        :param buckets: upper bounds of buckets of histograms in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.collectors = []
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """ Increases counter """
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """ Sets value of gauge """
+        self.gauges[self._key(name, labels)] = value
+
+    def add(self, name, value, **labels):
+        """ Adds value (it can be negative) to gauge """
+        key = self._key(name, labels)
+        self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """ Adds value to histogram """
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def get(self, name, **labels):
+        """ :return: value of counter or gauge, Histogram or None """
+        key = self._key(name, labels)
+        for metrics in (self.counters, self.gauges, self.histograms):
+            if key in metrics:
+                return metrics[key]
+
+    @contextmanager
+    def time(self, name, **labels):
+        """ Observes seconds of block in histogram, it can be used around "await" """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, monotonic() - start, **labels)
+
+    @contextmanager
+    def track(self, name, **labels):
+        """ Gauge of blocks in progress, for example requests in flight """
+        self.add(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add(name, -1, **labels)
+
+    def add_collector(self, collector):
+        """ :param collector: function without args, that updates gauges before reading of metrics """
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def collect(self):
+        for collector in list(self.collectors):
+            collector()
+
+    def snapshot(self):
+        """
+        :return: dict {'counters': {<name>: [{'labels': ..., 'value': ...}]}, 'gauges': ...,
+            'histograms': {<name>: [{'labels': ..., 'count': ..., 'sum': ..., 'p50': ..., 'p90': ..., 'p99': ...,
+            'max': ...}]}}
+        """
+        self.collect()
+        snapshot = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        for kind, metrics in (('counters', self.counters), ('gauges', self.gauges)):
+            for (name, labels), value in sorted(metrics.items()):
+                snapshot[kind].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            snapshot['histograms'].setdefault(name, []).append({
+                'labels': dict(labels),
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'p50': histogram.percentile(50),
+                'p90': histogram.percentile(90),
+                'p99': histogram.percentile(99),
+                'max': histogram.max,
+            })
+        return snapshot
+
+    def write_snapshot(self, path):
+        """ Appends snapshot with timestamp "ts" to file of JSON lines """
+        with open(path, 'a') as file:
+            file.write(json.dumps(dict(ts=round(time(), 6), **self.snapshot()), ensure_ascii=False) + '\n')
+
+    def to_prometheus(self):
+        """ :return: str metrics in text format of Prometheus """
+        self.collect()
+        lines = []
+        for kind, metrics in (('counter', self.counters), ('gauge', self.gauges)):
+            last_name = None
+            for (name, labels), value in sorted(metrics.items()):
+                if name != last_name:
+                    lines.append(f'# TYPE {name} {kind}')
+                    last_name = name
+                lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+
+        last_name = None
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            if name != last_name:
+                lines.append(f'# TYPE {name} histogram')
+                last_name = name
+            for bound, count in histogram.cumulative_counts():
+                lines.append(f'{name}_bucket{format_labels(labels, le=format_value(bound))} {count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_value(histogram.sum)}')
+            lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+async def write_snapshots(registry, path, interval):
+    """ Appends snapshot of registry to file of JSON lines every "interval" seconds, until it is cancelled """
+    while True:
+        await asyncio.sleep(interval)
+        registry.write_snapshot(path)
+
+
+class MetricsServer:
+
+    def __init__(self, registry, host='127.0.0.1', port=9100):
+        """
+        Http endpoint of metrics: GET /metrics - text format of Prometheus, GET /metrics.json - snapshot.
+        It works in event loop of loaders, usage: async with MetricsServer(loader.metrics): await loader.run_async()
+
+        :param MetricsRegistry registry: metrics
+        :param str host: host for listening
+        :param int port: port for listening, 0 - any free port
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def handle_prometheus(self, request):
+        return web.Response(body=self.registry.to_prometheus().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def handle_json(self, request):
+        return web.json_response(self.registry.snapshot())
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_prometheus)
+        app.router.add_get('/metrics.json', self.handle_json)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        self.port = self.runner.addresses[0][1]
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class ProgressReporter:
+
+    def __init__(self, interval=1.0, file=None):
+        """
+        Rate-limited progress line instead of print on every item
+
+        :param optional interval: min seconds between updates of progress line, None - don't write anything
+        :param optional file: stream for writing, default sys.stdout
+        """
+        self.interval = interval
+        self.file = file
+        self._last = None
+
+    def update(self, text):
+        """ Rewrites progress line, if "interval" seconds passed since the last update """
+        if self.interval is None:
+            return
+        now = monotonic()
+        if self._last is not None and now - self._last < self.interval:
+            return
+        self._last = now
+        print(f'\r{text}', end='', file=self.file or sys.stdout, flush=True)
+
+    def write(self, text):
+        """ Writes line at once """
+        if self.interval is None:
+            return
+        self._last = None
+        print(text, file=self.file or sys.stdout, flush=True)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+import os
+import queue
+import threading
+from datetime import datetime
+from os import makedirs
+from os.path import join, exists
+from urllib.parse import quote
+from uuid import uuid4
+
+from .reader import CorpusReader, normalize_date
+from .sinks import PART
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+PARTITIONS = ('year', 'month', 'category', 'sub_category')
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+_STOP = object()
+
+
+def _check_pyarrow():
+    if pyarrow is None:
+        raise ImportError('Parquet export needs package "pyarrow", install it with "pip install data-loader[parquet]"')
+
+
+def get_article_schema():
+    """ :return: schema of articles of ArticleLoader, "date" is converted from 'DD.MM.YYYY' to date """
+    _check_pyarrow()
+    return pyarrow.schema([
+        ('url', pyarrow.string()),
+        ('header', pyarrow.string()),
+        ('date', pyarrow.date32()),
+        ('text', pyarrow.string()),
+        ('fingerprint', pyarrow.string()),
+    ])
+
+
+def get_data_schema():
+    """ :return: schema of data of AnswerMailRuLoader, categories are dictionary-encoded """
+    _check_pyarrow()
+    category = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    return pyarrow.schema([
+        ('id', pyarrow.string()),
+        ('title', pyarrow.string()),
+        ('category', category),
+        ('sub_category', category),
+        ('comments', pyarrow.list_(pyarrow.string())),
+        ('answers', pyarrow.list_(pyarrow.string())),
+    ])
+
+
+def get_partition(record, partition_by):
+    """ :return: tuple of (<name>, <value>) of hive partition of record, year and month are taken from "date" """
+    date = normalize_date(record.get('date'))
+    values = {'year': date[:4] if date else None, 'month': date[5:7] if date else None}
+    partition = []
+    for name in partition_by:
+        value = values[name] if name in values else record.get(name)
+        partition.append((name, DEFAULT_PARTITION if value is None else str(value)))
+    return tuple(partition)
+
+
+class ParquetSink:
+
+    def __init__(self, data_folder_path, *, schema=None, partition_by=('year', 'month'), prefix='part',
+                 row_group_size=10000, max_rows_per_file=1000000, max_buffered_rows=100000, compression='zstd'):
+        """
+        Columnar export of records to Parquet files, partitioned by hive folders
+        "<data_folder_path>/<name>=<value>/.../<prefix>-<run id>-<number>.parquet". Records are buffered by partitions
+        and written by row groups, so memory is bounded by "max_buffered_rows". It has interface of sink of loaders,
+        so it can be used in run directly, or it can export saved records (see "export_parquet").
+        Records are converted, buffered and written in background thread (as in JsonLinesSink),
+        so "write" doesn't block event loop by encoding and compression of row groups.
+        Open file has suffix ".part" (footer of Parquet is written at closing), it is renamed after rotation or closing.
+
+        :param str data_folder_path: abs path of directory for Parquet files
+        :param optional schema: pyarrow.Schema of records, by default schema of articles ("get_article_schema")
+            or of data ("get_data_schema") is chosen by the first record; other keys of records are dropped
+        :param partition_by: names of partition columns: 'year', 'month' (from "date"), 'category', 'sub_category';
+            columns of partitions aren't kept in files
+        :param str prefix: prefix of file names
+        :param int row_group_size: count of records in one row group
+        :param int max_rows_per_file: max count of records in one file
+        :param int max_buffered_rows: max count of records in buffers of all partitions
+        :param str compression: compression of Parquet: 'zstd', 'snappy', 'gzip' or 'none'
+        """
+        _check_pyarrow()
+        for name in partition_by:
+            if name not in PARTITIONS:
+                raise ValueError(f'Unknown partition "{name}", use some of {list(PARTITIONS)}')
+        self.data_folder_path = data_folder_path
+        self.schema = schema
+        self.partition_by = tuple(partition_by)
+        self.prefix = prefix
+        self.row_group_size = row_group_size
+        self.max_rows_per_file = max_rows_per_file
+        self.max_buffered_rows = max_buffered_rows
+        self.compression = compression
+
+        self.run_id = uuid4().hex[:8]
+        self.files = []
+        self.records_count = 0
+
+        self._file_schema = None
+        self._buffers = {}
+        self._buffered = 0
+        self._writers = {}
+        self._file_number = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._error = None
+
+        if not exists(data_folder_path):
+            makedirs(data_folder_path)
+
+    def _init_schema(self, record):
+        if self.schema is None:
+            self.schema = get_article_schema() if 'url' in record else get_data_schema()
+        self._file_schema = pyarrow.schema([field for field in self.schema if field.name not in self.partition_by])
+
+    def _to_row(self, record):
+        row = {name: record.get(name) for name in self._file_schema.names}
+        if 'date' in row and row['date'] is not None:
+            date = normalize_date(row['date'])
+            row['date'] = datetime.strptime(date, '%Y-%m-%d').date() if date else None
+        return row
+
+    def write(self, record, name=None):
+        """ Puts record to queue of writer, "name" is ignored: records don't have own files """
+        if self._error is not None:
+            raise self._error
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name=f'{self.prefix}-parquet-writer', daemon=True)
+            self._thread.start()
+        self._queue.put(record)
+
+    def _work(self):
+        try:
+            while True:
+                record = self._queue.get()
+                if record is _STOP:
+                    break
+                self._add(record)
+            self._close_files()
+        except Exception as e:
+            self._error = e
+
+    def _add(self, record):
+        """ Adds record to buffer of its partition """
+        if self._file_schema is None:
+            self._init_schema(record)
+        partition = get_partition(record, self.partition_by)
+        buffer = self._buffers.setdefault(partition, [])
+        buffer.append(self._to_row(record))
+        self._buffered += 1
+        if len(buffer) >= self.row_group_size:
+            self._flush(partition)
+        elif self._buffered >= self.max_buffered_rows:
+            self._flush(max(self._buffers, key=lambda key: len(self._buffers[key])))
+
+    def _open_file(self, partition):
+        folder_path = join(self.data_folder_path, *[f'{name}={quote(value, safe="")}' for name, value in partition])
+        makedirs(folder_path, exist_ok=True)
+        path = join(folder_path, f'{self.prefix}-{self.run_id}-{str(self._file_number).zfill(5)}.parquet')
+        self._file_number += 1
+        writer = pyarrow.parquet.ParquetWriter(
+            f'{path}{PART}', self._file_schema, compression=self.compression,
+            use_dictionary=[field.name for field in self._file_schema
+                            if pyarrow.types.is_dictionary(field.type)],
+        )
+        self._writers[partition] = [writer, path, 0]
+        return self._writers[partition]
+
+    def _finish_file(self, partition):
+        writer, path, _ = self._writers.pop(partition)
+        writer.close()
+        os.rename(f'{path}{PART}', path)
+        self.files.append(path)
+
+    def _flush(self, partition):
+        rows = self._buffers.pop(partition, [])
+        self._buffered -= len(rows)
+        while rows:
+            state = self._writers.get(partition) or self._open_file(partition)
+            part, rows = rows[:self.max_rows_per_file - state[2]], rows[self.max_rows_per_file - state[2]:]
+            state[0].write_table(pyarrow.Table.from_pylist(part, schema=self._file_schema),
+                                 row_group_size=self.row_group_size)
+            state[2] += len(part)
+            self.records_count += len(part)
+            if state[2] >= self.max_rows_per_file:
+                self._finish_file(partition)
+
+    def close(self):
+        """ Writes buffered records and closes all files """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    def _close_files(self):
+        for partition in list(self._buffers):
+            self._flush(partition)
+        for partition in list(self._writers):
+            self._finish_file(partition)
+
+
+def export_parquet(source, data_folder_path, batch_size=10000, date_from=None, date_to=None, category=None,
+                   **sink_kwargs):
+    """
+    Converts saved records to partitioned Parquet files, records are read by batches through CorpusReader
+
+    :param source: CorpusReader or path of folder with saved records (json files or JSON Lines shards)
+    :param str data_folder_path: abs path of directory for Parquet files
+    :param int batch_size: count of records in one read batch
+    :param date_from: first date of records, 'YYYY-MM-DD' or date
+    :param date_to: last date of records, 'YYYY-MM-DD' or date
+    :param category: category of records
+    :param sink_kwargs: params of ParquetSink
+    :return: list of paths of written files
+    """
+    reader = source if isinstance(source, CorpusReader) else CorpusReader(source)
+    try:
+        reader.build()
+        sink = ParquetSink(data_folder_path, **sink_kwargs)
+        for batch in reader.iter_batches(batch_size, date_from=date_from, date_to=date_to, category=category):
+            for record in batch:
+                sink.write(record)
+        sink.close()
+    finally:
+        if reader is not source:
+            reader.close()
+    return sink.files
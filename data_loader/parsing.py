@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+
+FAST_FEATURES = 'lxml'
+
+
+def has_class(*names):
+    """
+    :return: matcher of tag class for SoupStrainer, it works both with raw attribute string (while parsing)
+        and with list of classes
+    """
+    names = frozenset(names)
+
+    def match(value):
+        if not value:
+            return False
+        return not names.isdisjoint(value.split() if isinstance(value, str) else value)
+    return match
+
+
+def make_soup(content, features, parse_only=None):
+    return BeautifulSoup(content, features, parse_only=parse_only)
+
+
+def extract(loader_cls, method_name, content, *args):
+    """
+    Builds soup from raw content with fast parser and calls static parse method of loader class.
+    Only tags of SoupStrainer "loader_cls.PARSE_ONLY[method_name]" (with their children) are put to soup.
+    It can be executed in worker process, so loader class must be importable there and only raw bytes
+    and small extracted result are sent between processes.
+
+    :param loader_cls: class of loader, for example LentaRuLoader
+    :param str method_name: name of static parse method, for example 'parse_article_text'
+    :param bytes content: raw content of page
+    :param args: other args of parse method
+    """
+    return extract_timed(loader_cls, method_name, content, *args)[0]
+
+
+def extract_timed(loader_cls, method_name, content, *args):
+    """ The same as "extract", but returns (<result>, <seconds of building of soup>, <seconds of parse method>) """
+    start = perf_counter()
+    soup = make_soup(content, FAST_FEATURES, loader_cls.PARSE_ONLY.get(method_name))
+    parsed = perf_counter()
+    result = getattr(loader_cls, method_name)(soup, *args)
+    return result, parsed - start, perf_counter() - parsed
+
+
+class ElementEnd:
+
+    def __init__(self, tag, attrs=None):
+        """
+        Incremental lxml parser of chunks of page, that finds end of the first element with given tag and attributes,
+        after it the rest of page isn't needed for extraction (see "STOP_AFTER" of loaders)
+
+        :param str tag: name of tag, for example 'div'
+        :param optional attrs: dict {<attribute>: <value>}, value of 'class' is one of classes of element
+        """
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.parser = etree.HTMLPullParser(events=('end',), tag=tag)
+        self.found = False
+
+    def match(self, element):
+        for name, value in self.attrs.items():
+            actual = element.get(name)
+            if actual is None or (value not in actual.split() if name == 'class' else actual != value):
+                return False
+        return True
+
+    def feed(self, chunk):
+        """ :return: True, if end of element was found """
+        if not self.found:
+            self.parser.feed(chunk)
+            self.found = any(self.match(element) for _, element in self.parser.read_events())
+        return self.found
+
+
+def create_parse_executor(n_workers):
+    return ProcessPoolExecutor(max_workers=n_workers)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import random
+
+
+class IdSpaceProber:
+
+    def __init__(self, ids, block_size=1000, samples=16, min_density=0.02, seed=0):
+        """
+        Sparse probing of id space: ids are split into blocks of "block_size" consecutive ids, "samples" ids of every
+        block are loaded first, then density of block (share of found ids among probed ids) is estimated and other ids
+        are loaded from dense blocks to sparse ones; blocks with density less than "min_density" are skipped.
+
+        :param ids: range or other sequence of ids
+        :param int block_size: count of ids in one block
+        :param int samples: count of probed ids in one block
+        :param float min_density: blocks with less density are skipped, 0 - blocks are only ordered by density
+        :param seed: seed of random choice of probed ids, with the same seed the same ids are probed after restart
+        """
+        if not hasattr(ids, '__getitem__'):
+            ids = list(ids)
+        self.ids = ids
+        self.block_size = block_size
+        self.samples = samples
+        self.min_density = min_density
+        self.random = random.Random(seed)
+        self.blocks = [ids[start:start + block_size] for start in range(0, len(ids), block_size)]
+        self.found = [0] * len(self.blocks)
+        self.not_found = [0] * len(self.blocks)
+        self.probed = set()
+        if isinstance(ids, range):
+            self._positions = None
+        else:
+            self._positions = {external_id: i for i, external_id in enumerate(ids)}
+
+    def get_block(self, external_id):
+        """ :return: number of block of id or None """
+        if self._positions is None:
+            if external_id not in self.ids:
+                return
+            return self.ids.index(external_id) // self.block_size
+        position = self._positions.get(external_id)
+        return position // self.block_size if position is not None else None
+
+    def sample(self):
+        """ :return: list of probed ids, one random id from every of "samples" equal parts of every block """
+        probed = []
+        for block in self.blocks:
+            n = min(self.samples, len(block))
+            for i in range(n):
+                start, end = len(block) * i // n, len(block) * (i + 1) // n
+                probed.append(block[self.random.randrange(start, end)])
+        self.probed.update(probed)
+        return probed
+
+    def record(self, external_id, found):
+        """
+        :param external_id: id with known result
+        :param found: True - id exists, False - not found (404), None - unknown (error), it is ignored
+        """
+        if found is None:
+            return
+        block = self.get_block(external_id)
+        if block is None:
+            return
+        if found:
+            self.found[block] += 1
+        else:
+            self.not_found[block] += 1
+
+    def density(self, block):
+        """ :return: share of found ids among ids of block with known result, None - without results """
+        known = self.found[block] + self.not_found[block]
+        return self.found[block] / known if known else None
+
+    def is_dead(self, block):
+        density = self.density(block)
+        return density is not None and density < self.min_density
+
+    def plan(self):
+        """ :return: numbers of blocks from dense to sparse without dead blocks, blocks without results are first """
+        return sorted(
+            (block for block in range(len(self.blocks)) if not self.is_dead(block)),
+            key=lambda block: (-(self.density(block) if self.density(block) is not None else 1), block)
+        )
+
+    def iter_block(self, block):
+        """ :return: generator of not probed ids of block """
+        for external_id in self.blocks[block]:
+            if external_id not in self.probed:
+                yield external_id
+
+    def dead_ids_count(self):
+        """ :return: count of not probed ids of dead blocks """
+        return sum(
+            sum(1 for _ in self.iter_block(block)) for block in range(len(self.blocks)) if self.is_dead(block)
+        )
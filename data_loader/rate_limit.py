@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from time import monotonic
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst=1):
+        """
+        Async token bucket. Tokens are refilled with speed "rate" per second up to "burst" tokens,
+        every request takes one token. Waiting requests sleep without blocking of event loop
+        and get tokens in FIFO order.
+
+        :param float rate: requests per second, None or 0 - without limits
+        :param int burst: max count of requests, that can be sent immediately one after another
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_wait(self, queued=0):
+        """ :return: seconds until token of the next request, when "queued" requests wait before it """
+        if not self.rate:
+            return 0
+        tokens = min(self.burst, self.tokens + (monotonic() - self.updated) * self.rate)
+        return max(queued + 1 - tokens, 0) / self.rate
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class HostRateLimiter:
+
+    def __init__(self, rate=None, burst=1, per_host=None):
+        """
+        Token buckets keyed by host of url. One limiter can be shared between loaders for global politeness.
+
+        :param float rate: default requests per second for every host, None - without limits
+        :param int burst: default burst for every host
+        :param optional per_host: dict {<host>: (<rate>, <burst>)} with limits for special hosts
+        """
+        self.rate = rate
+        self.burst = burst
+        self.per_host = dict(per_host or {})
+        self.buckets = {}
+
+    def get_bucket(self, host):
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate, burst = self.per_host.get(host, (self.rate, self.burst))
+            bucket = self.buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    async def acquire(self, url):
+        await self.get_bucket(urlsplit(url).netloc).acquire()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import sqlite3
+from collections import OrderedDict
+from datetime import date, datetime
+from os.path import join, relpath
+
+from .sinks import EXTENSIONS, get_compression, iter_members, _decompressor
+
+
+INDEX_NAME = 'corpus-index.sqlite'
+
+
+def normalize_date(value):
+    """ :return: 'YYYY-MM-DD' from 'DD.MM.YYYY' (date of articles), 'YYYY-MM-DD' or date; None for other values """
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if not isinstance(value, str):
+        return
+    for date_format in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+
+
+def get_key(record):
+    """ :return: key of record: url of article or id of data """
+    key = record.get('url', record.get('id'))
+    return str(key) if key is not None else None
+
+
+def is_corpus_file(name):
+    return name.endswith('.json') or any(name.endswith(extension) for extension in EXTENSIONS.values())
+
+
+class CorpusReader:
+
+    def __init__(self, data_folder_path, index_path=None, mmap_size=256 * 1024 ** 2, max_open_files=64):
+        """
+        Random-access reader of saved records: json files of JsonFileSink (any folder tree, for example
+        "data_folder_deep" tree of DataExternalIDLoader) and shards of JsonLinesSink. Offsets of records are kept
+        in SQLite index (read through memory mapping) with key (url of article or id of data), date and category,
+        so records are found and filtered without parsing of all files. Call "build" after new files are saved.
+
+        :param str data_folder_path: folder with saved records
+        :param optional index_path: path of index, default <data_folder_path>/corpus-index.sqlite
+        :param int mmap_size: bytes of index, that are read through memory mapping
+        :param int max_open_files: count of data files, that are kept opened for random access
+        """
+        self.data_folder_path = data_folder_path
+        self.index_path = index_path if index_path else join(data_folder_path, INDEX_NAME)
+        self.max_open_files = max_open_files
+        self.connection = sqlite3.connect(self.index_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL)'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS records (key TEXT, file TEXT NOT NULL, offset INTEGER NOT NULL, '
+            'length INTEGER NOT NULL, line INTEGER NOT NULL, date TEXT, category TEXT)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS records_key ON records (key)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS records_date ON records (date)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS records_category ON records (category)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS records_file ON records (file, offset, line)')
+        self.connection.commit()
+        self._files = OrderedDict()
+        self._member = None
+
+    def _scan(self):
+        """ :return: dict {<relative path>: (<size>, <mtime>)} of complete data files """
+        files = {}
+        for folder, _, names in os.walk(self.data_folder_path):
+            for name in names:
+                if is_corpus_file(name):
+                    path = join(folder, name)
+                    stat = os.stat(path)
+                    files[relpath(path, self.data_folder_path)] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def _iter_file_records(self, file):
+        """ :return: generator of (record, offset, length, line) of data file """
+        path = join(self.data_folder_path, file)
+        if file.endswith('.json'):
+            with open(path, 'rb') as data_file:
+                content = data_file.read()
+            yield json.loads(content), 0, len(content), 0
+            return
+
+        with open(path, 'rb') as data_file:
+            start = 0
+            for end, data in iter_members(data_file, get_compression(path)):
+                for line, raw in enumerate(data.splitlines()):
+                    if raw:
+                        yield json.loads(raw), start, end - start, line
+                start = end
+
+    def build(self):
+        """
+        Indexes new and changed files, removes records of deleted files
+
+        :return: count of indexed files
+        """
+        files = self._scan()
+        indexed = dict((file, (size, mtime)) for file, size, mtime in self.connection.execute(
+            'SELECT file, size, mtime FROM files'))
+        for file in set(indexed) - set(files):
+            self._remove(file)
+
+        count = 0
+        for file, (size, mtime) in sorted(files.items()):
+            if indexed.get(file) == (size, mtime):
+                continue
+            self._remove(file)
+            self.connection.executemany(
+                'INSERT INTO records (key, file, offset, length, line, date, category) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    (get_key(record), file, offset, length, line, normalize_date(record.get('date')),
+                     record.get('category'))
+                    for record, offset, length, line in self._iter_file_records(file)
+                    if isinstance(record, dict)
+                )
+            )
+            self.connection.execute('INSERT INTO files (file, size, mtime) VALUES (?, ?, ?)', (file, size, mtime))
+            count += 1
+        self.connection.commit()
+        self._files_cache_clear()
+        return count
+
+    def _remove(self, file):
+        self.connection.execute('DELETE FROM records WHERE file = ?', (file,))
+        self.connection.execute('DELETE FROM files WHERE file = ?', (file,))
+
+    def _open(self, file):
+        data_file = self._files.pop(file, None)
+        if data_file is None:
+            data_file = open(join(self.data_folder_path, file), 'rb')
+            if len(self._files) >= self.max_open_files:
+                self._files.popitem(last=False)[1].close()
+        self._files[file] = data_file
+        return data_file
+
+    def _files_cache_clear(self):
+        for data_file in self._files.values():
+            data_file.close()
+        self._files.clear()
+        self._member = None
+
+    def _read(self, file, offset, length, line):
+        """ :return: record by its position; decompressed member is cached for next lines """
+        compression = get_compression(file)
+        if compression is not None and self._member is not None and self._member[0] == (file, offset):
+            return json.loads(self._member[1][line])
+
+        data_file = self._open(file)
+        data_file.seek(offset)
+        data = data_file.read(length)
+        if compression is None:
+            return json.loads(data)
+
+        decompressor = _decompressor(compression)
+        lines = decompressor.decompress(data).splitlines()
+        self._member = ((file, offset), lines)
+        return json.loads(lines[line])
+
+    def get(self, key):
+        """ :return: record by url of article or id of data, None if it isn't found """
+        row = self.connection.execute(
+            'SELECT file, offset, length, line FROM records WHERE key = ? LIMIT 1', (str(key),)
+        ).fetchone()
+        return self._read(*row) if row else None
+
+    def __contains__(self, key):
+        row = self.connection.execute('SELECT 1 FROM records WHERE key = ? LIMIT 1', (str(key),)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def _select(self, columns, date_from=None, date_to=None, category=None):
+        conditions, params = [], []
+        if date_from is not None:
+            conditions.append('date >= ?')
+            params.append(normalize_date(date_from))
+        if date_to is not None:
+            conditions.append('date <= ?')
+            params.append(normalize_date(date_to))
+        if category is not None:
+            conditions.append('category = ?')
+            params.append(category)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        return self.connection.execute(f'SELECT {columns} FROM records{where} ORDER BY file, offset, line', params)
+
+    def keys(self, date_from=None, date_to=None, category=None):
+        """ :return: list of keys of records, that match filters, records aren't read """
+        return [key for key, in self._select('key', date_from, date_to, category)]
+
+    def iter_records(self, date_from=None, date_to=None, category=None):
+        """
+        :param date_from: first date of records, 'YYYY-MM-DD' or date
+        :param date_to: last date of records, 'YYYY-MM-DD' or date
+        :param category: category of records
+        :return: generator of records, that match filters, in order of files
+        """
+        positions = self._select('file, offset, length, line', date_from, date_to, category).fetchall()
+        for position in positions:
+            yield self._read(*position)
+
+    def iter_batches(self, batch_size=1000, **filters):
+        """ :return: generator of lists of "batch_size" records, see "iter_records" """
+        batch = []
+        for record in self.iter_records(**filters):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        self._files_cache_clear()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import aiohttp
+
+
+class RetryPolicy:
+
+    RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+    RETRY_EXCEPTIONS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=60, jitter=True, retry_statuses=RETRY_STATUSES,
+                 retry_exceptions=RETRY_EXCEPTIONS):
+        """
+        Exponential backoff: delay before attempt n is base_delay * 2 ** n, but not greater than max_delay;
+        with jitter delay is random from [0, <delay>]. Header Retry-After of response has priority.
+
+        :param int max_retries: max count of repeated requests, 0 - without retries
+        :param float base_delay: delay in seconds before the first retry
+        :param float max_delay: max delay in seconds
+        :param bool jitter: True - use random delay ("full jitter")
+        :param retry_statuses: statuses of responses, that are retried
+        :param retry_exceptions: exceptions of requests, that are retried
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+
+    def is_retryable_status(self, status):
+        return status in self.retry_statuses
+
+    @staticmethod
+    def parse_retry_after(value):
+        """ :return: seconds from header Retry-After (number of seconds or http date) or None """
+        if not value:
+            return
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return max((date - datetime.now(timezone.utc)).total_seconds(), 0)
+
+    def get_delay(self, attempt, retry_after=None):
+        """
+        :param int attempt: number of retry, starting from 0
+        :param optional retry_after: value of header Retry-After
+        :return: seconds before retry
+        """
+        retry_after = self.parse_retry_after(retry_after)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.base_delay * 2 ** attempt, self.max_delay)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class AdaptiveConcurrency:
+
+    def __init__(self, initial=4, min_limit=1, max_limit=100, decrease_factor=0.5, latency_tolerance=3.0):
+        """
+        AIMD limiter of requests in flight. After every "limit" healthy responses limit grows by one
+        (additive increase), on overload (429, 5xx, timeouts) limit is multiplied by "decrease_factor"
+        (multiplicative decrease), but not more than once per "limit" responses (of any result), so one burst of errors
+        is one decrease and sustained overload decreases limit down to "min_limit".
+        Response is healthy, if its latency is not greater than latency_tolerance * <min seen latency>.
+
+        :param int initial: initial limit
+        :param int min_limit: min limit
+        :param int max_limit: max limit, it makes sense to set "n_processes" of loader not less than it
+        :param float decrease_factor: multiplier of limit on overload
+        :param float latency_tolerance: max ratio of latency to min latency for healthy response, None - don't check
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.min_latency = None
+        self.in_flight = 0
+        self._since_decrease = initial
+        self._condition = None
+
+    def _get_condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self, latency):
+        self._since_decrease += 1
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        if self.latency_tolerance and latency > self.latency_tolerance * max(self.min_latency, 1e-3):
+            return
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_overload(self):
+        self._since_decrease += 1
+        if self._since_decrease <= self.limit:
+            return
+        self._since_decrease = 0
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
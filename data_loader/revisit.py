@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+import sqlite3
+from hashlib import blake2b
+from os import makedirs
+from os.path import dirname, exists
+from time import time
+
+
+DAY = 24 * 60 * 60
+
+
+def get_hash(data, fields=None):
+    """ :return: hex hash of "fields" of data (all data, if fields is None), it is signal of change of page """
+    if fields is not None:
+        data = {field: data.get(field) for field in fields}
+    return blake2b(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RevisitIndex:
+
+    def __init__(self, path, fields=None, prior_rate=1 / (7 * DAY), prior_changes=1.0, commit_every=1000):
+        """
+        Persistent index of fetched pages for revisiting (SQLite): time of the last fetch, hash of data and estimated
+        rate of changes of every id. Rate is mean of Gamma posterior of Poisson changes:
+        (changes + prior_changes) / (observed seconds + prior_changes / prior_rate), so pages without history are
+        revisited with "prior_rate" and rate of every page is learnt from detected changes. "select" gives ids
+        with the highest probability of change since the last fetch: 1 - exp(-rate * age).
+
+        :param str path: path of SQLite file
+        :param optional fields: fields of data, that are compared, for example ('answers', 'comments'); None - all data
+        :param float prior_rate: prior rate of changes per second
+        :param float prior_changes: weight of prior in count of changes
+        :param int commit_every: count of updates between commits
+        """
+        if dirname(path) and not exists(dirname(path)):
+            makedirs(dirname(path))
+        self.path = path
+        self.fields = tuple(fields) if fields else None
+        self.prior_rate = prior_rate
+        self.prior_changes = prior_changes
+        self.commit_every = commit_every
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, hash TEXT NOT NULL, '
+            'first_fetched REAL NOT NULL, fetched REAL NOT NULL, visits INTEGER NOT NULL, changes INTEGER NOT NULL, '
+            'rate REAL NOT NULL)'
+        )
+        self.connection.commit()
+        self._not_committed = 0
+
+    def _updated(self):
+        self._not_committed += 1
+        if self._not_committed >= self.commit_every:
+            self.commit()
+
+    def get_rate(self, changes, observed):
+        return (changes + self.prior_changes) / (observed + self.prior_changes / self.prior_rate)
+
+    def update(self, external_id, data, now=None):
+        """
+        Saves fetch of page
+
+        :return: True - data was changed since the last fetch, False - it wasn't changed, None - the first fetch
+        """
+        now = time() if now is None else now
+        data_hash = get_hash(data, self.fields)
+        row = self.connection.execute(
+            'SELECT hash, first_fetched, visits, changes FROM pages WHERE id = ?', (int(external_id),)
+        ).fetchone()
+        if row is None:
+            self.connection.execute(
+                'INSERT INTO pages (id, hash, first_fetched, fetched, visits, changes, rate) '
+                'VALUES (?, ?, ?, ?, 1, 0, ?)',
+                (int(external_id), data_hash, now, now, self.get_rate(0, 0))
+            )
+            self._updated()
+            return
+
+        old_hash, first_fetched, visits, changes = row
+        changed = old_hash != data_hash
+        changes += changed
+        self.connection.execute(
+            'UPDATE pages SET hash = ?, fetched = ?, visits = ?, changes = ?, rate = ? WHERE id = ?',
+            (data_hash, now, visits + 1, changes, self.get_rate(changes, now - first_fetched), int(external_id))
+        )
+        self._updated()
+        return changed
+
+    def remove(self, external_id):
+        """ Removes page, that doesn't exist anymore """
+        self.connection.execute('DELETE FROM pages WHERE id = ?', (int(external_id),))
+        self._updated()
+
+    def get(self, external_id):
+        """ :return: dict with 'hash', 'fetched', 'visits', 'changes' and 'rate' of page or None """
+        row = self.connection.execute(
+            'SELECT hash, fetched, visits, changes, rate FROM pages WHERE id = ?', (int(external_id),)
+        ).fetchone()
+        return dict(zip(('hash', 'fetched', 'visits', 'changes', 'rate'), row)) if row else None
+
+    def probability(self, external_id, now=None):
+        """ :return: probability, that page was changed since the last fetch, or None """
+        page = self.get(external_id)
+        if page is None:
+            return
+        return 1 - math.exp(-page['rate'] * ((time() if now is None else now) - page['fetched']))
+
+    def select(self, budget, now=None, min_probability=0.0):
+        """
+        :param int budget: max count of ids
+        :param optional now: time of selection
+        :param float min_probability: min probability of change of selected pages
+        :return: list of ids, ordered from the most probably changed pages
+        """
+        now = time() if now is None else now
+        min_score = -math.log(1 - min_probability) if min_probability < 1 else float('inf')
+        cursor = self.connection.execute(
+            'SELECT id FROM pages WHERE rate * (? - fetched) >= ? ORDER BY rate * (? - fetched) DESC, id LIMIT ?',
+            (now, min_score, now, int(budget))
+        )
+        return [external_id for external_id, in cursor]
+
+    def __contains__(self, external_id):
+        return self.get(external_id) is not None
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def commit(self):
+        self.connection.commit()
+        self._not_committed = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import asyncio
+import argparse
+import importlib
+from collections import deque
+
+from .http import HttpClient
+from .metrics import MetricsRegistry
+from .parsing import create_parse_executor
+from .rate_limit import HostRateLimiter
+from .banki_ru import BankiRuLoader
+from .lenta_ru import LentaRuLoader
+
+
+LOADERS = {loader_cls.NAME: loader_cls for loader_cls in (LentaRuLoader, BankiRuLoader)}
+
+
+class ConcurrencyBudget:
+
+    def __init__(self, limit):
+        """
+        Global limit of requests in flight, that is fairly shared between loaders: free slot is given to waiting
+        loader with the least count of requests in flight, so one loader with many workers doesn't starve others.
+        Loaders get it through "share(name)" as "concurrency".
+
+        :param int limit: max count of requests in flight of all loaders
+        """
+        self.limit = limit
+        self.in_flight = 0
+        self.in_flight_by_name = {}
+        self.waiters = {}
+
+    def share(self, name):
+        """ :return: BudgetShare with interface of AdaptiveConcurrency for loader "name" """
+        return BudgetShare(self, name)
+
+    def _grant(self, name):
+        self.in_flight += 1
+        self.in_flight_by_name[name] = self.in_flight_by_name.get(name, 0) + 1
+
+    def _wake(self):
+        while self.in_flight < self.limit:
+            names = [name for name, waiters in self.waiters.items() if waiters]
+            if not names:
+                return
+            name = min(names, key=lambda name: self.in_flight_by_name.get(name, 0))
+            future = self.waiters[name].popleft()
+            if future.done():
+                continue
+            self._grant(name)
+            future.set_result(None)
+
+    async def acquire(self, name):
+        if self.in_flight < self.limit and not any(self.waiters.values()):
+            self._grant(name)
+            return
+        future = asyncio.get_event_loop().create_future()
+        self.waiters.setdefault(name, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(name)
+            elif future in self.waiters[name]:
+                self.waiters[name].remove(future)
+            raise
+
+    def release(self, name):
+        self.in_flight -= 1
+        self.in_flight_by_name[name] -= 1
+        self._wake()
+
+
+class BudgetShare:
+
+    def __init__(self, budget, name):
+        self.budget = budget
+        self.name = name
+
+    @property
+    def limit(self):
+        return self.budget.limit
+
+    @property
+    def in_flight(self):
+        return self.budget.in_flight_by_name.get(self.name, 0)
+
+    async def acquire(self):
+        await self.budget.acquire(self.name)
+
+    async def release(self):
+        self.budget.release(self.name)
+
+    def on_success(self, latency):
+        pass
+
+    def on_overload(self):
+        pass
+
+
+class CrawlScheduler:
+
+    def __init__(self, *, concurrency=100, rate_limit=None, burst=1, per_host=None, http_client=None,
+                 n_parse_workers=0, parse_executor=None, metrics=None):
+        """
+        Runs many loaders (different sites, years or date ranges) concurrently in one event loop. Loaders share
+        one HttpClient, one HostRateLimiter with per-host limits, one parse executor, one MetricsRegistry
+        and fair ConcurrencyBudget of requests in flight.
+
+        :param int concurrency: max count of requests in flight of all loaders
+        :param optional rate_limit: default max requests per second to every host, None - without limits
+        :param int burst: default burst for every host
+        :param optional per_host: dict {<host>: (<rate>, <burst>)}, for example {'lenta.ru': (5, 1)}
+        :param optional http_client: HttpClient, by default scheduler creates own client and closes it after run
+        :param int n_parse_workers: count of worker processes for parsing of pages of all loaders, 0 - in event loop
+        :param optional parse_executor: ProcessPoolExecutor for parsing
+        :param optional metrics: MetricsRegistry of all loaders
+        """
+        self.budget = ConcurrencyBudget(concurrency)
+        self.rate_limiter = HostRateLimiter(rate=rate_limit, burst=burst, per_host=per_host)
+        self.http_client = http_client if http_client is not None else HttpClient(
+            limit=concurrency, limit_per_host=concurrency)
+        self._own_http_client = http_client is None
+        self.n_parse_workers = n_parse_workers
+        self.parse_executor = parse_executor
+        self._own_parse_executor = False
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.loaders = []
+        self.errors = {}
+
+    def add(self, loader_cls, **kwargs):
+        """
+        Creates loader with shared objects of scheduler
+
+        :param loader_cls: subclass of ArticleLoader (or DataExternalIDLoader)
+        :param kwargs: params of loader, shared objects must not be given; metrics of loader have label
+            "instance" '<number>:<name>' by default, so metrics of loaders of the same site and year aren't mixed
+        :return: loader
+        """
+        name = f'{len(self.loaders)}:{loader_cls.NAME}'
+        kwargs.setdefault('progress_interval', None)
+        kwargs.setdefault('metrics_labels', {'instance': name})
+        loader = loader_cls(
+            http_client=self.http_client,
+            rate_limiter=self.rate_limiter,
+            concurrency=self.budget.share(name),
+            metrics=self.metrics,
+            **kwargs
+        )
+        self.loaders.append(loader)
+        return loader
+
+    def run(self):
+        """ Main method, runs all added loaders """
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.run_async())
+
+    async def run_async(self):
+        """ Coroutine version of "run", errors of loaders are raised after finishing of all loaders """
+        if self.parse_executor is None and self.n_parse_workers:
+            self.parse_executor = create_parse_executor(self.n_parse_workers)
+            self._own_parse_executor = True
+        for loader in self.loaders:
+            if loader.parse_executor is None:
+                loader.parse_executor = self.parse_executor
+        try:
+            results = await asyncio.gather(*[loader.run_async() for loader in self.loaders], return_exceptions=True)
+        finally:
+            if self._own_http_client:
+                await self.http_client.close()
+            if self._own_parse_executor:
+                self.parse_executor.shutdown()
+                self.parse_executor = None
+                self._own_parse_executor = False
+
+        self.errors = {i: result for i, result in enumerate(results) if isinstance(result, BaseException)}
+        if self.errors:
+            raise RuntimeError(f'Loaders {sorted(self.errors)} failed: {list(self.errors.values())}')
+
+
+def get_loader_cls(name):
+    """ :return: loader class by NAME ('lenta', 'banki') or by path '<module>:<class>' """
+    if ':' in name:
+        module, cls = name.split(':')
+        return getattr(importlib.import_module(module), cls)
+    return LOADERS[name]
+
+
+def get_years(spec):
+    """ :return: list of (year, start_date, end_date) of loader spec with "year", "years" or "from"/"to" """
+    if 'from' in spec or 'to' in spec:
+        start, end = spec.get('from'), spec.get('to')
+        first = int((start or end)[:4])
+        last = int((end or start)[:4])
+        return [
+            (year, start if year == first else None, end if year == last else None)
+            for year in range(first, last + 1)
+        ]
+    if 'years' in spec:
+        return [(int(year), None, None) for year in spec['years']]
+    return [(int(spec['year']), None, None)]
+
+
+def create_scheduler(config):
+    """
+    Creates scheduler with loaders from config, for example:
+
+        {
+            "concurrency": 50,
+            "rate_limit": null,
+            "per_host": {"lenta.ru": [5, 1], "www.banki.ru": [1, 1]},
+            "n_parse_workers": 2,
+            "loaders": [
+                {"loader": "lenta", "years": [2017, 2018], "data_folder_path": "lenta_ru/{year}", "n_processes": 10},
+                {"loader": "banki", "from": "2018-01-01", "to": "2019-03-31", "data_folder_path": "banki_ru/{year}"}
+            ]
+        }
+
+    Other keys of loader spec are params of loader, "{year}" in "data_folder_path", "log_file_path",
+    "checkpoint_path" and "archive_path" is replaced by year of loader.
+    """
+    scheduler = CrawlScheduler(
+        concurrency=config.get('concurrency', 100),
+        rate_limit=config.get('rate_limit'),
+        burst=config.get('burst', 1),
+        per_host={host: tuple(limit) for host, limit in config.get('per_host', {}).items()},
+        n_parse_workers=config.get('n_parse_workers', 0),
+    )
+    for spec in config['loaders']:
+        loader_cls = get_loader_cls(spec['loader'])
+        params = {key: value for key, value in spec.items() if key not in ('loader', 'year', 'years', 'from', 'to')}
+        for year, start_date, end_date in get_years(spec):
+            kwargs = dict(params, year=year, start_date=start_date, end_date=end_date)
+            for key in ('data_folder_path', 'log_file_path', 'checkpoint_path', 'archive_path'):
+                if kwargs.get(key):
+                    kwargs[key] = kwargs[key].format(year=year)
+            if kwargs.get('data_folder_path') and not os.path.exists(kwargs['data_folder_path']):
+                os.makedirs(kwargs['data_folder_path'])
+            kwargs.setdefault('save', True)
+            scheduler.add(loader_cls, **kwargs)
+    return scheduler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent loading of several sites and years.')
+    parser.add_argument('config', help='path of JSON config, see data_loader.scheduler.create_scheduler')
+    args = parser.parse_args(argv)
+    with open(args.config) as file:
+        config = json.load(file)
+    create_scheduler(config).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import math
+import struct
+from hashlib import blake2b
+
+
+def _popcount(data):
+    return bin(int.from_bytes(data, 'little')).count('1')
+
+
+class IdBitmap:
+
+    MAGIC = b'IDBM'
+
+    def __init__(self, chunk_bits=2 ** 23):
+        """
+        Set of non-negative integer ids, that keeps one bit per id. Bits are stored in chunks of "chunk_bits" bits,
+        chunks are allocated only for used parts of id space, so memory is bounded by size of id space in bits.
+
+        :param int chunk_bits: bits in one chunk, must be divisible by 8
+        """
+        if chunk_bits % 8:
+            raise ValueError('chunk_bits must be divisible by 8')
+        self.chunk_bits = chunk_bits
+        self.chunks = {}
+        self._len = 0
+
+    def _position(self, external_id):
+        external_id = int(external_id)
+        if external_id < 0:
+            raise ValueError(f'IdBitmap keeps only non-negative ids, got {external_id}')
+        chunk_number, bit = divmod(external_id, self.chunk_bits)
+        return chunk_number, bit >> 3, 1 << (bit & 7)
+
+    def add(self, external_id):
+        chunk_number, byte, mask = self._position(external_id)
+        chunk = self.chunks.get(chunk_number)
+        if chunk is None:
+            chunk = self.chunks[chunk_number] = bytearray(self.chunk_bits // 8)
+        if not chunk[byte] & mask:
+            chunk[byte] |= mask
+            self._len += 1
+
+    def update(self, external_ids):
+        for external_id in external_ids:
+            self.add(external_id)
+
+    def __contains__(self, external_id):
+        try:
+            chunk_number, byte, mask = self._position(external_id)
+        except (TypeError, ValueError):
+            return False
+        chunk = self.chunks.get(chunk_number)
+        return chunk is not None and bool(chunk[byte] & mask)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for chunk_number in sorted(self.chunks):
+            chunk, offset = self.chunks[chunk_number], chunk_number * self.chunk_bits
+            for byte, value in enumerate(chunk):
+                if value:
+                    for bit in range(8):
+                        if value & (1 << bit):
+                            yield offset + byte * 8 + bit
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.MAGIC + struct.pack('<QQ', self.chunk_bits, len(self.chunks)))
+            for chunk_number in sorted(self.chunks):
+                file.write(struct.pack('<Q', chunk_number))
+                file.write(self.chunks[chunk_number])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            if file.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f'File "{path}" is not IdBitmap')
+            chunk_bits, n_chunks = struct.unpack('<QQ', file.read(16))
+            bitmap = cls(chunk_bits)
+            for _ in range(n_chunks):
+                chunk_number, = struct.unpack('<Q', file.read(8))
+                chunk = bitmap.chunks[chunk_number] = bytearray(file.read(chunk_bits // 8))
+                bitmap._len += _popcount(chunk)
+        return bitmap
+
+
+class BloomFilter:
+
+    MAGIC = b'BLOM'
+
+    def __init__(self, capacity=1000000, error_rate=1e-6):
+        """
+        Probabilistic set of strings (for example urls) with fixed memory. False positives are possible with
+        probability about "error_rate" while count of items is not greater than "capacity", false negatives are not.
+
+        :param int capacity: expected count of items
+        :param float error_rate: probability of false positive
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.n_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.n_bits += -self.n_bits % 8
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * math.log(2))))
+        self.bits = bytearray(self.n_bits // 8)
+        self._len = 0
+
+    def _positions(self, item):
+        digest = blake2b(str(item).encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.n_hashes):
+            yield (first + i * second) % self.n_bits
+
+    def add(self, item):
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self._len += 1
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self):
+        """ :return: approximate count of added items """
+        return self._len
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.MAGIC + struct.pack('<QdQQQ', self.capacity, self.error_rate, self.n_bits,
+                                                self.n_hashes, self._len))
+            file.write(self.bits)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            if file.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f'File "{path}" is not BloomFilter')
+            capacity, error_rate, n_bits, n_hashes, length = struct.unpack('<QdQQQ', file.read(40))
+            bloom_filter = cls.__new__(cls)
+            bloom_filter.capacity, bloom_filter.error_rate = capacity, error_rate
+            bloom_filter.n_bits, bloom_filter.n_hashes, bloom_filter._len = n_bits, n_hashes, length
+            bloom_filter.bits = bytearray(file.read(n_bits // 8))
+        return bloom_filter
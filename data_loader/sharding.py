@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+import math
+import asyncio
+import traceback
+import multiprocessing
+from os.path import exists
+from queue import Empty
+
+from .index import CompletionIndex
+from .metrics import ProgressReporter
+
+
+def split_ids(ids, n_shards):
+    """
+    :return: list of "n_shards" shards of ids, shard i has every n-th id starting from i-th,
+        so dense and sparse parts of id space are spread between shards; ranges are split into ranges
+    """
+    if not hasattr(ids, '__getitem__'):
+        ids = list(ids)
+    return [ids[i::n_shards] for i in range(n_shards)]
+
+
+def get_shard_path(path, shard, n_shards):
+    """ :return: path of file of shard, for example 'index.sqlite' -> 'index.sqlite.shard-0-of-4' """
+    if path:
+        return f'{path}.shard-{shard}-of-{n_shards}'
+
+
+def summarize(loader):
+    """ :return: dict with progress, items by result, responses by status and count of fetch errors of loader """
+    counters = loader.metrics.snapshot()['counters']
+
+    def totals(name, label):
+        result = {}
+        for counter in counters.get(name, []):
+            key = counter['labels'][label]
+            result[key] = result.get(key, 0) + counter['value']
+        return result
+
+    return {
+        'progress': loader.loading_progress,
+        'items': totals('loader_items_total', 'result'),
+        'responses': totals('loader_responses_total', 'status'),
+        'fetch_errors': sum(totals('loader_fetch_errors_total', 'error').values()),
+    }
+
+
+async def _run_loader(loader, shard, queue, report_interval):
+    async def report():
+        while True:
+            await asyncio.sleep(report_interval)
+            queue.put(('progress', shard, summarize(loader)))
+
+    reporter = asyncio.ensure_future(report())
+    try:
+        await loader.run_async()
+    finally:
+        reporter.cancel()
+    return summarize(loader)
+
+
+def run_shard(loader_cls, loader_kwargs, shard, queue, report_interval):
+    """ Runs loader of one shard with own event loop in worker process and sends its summaries to parent """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loader = loader_cls(**loader_kwargs)
+        summary = loop.run_until_complete(_run_loader(loader, shard, queue, report_interval))
+        queue.put(('done', shard, summary))
+    except BaseException:
+        queue.put(('error', shard, traceback.format_exc()))
+    finally:
+        loop.close()
+
+
+class ShardedRunner:
+
+    def __init__(self, loader_cls, *, ids, n_workers, rate_limit=None, burst=1, index_path=None, seen_path=None,
+                 log_file_path=None, metrics_path=None, sink_factory=None, report_interval=1.0,
+                 progress_interval=1.0, start_method='spawn', **loader_kwargs):
+        """
+        Runs DataExternalIDLoader over id space in "n_workers" processes: ids are split into shards (see "split_ids"),
+        every worker process has own loader with own event loop and connection pool. Workers send progress
+        every "report_interval" seconds, parent aggregates it in "summaries" and merges completion state of shards.
+
+        Files of loaders get suffix of shard (see "get_shard_path"), so restart with the same "n_workers" resumes
+        every shard; after run statuses of all shards are merged to CompletionIndex "index_path". Before run finished
+        ids of "index_path" are copied to indexes of shards, so restart with other "n_workers" resumes too.
+
+        :param loader_cls: class of loader, for example AnswerMailRuLoader, it must be importable by worker
+        :param ids: range or other sequence of ids
+        :param int n_workers: count of worker processes
+        :param optional rate_limit: max requests per second to host for all workers, it is split between them
+        :param int burst: count of requests, that can be sent to host without waiting, for all workers
+        :param optional index_path: path of merged CompletionIndex, shards use "<index_path>.shard-<i>-of-<n>"
+        :param optional seen_path: path of IdBitmap of loaded ids, shards use "<seen_path>.shard-<i>-of-<n>"
+        :param optional log_file_path: path of log, shards use "<log_file_path>.shard-<i>-of-<n>"
+        :param optional metrics_path: path of snapshots of metrics, shards use "<metrics_path>.shard-<i>-of-<n>"
+        :param optional sink_factory: picklable function (number of shard) -> sink, for example
+            functools.partial of JsonLinesSink with prefix of shard; by default every worker has JsonFileSink
+        :param float report_interval: seconds between reports of workers
+        :param optional progress_interval: min seconds between updates of progress line, None - without progress
+        :param str start_method: start method of processes, 'spawn' gives clean interpreter without event loop
+        :param loader_kwargs: other params of loader (picklable, without shared objects like http_client)
+        """
+        self.loader_cls = loader_cls
+        self.n_workers = n_workers
+        self.shards = split_ids(ids, n_workers)
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.index_path = index_path
+        self.seen_path = seen_path
+        self.log_file_path = log_file_path
+        self.metrics_path = metrics_path
+        self.sink_factory = sink_factory
+        self.report_interval = report_interval
+        self.progress = ProgressReporter(progress_interval)
+        self.context = multiprocessing.get_context(start_method)
+        self.loader_kwargs = loader_kwargs
+
+        self.summaries = {}
+        self.finished = set()
+        self.errors = {}
+
+    def get_loader_kwargs(self, shard):
+        kwargs = dict(self.loader_kwargs)
+        kwargs.update(
+            ids=self.shards[shard],
+            rate_limit=self.rate_limit / self.n_workers if self.rate_limit else None,
+            burst=max(1, math.ceil(self.burst / self.n_workers)),
+            index_path=get_shard_path(self.index_path, shard, self.n_workers),
+            seen_path=get_shard_path(self.seen_path, shard, self.n_workers),
+            log_file_path=get_shard_path(self.log_file_path, shard, self.n_workers),
+            metrics_path=get_shard_path(self.metrics_path, shard, self.n_workers),
+            progress_interval=None,
+        )
+        for key in ('archive_path', 'revisit_path'):
+            if kwargs.get(key):
+                kwargs[key] = get_shard_path(kwargs[key], shard, self.n_workers)
+        if kwargs.get('revisit_budget') is not None:
+            kwargs['revisit_budget'] = math.ceil(kwargs['revisit_budget'] / self.n_workers)
+        if self.sink_factory is not None:
+            kwargs['sink'] = self.sink_factory(shard)
+        return kwargs
+
+    def total(self):
+        """ :return: summary of all shards, see "summarize" """
+        total = {'progress': 0, 'items': {}, 'responses': {}, 'fetch_errors': 0}
+        for summary in self.summaries.values():
+            total['progress'] += summary['progress']
+            total['fetch_errors'] += summary['fetch_errors']
+            for key in ('items', 'responses'):
+                for name, value in summary[key].items():
+                    total[key][name] = total[key].get(name, 0) + value
+        return total
+
+    def _receive(self, queue):
+        while True:
+            try:
+                kind, shard, data = queue.get_nowait()
+            except Empty:
+                return
+            if kind == 'error':
+                self.errors[shard] = data
+                self.finished.add(shard)
+            else:
+                self.summaries[shard] = data
+                if kind == 'done':
+                    self.finished.add(shard)
+
+    def seed_indexes(self):
+        """
+        Copies finished ids of index "index_path" to indexes of shards, that have these ids, so restart with other
+        "n_workers" (other split of ids) doesn't load finished ids again
+        """
+        index = CompletionIndex(self.index_path)
+        shard_indexes = [CompletionIndex(get_shard_path(self.index_path, shard, self.n_workers))
+                         for shard in range(self.n_workers)]
+        shards = [shard if isinstance(shard, range) else set(shard) for shard in self.shards]
+        try:
+            for status in CompletionIndex.FINISHED:
+                for external_id in index.iter_ids((status,)):
+                    for ids, shard_index in zip(shards, shard_indexes):
+                        if external_id in ids:
+                            if external_id not in shard_index:
+                                shard_index.set(external_id, status)
+                            break
+        finally:
+            for shard_index in shard_indexes:
+                shard_index.close()
+            index.close()
+
+    def merge_indexes(self):
+        """ Copies statuses of ids from indexes of shards to index "index_path" """
+        index = CompletionIndex(self.index_path)
+        try:
+            for shard in range(self.n_workers):
+                shard_index = CompletionIndex(get_shard_path(self.index_path, shard, self.n_workers))
+                for status in (CompletionIndex.DONE, CompletionIndex.NOT_FOUND, CompletionIndex.FAILED):
+                    for external_id in shard_index.iter_ids((status,)):
+                        index.set(external_id, status)
+                shard_index.close()
+        finally:
+            index.close()
+
+    def run(self):
+        """ Main method, after finished you can find aggregated progress in "summaries" and "total()" """
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(self.run_async())
+
+    async def run_async(self):
+        """ Coroutine version of "run", workers are awaited without blocking of event loop """
+        if self.index_path and exists(self.index_path):
+            self.seed_indexes()
+        queue = self.context.Queue()
+        processes = [
+            self.context.Process(
+                target=run_shard, name=f'loader-shard-{shard}',
+                args=(self.loader_cls, self.get_loader_kwargs(shard), shard, queue, self.report_interval),
+            )
+            for shard in range(self.n_workers)
+        ]
+        self.progress.write(f'\nLoading in {self.n_workers} processes...')
+        for process in processes:
+            process.start()
+        try:
+            while len(self.finished) < self.n_workers:
+                self._receive(queue)
+                for shard, process in enumerate(processes):
+                    if shard not in self.finished and not process.is_alive() and process.exitcode:
+                        self._receive(queue)
+                        if shard not in self.finished:
+                            self.errors[shard] = f'Worker exited with code {process.exitcode}.'
+                            self.finished.add(shard)
+                total = self.total()
+                self.progress.update(
+                    f'{total["progress"]} ids, {total["items"].get("done", 0)} done, '
+                    f'{len(self.finished)} from {self.n_workers} shards finished'
+                )
+                await asyncio.sleep(0.05)
+        except BaseException:
+            for process in processes:
+                process.terminate()
+            raise
+        finally:
+            for process in processes:
+                process.join()
+            queue.close()
+
+        if self.index_path:
+            self.merge_indexes()
+        self.progress.write(f'\nLoading finished! {self.total()}')
+        if self.errors:
+            raise RuntimeError(f'Shards {sorted(self.errors)} failed:\n' + '\n'.join(self.errors.values()))
+        return self.total()
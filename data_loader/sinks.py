@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import fcntl
+import zlib
+import queue
+import threading
+from os import makedirs
+from os.path import join, exists, dirname
+from glob import glob
+from time import monotonic
+from uuid import uuid4
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+EXTENSIONS = {None: '.jsonl', 'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+PART = '.part'
+LOCK = '.lock'
+READ_CHUNK_SIZE = 1024 ** 2
+
+_STOP = object()
+
+
+def get_compression(path):
+    """ :return: compression of shard by its name: None, 'gzip' or 'zstd' """
+    if path.endswith(PART):
+        path = path[:-len(PART)]
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith('.zst'):
+        return 'zstd'
+
+
+def _check_compression(compression):
+    if compression not in EXTENSIONS:
+        raise ValueError(f'Unknown compression "{compression}", use one of {list(EXTENSIONS)}')
+    if compression == 'zstd' and zstandard is None:
+        raise ImportError('Compression "zstd" needs package "zstandard", install it with "pip install zstandard"')
+
+
+def _compress(data, compression):
+    if compression == 'gzip':
+        compressor = zlib.compressobj(wbits=31)
+        return compressor.compress(data) + compressor.flush()
+    elif compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _decompressor(compression):
+    if compression == 'gzip':
+        return zlib.decompressobj(wbits=31)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def iter_members(file, compression):
+    """
+    Reads shard, that was written by JsonLinesSink. Every flushed batch is one gzip member / zstd frame, so broken tail
+    of killed run is only the last member, that is skipped.
+
+    :param file: binary file object
+    :param compression: None, 'gzip' or 'zstd'
+    :return: generator of (<offset of member end>, <bytes with complete json lines>)
+    """
+    offset = 0
+    if compression is None:
+        for line in file:
+            if not line.endswith(b'\n'):
+                return
+            offset += len(line)
+            yield offset, line
+        return
+
+    errors = (zlib.error, zstandard.ZstdError) if zstandard is not None else (zlib.error,)
+    decompressor, chunks, pending = _decompressor(compression), [], b''
+    while True:
+        data = pending or file.read(READ_CHUNK_SIZE)
+        pending = b''
+        if not data:
+            return
+        try:
+            chunks.append(decompressor.decompress(data))
+        except errors:
+            return
+        if decompressor.eof:
+            pending = decompressor.unused_data
+            offset += len(data) - len(pending)
+            yield offset, b''.join(chunks)
+            decompressor, chunks = _decompressor(compression), []
+        else:
+            offset += len(data)
+
+
+def iter_records(path):
+    """ :return: generator of complete records (dicts) from shard of JsonLinesSink """
+    with open(path, 'rb') as file:
+        for _, data in iter_members(file, get_compression(path)):
+            for line in data.splitlines():
+                if line:
+                    yield json.loads(line)
+
+
+class JsonFileSink:
+
+    def __init__(self, data_folder_path):
+        """
+        Saves every record to own json file "<data_folder_path>/<name>", it is layout of loaders by default.
+
+        :param str data_folder_path: abs path of directory for saving data
+        """
+        self.data_folder_path = data_folder_path
+
+    def write(self, record, name):
+        path = join(self.data_folder_path, name)
+        sub_folder_path = dirname(path)
+        if not exists(sub_folder_path):
+            makedirs(sub_folder_path, exist_ok=True)
+
+        with open(path, 'w') as file:
+            json.dump(record, file, ensure_ascii=False)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+
+    EXTENSIONS = EXTENSIONS
+
+    def __init__(self, data_folder_path, *, prefix='part', max_records=100000, max_bytes=64 * 1024 ** 2,
+                 compression=None, batch_size=1000, flush_interval=1.0, fsync=True):
+        """
+        Sharded append-only JSON Lines writer. Records are serialized and written by batches in background thread,
+        so "write" doesn't block event loop. Open shard has suffix ".part" and is renamed after rotation or closing;
+        ".part" shards of killed runs are cut to the last complete batch and renamed at start. Every run holds lock
+        of file "<prefix>-<run id>.lock" until closing, so shards of other live writers of the same folder
+        (for example of ShardedRunner or workers of WorkQueue) aren't recovered.
+
+        :param str data_folder_path: abs path of directory for shards
+        :param str prefix: prefix of shard names: <prefix>-<run id>-<number>.jsonl[.gz|.zst]
+        :param int max_records: max count of records in one shard
+        :param int max_bytes: max size of one shard in bytes (after compression)
+        :param compression: None, 'gzip' or 'zstd' (needs package "zstandard")
+        :param int batch_size: max count of records in one flush
+        :param float flush_interval: max seconds between getting of record and its flush
+        :param bool fsync: True - call fsync after every batch
+        """
+        _check_compression(compression)
+        self.data_folder_path = data_folder_path
+        self.prefix = prefix
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.run_id = uuid4().hex[:8]
+        self.shards = []
+        self.records_count = 0
+
+        self._shard_number = 0
+        self._file = None
+        self._path = None
+        self._shard_records = 0
+        self._shard_bytes = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._error = None
+
+        if not exists(data_folder_path):
+            makedirs(data_folder_path)
+        self._lock_file = self._lock(self.run_id)
+        self.recover()
+
+    def _lock(self, run_id):
+        """ :return: file with exclusive lock of run or None, if lock is held by other live writer """
+        file = open(join(self.data_folder_path, f'{self.prefix}-{run_id}{LOCK}'), 'a')
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return
+        return file
+
+    def _unlock(self, file):
+        os.remove(file.name)
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        file.close()
+
+    def recover(self):
+        """ Cuts ".part" shards of killed runs to the last complete batch and renames them """
+        dead_runs = {}
+        for path in glob(join(self.data_folder_path, f'{self.prefix}-*{PART}')):
+            run_id = os.path.basename(path)[len(self.prefix) + 1:].split('-')[0]
+            if run_id == self.run_id:
+                continue
+            if run_id not in dead_runs:
+                dead_runs[run_id] = self._lock(run_id)
+            if dead_runs[run_id] is None:
+                continue
+            end = 0
+            with open(path, 'rb') as file:
+                for end, _ in iter_members(file, get_compression(path)):
+                    pass
+            if not end:
+                os.remove(path)
+                continue
+            with open(path, 'r+b') as file:
+                file.truncate(end)
+            os.rename(path, path[:-len(PART)])
+        for file in dead_runs.values():
+            if file is not None:
+                self._unlock(file)
+
+    def write(self, record, name=None):
+        """ Puts record to queue of writer, "name" is ignored: records don't have own files """
+        if self._error is not None:
+            raise self._error
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name=f'{self.prefix}-writer', daemon=True)
+            self._thread.start()
+        self._queue.put(record)
+
+    def close(self):
+        """ Flushes all records and closes the last shard """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        if self._lock_file is not None:
+            self._unlock(self._lock_file)
+            self._lock_file = None
+        if self._error is not None:
+            raise self._error
+
+    def _work(self):
+        try:
+            stopped = False
+            while not stopped:
+                batch = []
+                record = self._queue.get()
+                deadline = monotonic() + self.flush_interval
+                while True:
+                    if record is _STOP:
+                        stopped = True
+                        break
+                    batch.append(record)
+                    timeout = deadline - monotonic()
+                    if len(batch) >= self.batch_size or timeout <= 0:
+                        break
+                    try:
+                        record = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write_batch(batch)
+            self._finish_shard()
+        except Exception as e:
+            self._error = e
+
+    def _write_batch(self, batch):
+        while batch:
+            if self._file is None:
+                self._open_shard()
+            part, batch = batch[:self.max_records - self._shard_records], batch[self.max_records - self._shard_records:]
+            data = self._encode(part)
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+            self._shard_records += len(part)
+            self._shard_bytes += len(data)
+            self.records_count += len(part)
+            if self._shard_records >= self.max_records or self._shard_bytes >= self.max_bytes:
+                self._finish_shard()
+
+    def _encode(self, records):
+        """ :return: bytes of batch of records, one gzip member / zstd frame """
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        return _compress(data, self.compression)
+
+    def _open_shard(self):
+        name = f'{self.prefix}-{self.run_id}-{str(self._shard_number).zfill(5)}{self.EXTENSIONS[self.compression]}'
+        self._path = join(self.data_folder_path, name)
+        self._file = open(f'{self._path}{PART}', 'wb')
+        self._shard_number += 1
+        self._shard_records = 0
+        self._shard_bytes = 0
+
+    def _finish_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.rename(f'{self._path}{PART}', self._path)
+        self.shards.append(self._path)
+        self._file = None
+        self._path = None
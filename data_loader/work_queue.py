@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import sqlite3
+import threading
+from os import makedirs
+from os.path import dirname, exists
+from time import time
+from uuid import uuid4
+
+
+def get_worker_id():
+    """ :return: unique id of worker '<host>:<pid>:<random>' """
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}'
+
+
+class WorkQueue:
+    """
+    Interface of durable work queue with leases, that is shared by workers (processes or machines) of one crawl.
+    Task is (<key>, <json payload>) in named queue, key is unique in queue, so tasks can be put by every worker.
+    Worker leases batch of tasks for "lease_seconds", extends leases by heartbeat, acks finished tasks and nacks
+    failed ones. Nacked tasks and tasks of expired leases (killed worker or lost node) are leased again,
+    after "max_attempts" leases task is failed. Methods are thread safe, loaders call them in own thread.
+    Implementations: SqliteWorkQueue (file on shared storage), MemoryWorkQueue (one process).
+    """
+
+    PENDING = 0
+    LEASED = 1
+    DONE = 2
+    FAILED = 3
+
+    STATUSES = {PENDING: 'pending', LEASED: 'leased', DONE: 'done', FAILED: 'failed'}
+
+    def put(self, name, tasks, reset=False):
+        """
+        :param str name: name of queue, for example 'lenta_ru:2019:load'
+        :param tasks: iterable of (<str key>, <json payload>), tasks with known keys are ignored
+        :param bool reset: True - done and failed tasks with the same keys are returned to pending with new payload,
+            it is used by refresh runs (revisit, refetch of recent days), tasks are done again even if they were done
+            by other worker of the same run, so put them by one worker
+        :return: count of new and reset tasks
+        """
+        raise NotImplementedError
+
+    def lease(self, name, worker, n=1, lease_seconds=300, now=None):
+        """ :return: list of (<key>, <payload>) of at most "n" pending tasks or tasks with expired leases """
+        raise NotImplementedError
+
+    def heartbeat(self, worker, lease_seconds=300, now=None):
+        """ Extends all leases of worker. :return: count of extended leases """
+        raise NotImplementedError
+
+    def ack(self, name, key):
+        """ Marks task as done """
+        raise NotImplementedError
+
+    def nack(self, name, key):
+        """ Returns failed task to pending, the lease is counted, so task is failed after "max_attempts" leases """
+        raise NotImplementedError
+
+    def release(self, worker):
+        """ Returns leased tasks of stopped worker to pending without waiting of expiration """
+        raise NotImplementedError
+
+    def counts(self, name):
+        """ :return: dict {'pending': ..., 'leased': ..., 'done': ..., 'failed': ...} """
+        raise NotImplementedError
+
+    def is_finished(self, name):
+        """ :return: True, if queue has neither pending nor leased tasks """
+        counts = self.counts(name)
+        return not counts['pending'] and not counts['leased']
+
+    def close(self):
+        pass
+
+
+class SqliteWorkQueue(WorkQueue):
+
+    def __init__(self, path, max_attempts=3, journal_mode='WAL', timeout=60):
+        """
+        Work queue in SQLite file, every operation is own transaction, lease is atomic (BEGIN IMMEDIATE),
+        so several processes can work with one file. WAL needs shared memory of one host, for file
+        on network storage (several machines) use journal_mode 'DELETE'.
+
+        :param str path: path of SQLite file
+        :param int max_attempts: max count of leases of task, after expiration of the last lease task is failed
+        :param str journal_mode: 'WAL' or 'DELETE'
+        :param float timeout: seconds of waiting of lock of database
+        """
+        if dirname(path) and not exists(dirname(path)):
+            makedirs(dirname(path))
+        self.path = path
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.connection.execute(f'PRAGMA journal_mode={journal_mode}')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS tasks (name TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL, '
+            'status INTEGER NOT NULL, worker TEXT, expires REAL, attempts INTEGER NOT NULL, PRIMARY KEY (name, key))'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS tasks_status ON tasks (name, status, expires)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS tasks_worker ON tasks (worker, status)')
+
+    def put(self, name, tasks, reset=False):
+        rows = [(name, key, json.dumps(payload, ensure_ascii=False)) for key, payload in tasks]
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                added = 0
+                if reset:
+                    cursor.executemany(
+                        f'UPDATE tasks SET status = {self.PENDING}, payload = ?, worker = NULL, expires = NULL, '
+                        f'attempts = 0 WHERE name = ? AND key = ? AND status IN ({self.DONE}, {self.FAILED})',
+                        ((payload, name, key) for _, key, payload in rows)
+                    )
+                    added += cursor.rowcount
+                cursor.executemany(
+                    'INSERT OR IGNORE INTO tasks (name, key, payload, status, attempts) '
+                    f'VALUES (?, ?, ?, {self.PENDING}, 0)',
+                    rows
+                )
+                added += cursor.rowcount
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+        return added
+
+    def lease(self, name, worker, n=1, lease_seconds=300, now=None):
+        now = time() if now is None else now
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute(
+                    f'UPDATE tasks SET status = {self.FAILED}, worker = NULL '
+                    f'WHERE name = ? AND status = {self.LEASED} AND expires < ? AND attempts >= ?',
+                    (name, now, self.max_attempts)
+                )
+                rows = cursor.execute(
+                    f'SELECT key, payload FROM tasks WHERE name = ? AND status = {self.PENDING} '
+                    'UNION ALL SELECT key, payload FROM tasks '
+                    f'WHERE name = ? AND status = {self.LEASED} AND expires < ? LIMIT ?',
+                    (name, name, now, n)
+                ).fetchall()
+                cursor.executemany(
+                    f'UPDATE tasks SET status = {self.LEASED}, worker = ?, expires = ?, attempts = attempts + 1 '
+                    'WHERE name = ? AND key = ?',
+                    ((worker, now + lease_seconds, name, key) for key, _ in rows)
+                )
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def _execute(self, sql, parameters):
+        with self._lock:
+            return self.connection.execute(sql, parameters).rowcount
+
+    def heartbeat(self, worker, lease_seconds=300, now=None):
+        now = time() if now is None else now
+        return self._execute(
+            f'UPDATE tasks SET expires = ? WHERE worker = ? AND status = {self.LEASED}', (now + lease_seconds, worker)
+        )
+
+    def ack(self, name, key):
+        self._execute(f'UPDATE tasks SET status = {self.DONE}, worker = NULL WHERE name = ? AND key = ?', (name, key))
+
+    def nack(self, name, key):
+        self._execute(
+            f'UPDATE tasks SET status = CASE WHEN attempts >= ? THEN {self.FAILED} ELSE {self.PENDING} END, '
+            f'worker = NULL WHERE name = ? AND key = ? AND status = {self.LEASED}',
+            (self.max_attempts, name, key)
+        )
+
+    def release(self, worker):
+        self._execute(
+            f'UPDATE tasks SET status = {self.PENDING}, worker = NULL, attempts = attempts - 1 '
+            f'WHERE worker = ? AND status = {self.LEASED}',
+            (worker,)
+        )
+
+    def counts(self, name):
+        counts = dict.fromkeys(self.STATUSES.values(), 0)
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT status, COUNT(*) FROM tasks WHERE name = ? GROUP BY status', (name,)).fetchall()
+        for status, count in rows:
+            counts[self.STATUSES[status]] = count
+        return counts
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+class MemoryWorkQueue(WorkQueue):
+
+    def __init__(self, max_attempts=3):
+        """
+        Work queue in memory of one process with the same semantics as SqliteWorkQueue, for tests
+        and for one process with several loaders
+
+        :param int max_attempts: max count of leases of task, after expiration of the last lease task is failed
+        """
+        self.max_attempts = max_attempts
+        self.queues = {}
+        self._lock = threading.Lock()
+
+    def put(self, name, tasks, reset=False):
+        with self._lock:
+            queue = self.queues.setdefault(name, {})
+            added = 0
+            for key, payload in tasks:
+                if key not in queue or reset and queue[key]['status'] in (self.DONE, self.FAILED):
+                    queue[key] = {'payload': json.dumps(payload, ensure_ascii=False), 'status': self.PENDING,
+                                  'worker': None, 'expires': None, 'attempts': 0}
+                    added += 1
+            return added
+
+    def lease(self, name, worker, n=1, lease_seconds=300, now=None):
+        now = time() if now is None else now
+        with self._lock:
+            leased = []
+            for key, task in self.queues.get(name, {}).items():
+                if task['status'] == self.LEASED and task['expires'] < now and task['attempts'] >= self.max_attempts:
+                    task.update(status=self.FAILED, worker=None)
+                elif len(leased) < n and (task['status'] == self.PENDING or
+                                          task['status'] == self.LEASED and task['expires'] < now):
+                    task.update(status=self.LEASED, worker=worker, expires=now + lease_seconds,
+                                attempts=task['attempts'] + 1)
+                    leased.append((key, json.loads(task['payload'])))
+            return leased
+
+    def _iter_leased(self, worker):
+        for queue in self.queues.values():
+            for task in queue.values():
+                if task['status'] == self.LEASED and task['worker'] == worker:
+                    yield task
+
+    def heartbeat(self, worker, lease_seconds=300, now=None):
+        now = time() if now is None else now
+        with self._lock:
+            extended = 0
+            for task in self._iter_leased(worker):
+                task['expires'] = now + lease_seconds
+                extended += 1
+            return extended
+
+    def ack(self, name, key):
+        with self._lock:
+            self.queues[name][key].update(status=self.DONE, worker=None)
+
+    def nack(self, name, key):
+        with self._lock:
+            task = self.queues[name][key]
+            if task['status'] == self.LEASED:
+                task.update(status=self.FAILED if task['attempts'] >= self.max_attempts else self.PENDING, worker=None)
+
+    def release(self, worker):
+        with self._lock:
+            for task in list(self._iter_leased(worker)):
+                task.update(status=self.PENDING, worker=None, attempts=task['attempts'] - 1)
+
+    def counts(self, name):
+        with self._lock:
+            counts = dict.fromkeys(self.STATUSES.values(), 0)
+            for task in self.queues.get(name, {}).values():
+                counts[self.STATUSES[task['status']]] += 1
+            return counts
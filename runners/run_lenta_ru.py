@@ -4,7 +4,7 @@ import os
 
 sys.path.insert(0, os.getcwd())
 
-from data_loader import LentaRuLoader  # noqa
+from data_loader import CrawlScheduler, LentaRuLoader  # noqa
 
 
 if __name__ == '__main__':
@@ -14,9 +14,10 @@ if __name__ == '__main__':
     if not os.path.exists(data_folder_path):
         os.makedirs(data_folder_path)
 
+    scheduler = CrawlScheduler(concurrency=20, per_host={'lenta.ru': (10, 1)})
     for year in years:
         year_path = os.path.join(data_folder_path, str(year))
         if not os.path.exists(year_path):
             os.makedirs(year_path)
-        bank = LentaRuLoader(year=year, data_folder_path=year_path)
-        bank.run()
+        scheduler.add(LentaRuLoader, year=year, data_folder_path=year_path)
+    scheduler.run()
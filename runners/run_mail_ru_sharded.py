@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import sys
+import os
+
+sys.path.insert(0, os.getcwd())
+
+from data_loader import AnswerMailRuLoader, ShardedRunner  # noqa
+
+
+if __name__ == '__main__':
+
+    data_folder_path = 'data'
+    if not os.path.exists(data_folder_path):
+        os.makedirs(data_folder_path)
+
+    runner = ShardedRunner(
+        AnswerMailRuLoader,
+        ids=range(0, 1000000),
+        n_workers=os.cpu_count(),
+        rate_limit=200,
+        index_path=os.path.join(data_folder_path, 'index.sqlite'),
+        save=True,
+        data_folder_path=data_folder_path,
+        queue_maxsize=200,
+        n_processes=10,
+        fast_parse=True,
+    )
+    runner.run()
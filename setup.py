@@ -48,7 +48,13 @@ setup(
     author_email='shonenkov@phystech.edu',
     description='Data loader.',
     packages=['data_loader'],
+    entry_points={
+        'console_scripts': ['data-loader-crawl=data_loader.scheduler:main'],
+    },
     install_requires=get_requirements(),
+    extras_require={
+        'parquet': ['pyarrow>=1.0'],
+    },
     dependency_links=get_links(),
     long_description=read('README.md'),
 )
@@ -6,6 +6,8 @@ from os import makedirs
 
 
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
 from data_loader import LentaRuLoader, BankiRuLoader
 
@@ -33,3 +35,26 @@ def unpack_resources():
 
     os.system(f'cd {resources} && tar -xvzf {TEST_ROOT}/resources/lenta_ru/2018-07-02/lenta_ru_articles.tar.gz')
     os.system(f'cd {resources} && tar -xvzf {TEST_ROOT}/resources/banki_ru/2018-07-03/banki_ru_articles.tar.gz')
+
+
+class StubServer:
+    """ Local aiohttp server for tests, usage: async with StubServer(handler) as server: server.url('/path') """
+
+    def __init__(self, handler):
+        self.app = web.Application()
+        self.app.router.add_route('*', '/{tail:.*}', handler)
+        self.server = TestServer(self.app)
+
+    @property
+    def host(self):
+        return str(self.server.make_url('')).rstrip('/')
+
+    def url(self, path):
+        return str(self.server.make_url(path))
+
+    async def __aenter__(self):
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.server.close()
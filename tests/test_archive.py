@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import json
+from glob import glob
+from os.path import exists, join
+
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, LentaRuLoader, RawArchive, reextract
+from data_loader.archive import get_data_path, get_segments, iter_pages
+from tests.conftest import StubServer
+from tests.test_parsing import LENTA_ARTICLE_PAGE, LENTA_DAY_PAGE, MAIL_RU_PAGE
+
+
+class UpperLentaRuLoader(LentaRuLoader):
+
+    @staticmethod
+    def parse_article_text(soup):
+        return LentaRuLoader.parse_article_text(soup).upper()
+
+
+async def lenta_handler(request):
+    if request.path in ('/news/2018/07/01/', '/news/2018/07/02/'):
+        return web.Response(text=LENTA_DAY_PAGE.replace('/07/02/', request.path[-7:]), content_type='text/html')
+    if request.path.endswith('/n4/'):
+        return web.Response(text='<div>Moved</div>', content_type='text/html')
+    return web.Response(text=LENTA_ARTICLE_PAGE.format(path=request.path), content_type='text/html')
+
+
+def test_raw_archive(tmpdir):
+    path = str(tmpdir.join('archive'))
+    archive = RawArchive(path, prefix='lenta', max_records=3)
+    pages = [(f'/news/{i}/', f'<html>\n{i}</html>'.encode() * i) for i in range(7)]
+    for url, content in pages:
+        archive.add(url, content, 'parse_article_text', status=200)
+    archive.close()
+
+    segments = get_segments(path)
+    assert len(segments) == 3 and all(segment.endswith('.raw.gz') for segment in segments)
+    read = [(header, content) for segment in segments for header, content in iter_pages(segment)]
+    assert sorted((header['url'], content) for header, content in read) == sorted(pages)
+    assert all(header['kind'] == 'parse_article_text' and header['status'] == 200 for header, _ in read)
+
+    with open(segments[0], 'ab') as file:
+        file.write(b'\x1f\x8b broken tail')
+    assert len(list(iter_pages(segments[0]))) == 3
+
+    with pytest.raises(ValueError):
+        RawArchive(path, compression=None)
+
+
+@pytest.mark.asyncio
+async def test_reextract_articles(tmpdir):
+    archive_path = str(tmpdir.join('archive'))
+    async with StubServer(lenta_handler) as server:
+        lenta_ru = LentaRuLoader(year=2018, save=False, host=server.host, archive_path=archive_path,
+                                 log_file_path=str(tmpdir.join('lenta.log')), progress_interval=None)
+        lenta_ru._get_all_dates = lambda: [('01', '07', '2018'), ('02', '07', '2018')]
+        # false positive of BloomFilter of prepared urls doesn't change kind of archived day page
+        lenta_ru.prepared_urls.add('/news/2018/07/01/')
+        await lenta_ru.run_async()
+    assert len([article for article in lenta_ru.articles if article['text']]) == 8
+    headers = {header['url']: header for header, _ in iter_pages(get_segments(archive_path)[0])}
+    assert headers['/news/2018/07/01/']['kind'] == 'parse_one_day_articles'
+    assert headers['/news/2018/07/01/']['args'] == ['2018', '07', '01']
+
+    output_path = str(tmpdir.join('output'))
+    errors_path = str(tmpdir.join('errors.jsonl'))
+    results = reextract(UpperLentaRuLoader, archive_path, data_folder_path=output_path, n_workers=2,
+                        errors_path=errors_path, progress_interval=None)
+    assert results == {'segments': 1, 'day_pages': 2, 'done': 8, 'empty': 2}
+
+    records = {}
+    for path in glob(join(output_path, '*.json')):
+        with open(path) as file:
+            record = json.load(file)
+        records[record['url']] = record
+    for article in lenta_ru.articles:
+        if article['text']:
+            assert records[article['url']] == dict(article, text=article['text'].upper())
+    with open(errors_path) as file:
+        errors = [json.loads(line) for line in file]
+    assert sorted(error['url'] for error in errors) == ['/news/2018/07/01/n4/', '/news/2018/07/02/n4/']
+
+
+@pytest.mark.asyncio
+async def test_reextract_data(tmpdir):
+    async def handler(request):
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+    archive_path = str(tmpdir.join('archive'))
+    async with StubServer(handler) as server:
+        mail_ru = AnswerMailRuLoader(ids=range(1000, 1005), save=False, data_folder_path=str(tmpdir),
+                                     queue_maxsize=5, n_processes=2, sub_url=f'{server.host}/question/{{external_id}}',
+                                     archive_path=archive_path, log_file_path=str(tmpdir.join('mail_ru.log')),
+                                     progress_interval=None)
+        await mail_ru.run_async()
+
+    output_path = str(tmpdir.join('output'))
+    results = reextract(AnswerMailRuLoader, archive_path, data_folder_path=output_path, n_workers=1,
+                        progress_interval=None)
+    assert results == {'segments': 1, 'done': 5}
+    assert get_data_path(1003, 1) == join('1', '1003.json')
+    with open(join(output_path, '0', '1', '1003.json')) as file:
+        assert json.load(file)['id'] == '1003'
+
+    output_path = str(tmpdir.join('output-1'))
+    reextract(AnswerMailRuLoader, archive_path, data_folder_path=output_path, data_folder_deep=1, n_workers=1,
+              progress_interval=None)
+    assert exists(join(output_path, '1', '1003.json'))
@@ -2,11 +2,13 @@
 import pytest
 import asyncio
 import re
+from glob import glob
 from os.path import join
 
 from bs4 import BeautifulSoup
 
 from data_loader import BankiRuLoader
+from data_loader.parsing import ElementEnd, extract
 from tests.conftest import TEST_ROOT, WORD_PATTERN
 
 
@@ -55,3 +57,79 @@ async def test_bankiru_loader():
         assert article['date'] == '03.07.2018'
         assert article['url']
         assert article['header']
+
+
+class ListSink:
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record, name):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_bankiru_loader_stream():
+    async def my_get_soup(url):
+        return BeautifulSoup(
+            open(f'/tmp/test-data-loader-resources/{url.replace("/", "-")}.html', 'r'), 'html.parser'
+        )
+
+    sink = ListSink()
+    banki_ru = BankiRuLoader(year=2018, save=True, stream=True, sink=sink, n_processes=3, queue_maxsize=2)
+    banki_ru.get_soup = my_get_soup
+    banki_ru._get_all_dates = lambda: [('03', '07', '2018')]
+
+    await banki_ru.run_async()
+
+    assert banki_ru.articles == []
+    assert len(sink.records) == 54
+    for article in sink.records:
+        assert article['text']
+        assert article['date'] == '03.07.2018'
+
+
+@pytest.mark.asyncio
+async def test_bankiru_loader_fast_parse():
+    async def my_get_soup(url):
+        return BeautifulSoup(
+            open(f'/tmp/test-data-loader-resources/{url.replace("/", "-")}.html', 'r'), 'html.parser'
+        )
+
+    async def my_fetch(url):
+        return open(f'/tmp/test-data-loader-resources/{url.replace("/", "-")}.html', 'rb').read()
+
+    banki_ru = BankiRuLoader(year=2018, save=False, n_processes=3)
+    banki_ru.get_soup = my_get_soup
+    banki_ru._get_all_dates = lambda: [('03', '07', '2018')]
+    await banki_ru.run_async()
+
+    fast_banki_ru = BankiRuLoader(year=2018, save=False, n_processes=3, fast_parse=True)
+    fast_banki_ru.fetch = my_fetch
+    fast_banki_ru._get_all_dates = lambda: [('03', '07', '2018')]
+    await fast_banki_ru.run_async()
+
+    assert len(fast_banki_ru.articles) == 54
+    articles = {article['url']: article for article in banki_ru.articles}
+    for article in fast_banki_ru.articles:
+        expected = articles[article['url']]
+        assert article['header'] == expected['header']
+        assert re.findall(WORD_PATTERN, article['text']) == re.findall(WORD_PATTERN, expected['text'])
+
+
+def test_bankiru_early_stop():
+    stopped = 0
+    for path in glob('/tmp/test-data-loader-resources/-news-lenta-?id=*.html'):
+        content = open(path, 'rb').read()
+        stop, prefix = ElementEnd(*BankiRuLoader.STOP_AFTER['parse_article_text']), b''
+        for i in range(0, len(content), 4096):
+            prefix += content[i:i + 4096]
+            if stop.feed(content[i:i + 4096]):
+                stopped += 1
+                break
+        assert extract(BankiRuLoader, 'parse_article_text', prefix) == \
+            extract(BankiRuLoader, 'parse_article_text', content)
+    assert stopped
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from benchmarks.run_benchmark import benchmark, get_parser
+from benchmarks.stub_server import BankiRuSite
+
+
+def test_banki_ru_site_serves_recorded_pages():
+    site = BankiRuSite()
+    assert site.get_page('/news/lenta/?d=03&m=07&y=2018') == site.pages[BankiRuSite.DAY_PAGE]
+    assert site.get_page('/news/lenta/?d=04&m=07&y=2018') == site.pages[BankiRuSite.DAY_PAGE]
+    assert site.get_page('/news/lenta/?id=10549549') == site.pages['-news-lenta-?id=10549549']
+    assert site.get_page('/unknown') is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('name', ['lenta', 'mail'])
+async def test_benchmark(name):
+    config = vars(get_parser().parse_args(['--days', '2', '--ids', '30', '--error-rate', '0.3', '--page-size', '5000']))
+    result = await benchmark(name, config)
+
+    assert result['loader'] == name
+    assert result['items'] == (40 if name == 'lenta' else 30)
+    assert result['errors'] > 0
+    assert result['pages'] == result['requests'] - result['errors']
+    assert result['pages_per_sec'] > 0
+    assert result['fetch_p50_ms'] <= result['fetch_p99_ms']
+    assert result['parse_cpu_sec'] > 0
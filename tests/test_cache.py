@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, ResponseCache
+from data_loader.http import Response
+from tests.conftest import StubServer
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+ETAG = '"v1"'
+
+
+def test_response_cache_stores_bodies_by_content(tmpdir):
+    cache = ResponseCache(str(tmpdir))
+    response = Response(200, b'<html>page</html>', {'ETag': ETAG, 'Content-Type': 'text/html'})
+    cache.put('http://host/1', response)
+    cache.put('http://host/2', response)
+
+    entry = cache.get('http://host/1')
+    assert entry.response.content == b'<html>page</html>'
+    assert entry.etag == ETAG
+    assert cache.conditional_headers(entry) == {'If-None-Match': ETAG}
+    assert cache.get('http://host/3') is None
+    cache.flush()
+    assert len(tmpdir.join('bodies').listdir()) == 1
+    assert cache.get('http://host/2').etag == ETAG
+    cache.close()
+
+    cache = ResponseCache(str(tmpdir))
+    assert cache.get('http://host/2').response.content == b'<html>page</html>'
+    cache.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('max_age, expected_statuses', [
+    (None, [200, 200]),
+    (0, [200, 200, 304, 304]),
+])
+async def test_mail_ru_loader_uses_cache(tmpdir, max_age, expected_statuses):
+    statuses = []
+
+    async def handler(request):
+        if request.headers.get('If-None-Match') == ETAG:
+            statuses.append(304)
+            return web.Response(status=304, headers={'ETag': ETAG})
+        statuses.append(200)
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html', headers={'ETag': ETAG})
+
+    cache = ResponseCache(str(tmpdir.join('cache')), max_age=max_age)
+    async with StubServer(handler) as server:
+        for _ in range(2):
+            mail_ru = AnswerMailRuLoader(
+                ids=range(2), save=False, data_folder_path=str(tmpdir), queue_maxsize=2, n_processes=2,
+                sub_url=f'{server.host}/question/{{external_id}}', cache=cache,
+                log_file_path=str(tmpdir.join('mail_ru.log')),
+            )
+            await mail_ru.run_async()
+            assert set(mail_ru.loaded_external_ids) == {0, 1}
+    cache.close()
+
+    assert statuses == expected_statuses
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import pytest
+from aiohttp import web
+
+from data_loader import CrawlCheckpoint, LentaRuLoader
+from tests.conftest import StubServer
+
+
+class Site:
+
+    def __init__(self):
+        self.requested = []
+        self.broken = {'/news/2018/07/03/b/'}
+
+    async def handler(self, request):
+        self.requested.append(request.path)
+        if request.path in self.broken:
+            return web.Response(status=404)
+        parts = request.path.strip('/').split('/')
+        if len(parts) == 4:
+            page = ''.join(
+                f'<div class="b-tabloid__topic_news"><a href="{request.path}{name}/">Header {name}</a></div>'
+                for name in ('a', 'b')
+            )
+            return web.Response(text=page, content_type='text/html')
+        return web.Response(text=f'<div class="b-text" itemprop="articleBody">Text of {request.path}</div>',
+                            content_type='text/html')
+
+
+def test_checkpoint(tmpdir):
+    checkpoint = CrawlCheckpoint(str(tmpdir.join('checkpoint', 'lenta.sqlite')))
+    assert checkpoint.get_refetch_from('lenta:2018', 3) is None
+    checkpoint.set_day('lenta:2018', '2018-07-01', 2)
+    checkpoint.set_day('lenta:2018', '2018-07-05', 2)
+    checkpoint.add_article('lenta:2018', {'url': '/a/', 'header': 'A', 'date': '01.07.2018'})
+    checkpoint.add_article('lenta:2018', {'url': '/b/', 'header': 'B', 'date': '01.07.2018'})
+    checkpoint.set_status('/a/', CrawlCheckpoint.DONE)
+    checkpoint.add_article('lenta:2018', {'url': '/a/', 'header': 'A', 'date': '01.07.2018'})
+    checkpoint.close()
+
+    checkpoint = CrawlCheckpoint(str(tmpdir.join('checkpoint', 'lenta.sqlite')))
+    assert checkpoint.get_days('lenta:2018') == {'2018-07-01', '2018-07-05'}
+    assert checkpoint.get_refetch_from('lenta:2018', 3) == '2018-07-02'
+    assert checkpoint.is_finished('/a/') and not checkpoint.is_finished('/b/')
+    assert list(checkpoint.iter_unfinished('lenta:2018')) == [
+        {'url': '/b/', 'header': 'B', 'date': '01.07.2018', 'text': ''}
+    ]
+    assert list(checkpoint.iter_unfinished('lenta:2019')) == []
+    checkpoint.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('stream', [False, True])
+async def test_loader_incremental(tmpdir, stream):
+    site = Site()
+    checkpoint_path = str(tmpdir.join('checkpoint.sqlite'))
+    kwargs = dict(year=2018, save=False, n_processes=2, checkpoint_path=checkpoint_path, recent_days=1,
+                  start_date='2018-07-01', stream=stream, log_file_path=str(tmpdir.join('lenta.log')),
+                  progress_interval=None)
+    async with StubServer(site.handler) as server:
+        lenta_ru = LentaRuLoader(host=server.host, end_date='2018-07-05', **kwargs)
+        await lenta_ru.run_async()
+        assert len(site.requested) == 15
+
+        site.requested, site.broken = [], set()
+        lenta_ru = LentaRuLoader(host=server.host, end_date='2018-07-07', **kwargs)
+        await lenta_ru.run_async()
+
+    assert sorted(site.requested) == sorted([
+        '/news/2018/07/03/b/',
+        '/news/2018/07/04/', '/news/2018/07/05/',
+        '/news/2018/07/06/', '/news/2018/07/06/a/', '/news/2018/07/06/b/',
+        '/news/2018/07/07/', '/news/2018/07/07/a/', '/news/2018/07/07/b/',
+    ])
+    assert lenta_ru.metrics.get('loader_items_total', loader='lenta', year=2018, stage='prepare', result='resumed') == 1
+    checkpoint = CrawlCheckpoint(checkpoint_path)
+    assert list(checkpoint.iter_unfinished('lenta:2018')) == []
+    checkpoint.close()
+
+
+class Killed(Exception):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_loader_killed_while_preparing_day(tmpdir):
+    site = Site()
+    checkpoint_path = str(tmpdir.join('checkpoint.sqlite'))
+    kwargs = dict(year=2018, save=False, n_processes=1, checkpoint_path=checkpoint_path, recent_days=0,
+                  start_date='2018-07-01', end_date='2018-07-02', log_file_path=str(tmpdir.join('lenta.log')),
+                  progress_interval=None)
+    async with StubServer(site.handler) as server:
+        lenta_ru = LentaRuLoader(host=server.host, **kwargs)
+        lenta_ru.checkpoint.commit_every = 1
+        add_article = lenta_ru.checkpoint.add_article
+
+        def killed_add_article(loader, article):
+            if article['url'] == '/news/2018/07/01/b/':
+                raise Killed
+            add_article(loader, article)
+
+        lenta_ru.checkpoint.add_article = killed_add_article
+        with pytest.raises(Killed):
+            await lenta_ru.run_async()
+
+        checkpoint = CrawlCheckpoint(checkpoint_path)
+        assert checkpoint.get_days('lenta:2018') == set()
+        checkpoint.close()
+
+        site.requested = []
+        lenta_ru = LentaRuLoader(host=server.host, **kwargs)
+        await lenta_ru.run_async()
+
+    assert '/news/2018/07/01/' in site.requested and '/news/2018/07/01/b/' in site.requested
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import pytest
+from aiohttp import web
+
+from data_loader import FingerprintIndex, LentaRuLoader, canonicalize_url
+from data_loader.dedupe import content_hash, get_fingerprint, hamming_distance, simhash
+from tests.conftest import StubServer
+
+
+TEXT = ' '.join(f'word{i}' for i in range(200))
+
+
+def test_canonicalize_url():
+    assert canonicalize_url('HTTPS://Lenta.RU:443/news/2018/?b=2&utm_source=tg&a=1#comments') == \
+        'https://lenta.ru/news/2018/?a=1&b=2'
+    assert canonicalize_url('/news/lenta/?id=10&fbclid=x') == '/news/lenta/?id=10'
+    assert canonicalize_url('http://lenta.ru') == 'http://lenta.ru/'
+    assert canonicalize_url('http://lenta.ru:8080/a/') == 'http://lenta.ru:8080/a/'
+
+
+def test_fingerprints():
+    assert content_hash('Hello,   World!') == content_hash('hello world')
+    near = TEXT.replace('word100', 'other')
+    assert hamming_distance(simhash(TEXT), simhash(near)) <= 3
+    assert hamming_distance(simhash(TEXT), simhash(' '.join(f'text{i}' for i in range(200)))) > 3
+
+
+def test_fingerprint_index(tmpdir):
+    path = str(tmpdir.join('dedupe', 'fingerprints.sqlite'))
+    index = FingerprintIndex(path)
+    assert index.add('/a/', TEXT).duplicate_of is None
+    assert index.add('/b/', TEXT.upper()).duplicate_of == '/a/'
+    assert index.add('/c/', TEXT.replace('word100', 'other')).duplicate_of == '/a/'
+    assert index.add('/d/', 'completely different text').duplicate_of is None
+    index.close()
+
+    index = FingerprintIndex(path)
+    assert len(index) == 2
+    assert '/c/' in index and '/e/' not in index
+    assert index.find(TEXT).duplicate_of == '/a/'
+    index.close()
+
+    exact = FingerprintIndex(':memory:', near_duplicates=False)
+    exact.add('/a/', TEXT)
+    assert exact.add('/c/', TEXT.replace('word100', 'other')).duplicate_of is None
+    exact.close()
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_index_add_async():
+    index = FingerprintIndex(':memory:')
+    fingerprint = get_fingerprint(TEXT)
+    assert fingerprint == (content_hash(TEXT), simhash(TEXT))
+    assert (await index.add_async('/a/', TEXT, fingerprint)).duplicate_of is None
+    assert (await index.add_async('/b/', TEXT.replace('word100', 'other'))).duplicate_of == '/a/'
+    assert '/b/' in index
+    assert await index.contains_async('/b/') and not await index.contains_async('/c/')
+    index.close()
+
+
+DAY_PAGE = ''.join(
+    f'<div class="b-tabloid__topic_news"><a href="{url}">Header</a></div>'
+    for url in ['/news/2018/07/02/a/', '/news/2018/07/02/a/?utm_source=main', '/news/2018/07/02/b/',
+                '/news/2018/07/02/c/']
+)
+
+
+async def handler(request):
+    if request.path == '/news/2018/07/02/':
+        return web.Response(text=DAY_PAGE, content_type='text/html')
+    text = 'Other text of article c' if request.path.endswith('/c/') else TEXT
+    return web.Response(text=f'<div class="b-text" itemprop="articleBody">{text}</div>', content_type='text/html')
+
+
+class ListSink:
+
+    def __init__(self):
+        self.names = []
+
+    def write(self, record, name):
+        self.names.append(name)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_loader_skips_duplicates(tmpdir):
+    dedupe = FingerprintIndex(str(tmpdir.join('fingerprints.sqlite')))
+    sink = ListSink()
+    async with StubServer(handler) as server:
+        lenta_ru = LentaRuLoader(year=2018, save=True, sink=sink, host=server.host, dedupe=dedupe,
+                                 progress_interval=None, log_file_path=str(tmpdir.join('lenta.log')))
+        lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        await lenta_ru.run_async()
+
+        assert [article['url'] for article in lenta_ru.articles] == [
+            '/news/2018/07/02/a/', '/news/2018/07/02/b/', '/news/2018/07/02/c/'
+        ]
+        assert lenta_ru.articles[1]['duplicate_of'] == '/news/2018/07/02/a/'
+        assert sink.names == [f'{lenta_ru.articles[0]["fingerprint"]}.json',
+                              f'{lenta_ru.articles[2]["fingerprint"]}.json']
+
+        lenta_ru = LentaRuLoader(year=2018, save=True, sink=sink, host=server.host, dedupe=dedupe,
+                                 progress_interval=None, log_file_path=str(tmpdir.join('lenta.log')))
+        lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        await lenta_ru.run_async()
+
+    assert lenta_ru.metrics.get('loader_items_total', loader='lenta', year=2018, stage='load', result='skipped') == 3
+    assert lenta_ru.metrics.get('loader_responses_total', loader='lenta', year=2018, status=200) == 1
+    assert len(sink.names) == 2
+    dedupe.close()
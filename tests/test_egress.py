@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from collections import Counter
+
+import pytest
+from aiohttp import web, ClientError
+
+from data_loader import AnswerMailRuLoader, Egress, EgressPool, MetricsRegistry, RetryPolicy
+from data_loader.http import Response
+from tests.conftest import StubServer
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+class FakeClient:
+
+    def __init__(self, statuses, latency=0.0):
+        self.statuses = list(statuses)
+        self.latency = latency
+        self.closed = True
+
+    async def get(self, url, headers=None, stop=None):
+        await asyncio.sleep(self.latency)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status is None:
+            raise ClientError('Connection error')
+        return Response(status, b'', {})
+
+
+@pytest.mark.asyncio
+async def test_egress_pool_health():
+    broken = Egress(name='broken', http_client=FakeClient([None]))
+    fast = Egress(name='fast', http_client=FakeClient([200, 200, 429, 200], latency=0.001))
+    slow = Egress(name='slow', http_client=FakeClient([], latency=0.02))
+    metrics = MetricsRegistry()
+    pool = EgressPool([broken, fast, slow], cooldown=60, max_error_rate=0.1, min_requests=1, metrics=metrics)
+
+    with pytest.raises(ClientError):
+        await pool.get('http://site.test/1')
+    assert not broken.is_available() and broken.error_rate == 0.05
+    assert pool.choose('site.test') is fast
+
+    await asyncio.gather(*[pool.get(f'http://site.test/{i}') for i in range(2)])
+    assert fast.requests == 1 and slow.requests == 1
+    assert fast.latency < slow.latency
+    assert (await pool.get('http://site.test/3')).status == 200
+    assert (await pool.get('http://site.test/4')).status == 429
+    assert not fast.is_available() and fast.bans == 1
+    assert (await pool.get('http://site.test/5')).status == 200
+    assert slow.requests == 2
+
+    fast.cooldown_until = 0
+    assert (await pool.get('http://site.test/6')).status == 200
+    assert fast.bans == 0
+    assert metrics.get('loader_egress_requests_total', egress='fast', result='ban') == 1
+    assert metrics.get('loader_egress_requests_total', egress='broken', result='error') == 1
+    assert [stats['name'] for stats in pool.stats()] == ['broken', 'fast', 'slow']
+
+
+@pytest.mark.asyncio
+async def test_egress_pool_rate_budget():
+    first = Egress(name='first', rate_limit=1, http_client=FakeClient([]))
+    second = Egress(name='second', rate_limit=1, http_client=FakeClient([]))
+    pool = EgressPool([first, second])
+    await asyncio.gather(*[pool.get('http://site.test/') for _ in range(2)])
+    assert first.requests == second.requests == 1
+    assert pool.choose('site.test').get_cost('site.test') > 0.5
+    assert pool.choose('other.test').get_cost('other.test') < 0.5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('ban_status, max_retries', [(429, 3), (403, 0)])
+async def test_loader_with_proxies(tmpdir, ban_status, max_retries):
+    hits = Counter()
+
+    def make_proxy(name, banned):
+        async def handler(request):
+            # stub proxy answers itself instead of forwarding of request to target host
+            assert request.url.host == 'otvet.mail.test'
+            hits[name] += 1
+            if banned:
+                return web.Response(status=ban_status)
+            return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+        return handler
+
+    async with StubServer(make_proxy('banned', True)) as banned, StubServer(make_proxy('good', False)) as good:
+        pool = EgressPool([banned.host, good.host], cooldown=60)
+        # banned request is sent again through good egress at once, it doesn't need retries of policy (403)
+        retry_policy = RetryPolicy(max_retries=max_retries, base_delay=0.01, jitter=False)
+        mail_ru = AnswerMailRuLoader(ids=range(20), sub_url='http://otvet.mail.test/question/{external_id}',
+                                     save=False, data_folder_path=str(tmpdir), queue_maxsize=10, n_processes=2,
+                                     http_client=pool, retry_policy=retry_policy,
+                                     log_file_path=str(tmpdir.join('mail_ru.log')), progress_interval=None)
+        await mail_ru.run_async()
+        await pool.close()
+
+    assert 1 <= hits['banned'] <= 2
+    assert hits['good'] == 20
+    assert mail_ru.metrics.get('loader_items_total', loader='data_external_id', stage='load', result='done') == 20
+    assert mail_ru.metrics.get('loader_items_total', loader='data_external_id', stage='load', result='failed') is None
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import pytest
+from aiohttp import web
+
+from data_loader import BankiRuLoader, HttpClient, LentaRuLoader
+from data_loader.http import ResponseTooLarge, UnexpectedContentType
+from data_loader.parsing import ElementEnd, extract
+from tests.conftest import StubServer
+
+
+def make_handler(peers):
+    async def handler(request):
+        peers.append(request.transport.get_extra_info('peername'))
+        return web.Response(text=f'<html><body>{request.path}</body></html>', content_type='text/html')
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_http_client_reuses_connection():
+    peers = []
+    async with StubServer(make_handler(peers)) as server:
+        async with HttpClient(limit_per_host=1) as client:
+            for i in range(5):
+                response = await client.get(server.url(f'/page/{i}'))
+                assert response.status == 200
+                assert response.content == f'<html><body>/page/{i}</body></html>'.encode()
+
+    assert len(peers) == 5
+    assert len(set(peers)) == 1
+    assert client.closed
+
+
+@pytest.mark.asyncio
+async def test_loader_closes_own_http_client():
+    async with StubServer(make_handler([])) as server:
+        lenta_ru = LentaRuLoader(year=2018, save=False, host=server.host, n_processes=2)
+        lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        await lenta_ru.run_async()
+
+    assert '/news/2018/07/02/' in lenta_ru.url_cache
+    assert lenta_ru.http_client.closed
+
+
+@pytest.mark.asyncio
+async def test_loader_keeps_shared_http_client_opened():
+    async with StubServer(make_handler([])) as server:
+        async with HttpClient() as client:
+            lenta_ru = LentaRuLoader(year=2018, save=False, host=server.host, http_client=client)
+            lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+            await lenta_ru.run_async()
+            assert not client.closed
+
+
+ARTICLE = '<html><body><div class="b-text" itemprop="articleBody"><p>Text of {path}</p></div>'
+
+
+async def streaming_handler(request):
+    if request.path == '/json':
+        return web.json_response({'a': 1})
+    if request.path == '/big':
+        return web.Response(body=b'x' * 2048, content_type='text/html')
+    response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+    await response.prepare(request)
+    if request.path != '/stream':
+        await response.write(ARTICLE.format(path=request.path).encode())
+    for _ in range(50):
+        await response.write(b'<div class="footer">' + b'x' * 1000 + b'</div>')
+    await response.write_eof()
+    return response
+
+
+@pytest.mark.asyncio
+async def test_http_client_rejects_responses():
+    async with StubServer(streaming_handler) as server:
+        async with HttpClient(max_body_size=1024, content_types=('text/html',)) as client:
+            with pytest.raises(ResponseTooLarge):
+                await client.get(server.url('/big'))
+            with pytest.raises(ResponseTooLarge):
+                await client.get(server.url('/stream'))
+            with pytest.raises(UnexpectedContentType):
+                await client.get(server.url('/json'))
+
+
+@pytest.mark.asyncio
+async def test_http_client_early_stop():
+    async with StubServer(streaming_handler) as server:
+        async with HttpClient(chunk_size=1024) as client:
+            full = await client.get(server.url('/news/1/'))
+            response = await client.get(server.url('/news/1/'), stop=ElementEnd('div', {'itemprop': 'articleBody'}))
+            not_found = await client.get(server.url('/news/2/'), stop=ElementEnd('div', {'class': 'missing'}))
+
+    assert not full.truncated and response.truncated and not not_found.truncated
+    assert len(response.content) < len(full.content) // 10
+    assert len(not_found.content) == len(full.content)
+    assert extract(LentaRuLoader, 'parse_article_text', response.content) == \
+        extract(LentaRuLoader, 'parse_article_text', full.content)
+
+
+BANKI_ARTICLE = '<html><body><article class="article-text"><p>Text of {id}</p></article>'
+LENTA_ARTICLE = '<html><body><div class="b-text" itemprop="articleBody"><p>First part</p></div><div class="photo"/>' \
+    '<div class="b-text" itemprop="articleBody"><p>Second part</p></div>'
+
+
+async def early_stop_handler(request):
+    if 'd' in request.query:
+        page = ''.join(f'<a class="text-list-link" href="/news/lenta/?id={i}">Header</a>' for i in range(3))
+        return web.Response(text=page, content_type='text/html')
+    if request.path == '/news/2018/07/02/':
+        page = '<div class="b-tabloid__topic_news"><a href="/news/2018/07/02/a/">Header</a></div>'
+        return web.Response(text=page, content_type='text/html')
+    response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+    await response.prepare(request)
+    if 'id' in request.query:
+        await response.write(BANKI_ARTICLE.format(id=request.query['id']).encode())
+    else:
+        await response.write(LENTA_ARTICLE.encode())
+    for _ in range(50):
+        await response.write(b'<div class="footer">' + b'x' * 1000 + b'</div>')
+    await response.write_eof()
+    return response
+
+
+@pytest.mark.asyncio
+async def test_loader_early_stop(tmpdir):
+    async with StubServer(early_stop_handler) as server:
+        banki_ru = BankiRuLoader(year=2018, save=False, host=server.host, early_stop=True, timeout=0,
+                                 log_file_path=str(tmpdir.join('banki.log')), progress_interval=None)
+        banki_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        # false positive of BloomFilter of prepared urls doesn't change kind of day page
+        banki_ru.prepared_urls.add('/news/lenta/?d=02&m=07&y=2018')
+        request, stops = banki_ru.request, {}
+
+        async def tracked_request(url, stop=None):
+            stops[url.split('/', 3)[-1]] = stop
+            return await request(url, stop=stop)
+
+        banki_ru.request = tracked_request
+        await banki_ru.run_async()
+
+        # text of lenta is split into several elements, so its pages are read to the end
+        lenta_ru = LentaRuLoader(year=2018, save=False, host=server.host, early_stop=True,
+                                 log_file_path=str(tmpdir.join('lenta.log')), progress_interval=None)
+        lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        await lenta_ru.run_async()
+
+    assert banki_ru.metrics.get('loader_early_stops_total', loader='banki', year=2018) == 3
+    assert stops.pop('news/lenta/?d=02&m=07&y=2018') is None and all(stops.values())
+    assert sorted(article['text'].strip() for article in banki_ru.articles) == [f'Text of {i}' for i in range(3)]
+    assert not lenta_ru.metrics.get('loader_early_stops_total', loader='lenta', year=2018)
+    assert lenta_ru.articles[0]['text'].split() == ['First', 'part', 'Second', 'part']
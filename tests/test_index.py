@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, CompletionIndex, RetryPolicy
+from tests.conftest import StubServer
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+def test_completion_index_is_persistent(tmpdir):
+    path = str(tmpdir.join('index', 'ids.sqlite'))
+    index = CompletionIndex(path, commit_every=2)
+    index.add(1)
+    index.set(2, CompletionIndex.NOT_FOUND)
+    index.set(3, CompletionIndex.FAILED)
+    index.close()
+
+    index = CompletionIndex(path)
+    assert 1 in index and 2 in index
+    assert 3 not in index and 4 not in index
+    assert index.get(3) == CompletionIndex.FAILED
+    assert list(index.iter_ids()) == [1, 2]
+    assert len(index) == 3
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_mail_ru_loader_resumes_from_index(tmpdir):
+    requested = []
+
+    async def handler(request):
+        external_id = int(request.match_info['tail'].split('/')[-1])
+        requested.append(external_id)
+        if external_id == 7:
+            return web.Response(status=500)
+        if external_id % 2:
+            return web.Response(status=404)
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+    async with StubServer(handler) as server:
+        for _ in range(2):
+            mail_ru = AnswerMailRuLoader(
+                ids=range(10), save=True, data_folder_path=str(tmpdir.join('data')), queue_maxsize=5, n_processes=3,
+                sub_url=f'{server.host}/question/{{external_id}}', index_path=str(tmpdir.join('ids.sqlite')),
+                log_file_path=str(tmpdir.join('mail_ru.log')), retry_policy=RetryPolicy(max_retries=0),
+            )
+            await mail_ru.run_async()
+            # own index of loader is closed after run
+            with pytest.raises(sqlite3.ProgrammingError):
+                mail_ru.index.connection.execute('SELECT 1')
+
+    # the second run requests only failed id
+    assert sorted(requested) == sorted(list(range(10)) + [7])
+    assert len(tmpdir.join('data').listdir()) == 1
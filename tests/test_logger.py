@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import json
+
+from data_loader import LoaderLogger
+from data_loader.logger import get_level_number
+
+
+def read_records(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_get_level_number():
+    assert get_level_number('PREPARING_WARNING') == get_level_number('WARNING')
+    assert get_level_number('DEBUG') < get_level_number('INFO') < get_level_number('ERROR')
+
+
+def test_loader_logger_filters_and_flushes(tmpdir):
+    path = str(tmpdir.join('logs', 'loader.log'))
+    logger = LoaderLogger(path, level='INFO', flush_interval=60)
+    logger.log('DEBUG', 'Fetched.', url='/a/')
+    logger.log('INFO', 'Article was saved.', url='/a/', name='a.json')
+    logger.log('PREPARING_ERROR', 'No soup.', url='/news/', status=500, latency=0.5)
+    assert not logger.is_enabled('DEBUG')
+    logger.close()
+
+    records = read_records(path)
+    assert [record['level'] for record in records] == ['INFO', 'PREPARING_ERROR']
+    assert records[1]['url'] == '/news/' and records[1]['status'] == 500 and records[1]['latency'] == 0.5
+    assert all(record['ts'] > 0 for record in records)
+
+
+def test_loader_logger_ring_buffer_drops_oldest(tmpdir):
+    path = str(tmpdir.join('loader.log'))
+    logger = LoaderLogger(path, buffer_size=3, flush_size=100, flush_interval=60)
+    for i in range(5):
+        logger.log('INFO', 'Saved.', id=i)
+    assert logger.dropped == 2
+    logger.close()
+    assert [record['id'] for record in read_records(path)] == [2, 3, 4]
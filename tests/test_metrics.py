@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import aiohttp
+import pytest
+
+from data_loader import LentaRuLoader, MetricsRegistry, MetricsServer, ProgressReporter
+from tests.conftest import StubServer
+from tests.test_parsing import lenta_handler
+
+
+def test_metrics_registry():
+    metrics = MetricsRegistry(buckets=(0.1, 1))
+    metrics.inc('responses_total', status=200)
+    metrics.inc('responses_total', 2, status=200)
+    metrics.inc('responses_total', status=503)
+    metrics.set('queue_size', 5, queue='main')
+    with metrics.track('in_flight'):
+        assert metrics.get('in_flight') == 1
+    for value in (0.05, 0.05, 0.5, 2):
+        metrics.observe('fetch_seconds', value, loader='lenta')
+
+    assert metrics.get('responses_total', status=200) == 3
+    assert metrics.get('in_flight') == 0
+    histogram = metrics.get('fetch_seconds', loader='lenta')
+    assert histogram.count == 4 and histogram.max == 2
+    assert histogram.percentile(50) == 0.1
+    assert histogram.percentile(99) == 2
+
+    snapshot = metrics.snapshot()
+    assert snapshot['counters']['responses_total'] == [
+        {'labels': {'status': '200'}, 'value': 3}, {'labels': {'status': '503'}, 'value': 1}
+    ]
+    assert snapshot['gauges']['queue_size'] == [{'labels': {'queue': 'main'}, 'value': 5}]
+    assert snapshot['histograms']['fetch_seconds'][0]['p50'] == 0.1
+
+    text = metrics.to_prometheus()
+    assert '# TYPE responses_total counter\nresponses_total{status="200"} 3\n' in text
+    assert 'fetch_seconds_bucket{loader="lenta",le="0.1"} 2\n' in text
+    assert 'fetch_seconds_bucket{loader="lenta",le="+Inf"} 4\n' in text
+    assert 'fetch_seconds_count{loader="lenta"} 4\n' in text
+
+
+def test_progress_reporter_is_rate_limited():
+    file = io.StringIO()
+    progress = ProgressReporter(interval=60, file=file)
+    for i in range(100):
+        progress.update(f'{i} ids')
+    progress.write('finished')
+    assert file.getvalue() == '\r0 ids' + 'finished\n'
+
+
+@pytest.mark.asyncio
+async def test_metrics_of_loader(tmpdir):
+    metrics_path = str(tmpdir.join('metrics.jsonl'))
+    async with StubServer(lenta_handler) as server:
+        lenta_ru = LentaRuLoader(year=2018, save=False, host=server.host, n_processes=3, fast_parse=True,
+                                 metrics_path=metrics_path, progress_interval=None,
+                                 log_file_path=str(tmpdir.join('lenta.log')))
+        lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        async with MetricsServer(lenta_ru.metrics, port=0) as metrics_server:
+            await lenta_ru.run_async()
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'http://127.0.0.1:{metrics_server.port}/metrics') as response:
+                    text = await response.text()
+
+    metrics = lenta_ru.metrics
+    assert metrics.get('loader_responses_total', loader='lenta', year=2018, status=200) == 6
+    assert metrics.get('loader_items_total', loader='lenta', year=2018, stage='load', result='done') == 5
+    assert metrics.get('loader_fetch_seconds', loader='lenta', year=2018).count == 6
+    assert metrics.get('loader_parse_seconds', loader='lenta', year=2018).count == 6
+    assert metrics.get('loader_extract_seconds', loader='lenta', year=2018).count == 6
+    assert metrics.get('loader_queue_wait_seconds', loader='lenta', year=2018, command='load').count == 5
+    assert metrics.get('loader_in_flight', loader='lenta', year=2018, stage='fetch') == 0
+    assert 'loader_responses_total{loader="lenta",status="200",year="2018"} 6' in text
+
+    with open(metrics_path) as file:
+        snapshot = json.loads(file.readlines()[-1])
+    assert snapshot['ts'] > 0
+    assert [gauge['labels']['stage'] for gauge in snapshot['gauges']['loader_progress']] == ['load', 'prepare']
+    assert snapshot['histograms']['loader_fetch_seconds'][0]['count'] == 6
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import datetime
+from glob import glob
+
+import pytest
+
+from data_loader import JsonFileSink, JsonLinesSink, ParquetSink, export_parquet
+
+pyarrow = pytest.importorskip('pyarrow')
+import pyarrow.dataset  # noqa: E402
+import pyarrow.parquet  # noqa: E402
+
+
+def get_article(i):
+    return {
+        'url': f'/news/{i}/',
+        'header': f'header {i}',
+        'date': f'{i % 28 + 1:02}.{i % 2 + 1:02}.2018',
+        'text': f'text {i}',
+        'duplicate_of': None,
+    }
+
+
+def test_parquet_sink(tmpdir):
+    data_folder_path = str(tmpdir.join('parquet'))
+    sink = ParquetSink(data_folder_path, row_group_size=10, max_rows_per_file=25, max_buffered_rows=15)
+    for i in range(100):
+        sink.write(get_article(i))
+    sink.close()
+
+    assert sink.records_count == 100
+    assert not glob(f'{data_folder_path}/**/*.part', recursive=True)
+    assert sorted(set(path.split('/')[-2] for path in sink.files)) == ['month=01', 'month=02']
+    for path in sink.files:
+        metadata = pyarrow.parquet.ParquetFile(path).metadata
+        assert metadata.num_rows <= 25
+        assert all(metadata.row_group(i).num_rows <= 10 for i in range(metadata.num_row_groups))
+
+    table = pyarrow.dataset.dataset(data_folder_path, format='parquet', partitioning='hive').to_table()
+    assert table.num_rows == 100
+    assert 'duplicate_of' not in table.column_names
+    rows = sorted(table.to_pylist(), key=lambda row: int(row['url'].split('/')[2]))
+    assert rows[3]['date'] == datetime.date(2018, 2, 4)
+    assert (rows[3]['year'], rows[3]['month']) == (2018, 2)
+
+
+def test_parquet_sink_raises_error_of_writer(tmpdir):
+    sink = ParquetSink(str(tmpdir.join('parquet')))
+    sink.write(dict(get_article(0), text=1))
+    with pytest.raises(Exception):
+        sink.close()
+
+
+def test_export_parquet(tmpdir):
+    data_folder_path = str(tmpdir.join('data'))
+    sink = JsonFileSink(data_folder_path)
+    categories = ['Auto', 'Home / Garden', None]
+    for i in range(30):
+        sink.write({'id': str(i), 'title': f'title {i}', 'category': categories[i % 3], 'sub_category': 'other',
+                    'comments': [], 'answers': [f'answer {i}']}, f'{i}.json')
+
+    output_path = str(tmpdir.join('parquet'))
+    files = export_parquet(data_folder_path, output_path, batch_size=7, partition_by=('category',))
+    assert len(files) == 3
+
+    table = pyarrow.dataset.dataset(output_path, format='parquet', partitioning='hive').to_table()
+    assert table.num_rows == 30
+    assert pyarrow.types.is_dictionary(table.schema.field('sub_category').type)
+    counts = {}
+    for row in table.to_pylist():
+        counts[row['category']] = counts.get(row['category'], 0) + 1
+    assert counts == {'Auto': 10, 'Home / Garden': 10, None: 10}
+
+
+def test_export_parquet_shards(tmpdir):
+    data_folder_path = str(tmpdir.join('data'))
+    sink = JsonLinesSink(data_folder_path, compression='gzip', fsync=False)
+    for i in range(50):
+        sink.write(get_article(i))
+    sink.close()
+
+    output_path = str(tmpdir.join('parquet'))
+    export_parquet(data_folder_path, output_path, date_from='2018-02-01', partition_by=('year',))
+    table = pyarrow.dataset.dataset(output_path, format='parquet', partitioning='hive').to_table()
+    assert table.num_rows == 25
+    assert set(table.column('year').to_pylist()) == {2018}
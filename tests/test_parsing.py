@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, LentaRuLoader
+from data_loader.parsing import extract
+from tests.conftest import StubServer
+
+
+LENTA_DAY_PAGE = ''.join(
+    f'<div class="b-tabloid__topic_news"><a href="/news/2018/07/02/n{i}/">Header {i}</a></div>' for i in range(5)
+)
+LENTA_ARTICLE_PAGE = '<div class="b-text" itemprop="articleBody"><p>Text of {path}</p></div>'
+
+MAIL_RU_PAGE = '''
+<h1 class="q--qtext"> Question? </h1>
+<div class="q--qcomment medium">Comment</div>
+<a class="black list__title list__title">Category</a>
+<a class="medium item item_link selected">Sub category</a>
+<div class="a--atext atext">Answer 1</div>
+<div class="a--atext atext">Answer 2</div>
+'''
+
+
+async def lenta_handler(request):
+    if request.path == '/news/2018/07/02/':
+        return web.Response(text=LENTA_DAY_PAGE, content_type='text/html')
+    return web.Response(text=LENTA_ARTICLE_PAGE.format(path=request.path), content_type='text/html')
+
+
+def test_extract_mail_ru_data():
+    data = extract(AnswerMailRuLoader, 'parse_data', MAIL_RU_PAGE.encode(), 42)
+    assert data == {'id': '42', 'title': 'Question?', 'category': 'Category', 'sub_category': 'Sub category',
+                    'comments': ['Comment'], 'answers': ['Answer 1', 'Answer 2']}
+
+
+@pytest.mark.asyncio
+async def test_lenta_ru_loader_with_parse_workers():
+    async with StubServer(lenta_handler) as server:
+        lenta_ru = LentaRuLoader(year=2018, save=False, host=server.host, n_processes=3, n_parse_workers=2)
+        lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        await lenta_ru.run_async()
+
+    assert lenta_ru.parse_executor is None
+    assert len(lenta_ru.articles) == 5
+    for article in lenta_ru.articles:
+        assert article['text'].strip() == f'Text of {article["url"]}'
+        assert article['header'].startswith('Header')
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, IdSpaceProber
+from tests.conftest import StubServer
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+def exists(external_id):
+    return 200 <= external_id < 400 or 700 <= external_id < 800
+
+
+def test_prober():
+    prober = IdSpaceProber(range(1000), block_size=100, samples=10, min_density=0.1, seed=0)
+    probed = prober.sample()
+    assert len(probed) == 100 and len(set(probed)) == 100
+    assert all(sum(1 for external_id in probed if prober.get_block(external_id) == block) == 10 for block in range(10))
+    for external_id in probed:
+        prober.record(external_id, exists(external_id))
+    prober.record(5000, True)
+    prober.record(probed[0], None)
+
+    assert prober.density(2) == 1.0 and prober.density(0) == 0.0
+    assert prober.plan() == [2, 3, 7]
+    assert len(list(prober.iter_block(2))) == 90
+    assert prober.dead_ids_count() == 7 * 90
+
+    ordered = IdSpaceProber([5, 3, 8, 1], block_size=2, samples=1, min_density=0, seed=0)
+    assert ordered.get_block(8) == 1 and ordered.get_block(7) is None
+    ordered.record(5, False)
+    ordered.record(8, True)
+    assert ordered.plan() == [1, 0]
+
+
+@pytest.mark.asyncio
+async def test_loader_probing(tmpdir):
+    requested = []
+
+    async def handler(request):
+        external_id = int(request.path.split('/')[-1])
+        requested.append(external_id)
+        if not exists(external_id):
+            return web.Response(status=404)
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+    kwargs = dict(ids=range(1000), save=False, data_folder_path=str(tmpdir), queue_maxsize=10, n_processes=4,
+                  index_path=str(tmpdir.join('ids.sqlite')), log_file_path=str(tmpdir.join('mail_ru.log')),
+                  probe_block_size=100, probe_samples=5, probe_min_density=0.1, progress_interval=None)
+    async with StubServer(handler) as server:
+        mail_ru = AnswerMailRuLoader(sub_url=f'{server.host}/question/{{external_id}}', **kwargs)
+        await mail_ru.run_async()
+        assert len(requested) == 10 * 5 + 3 * 95
+        assert all(exists(external_id) for external_id in requested[50:])
+        assert mail_ru.loading_progress == 1000
+        assert mail_ru._pending == 0
+        assert mail_ru.metrics.get('loader_items_total', loader='data_external_id', stage='load',
+                                   result='dead_block') == 7 * 95
+
+        requested.clear()
+        mail_ru = AnswerMailRuLoader(sub_url=f'{server.host}/question/{{external_id}}', **kwargs)
+        await mail_ru.run_async()
+        assert requested == []
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from time import monotonic
+
+import pytest
+
+from data_loader import BankiRuLoader, HostRateLimiter, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=2)
+    start = monotonic()
+    for _ in range(6):
+        await bucket.acquire()
+    # two requests go immediately, other four wait for 1 / 50 second each
+    assert 0.07 <= monotonic() - start < 0.5
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_does_not_block_event_loop():
+    bucket = TokenBucket(rate=10)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(monotonic())
+            await asyncio.sleep(0.01)
+
+    async def requests():
+        for _ in range(3):
+            await bucket.acquire()
+
+    await asyncio.gather(requests(), ticker())
+    assert len(ticks) == 5
+    assert ticks[-1] - ticks[0] < 0.15
+
+
+@pytest.mark.asyncio
+async def test_host_rate_limiter_keeps_hosts_independent():
+    limiter = HostRateLimiter(rate=1, per_host={'fast.example': (None, 1)})
+    start = monotonic()
+    await limiter.acquire('http://slow.example/a')
+    for i in range(10):
+        await limiter.acquire(f'http://fast.example/{i}')
+    await limiter.acquire('http://other.example/a')
+    assert monotonic() - start < 0.1
+    assert set(limiter.buckets) == {'slow.example', 'fast.example', 'other.example'}
+
+
+def test_loader_timeout_is_converted_to_rate():
+    banki_ru = BankiRuLoader(year=2018, save=False)
+    assert banki_ru.rate_limiter.rate == 1
+    banki_ru = BankiRuLoader(year=2018, save=False, rate_limit=5, burst=3)
+    assert (banki_ru.rate_limiter.rate, banki_ru.rate_limiter.burst) == (5, 3)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+import pytest
+
+from data_loader import CorpusReader, JsonFileSink, JsonLinesSink
+from data_loader.reader import normalize_date
+
+
+def get_article(i):
+    return {
+        'url': f'/news/{i}/',
+        'date': f'{i % 28 + 1:02}.01.2018',
+        'category': 'economics' if i % 2 else 'politics',
+        'text': f'text {i}',
+    }
+
+
+def test_normalize_date():
+    assert normalize_date('05.01.2018') == '2018-01-05'
+    assert normalize_date('2018-01-05') == '2018-01-05'
+    assert normalize_date('yesterday') is None
+    assert normalize_date(None) is None
+
+
+def test_reader_json_files(tmpdir):
+    data_folder_path = str(tmpdir.join('data'))
+    sink = JsonFileSink(data_folder_path)
+    for i in range(10):
+        sink.write({'id': i, 'question': f'question {i}', 'category': 'auto'}, f'{i % 3}/{i}.json')
+
+    with CorpusReader(data_folder_path) as reader:
+        assert reader.build() == 10
+        assert len(reader) == 10
+        assert reader.get(7)['question'] == 'question 7'
+        assert '7' in reader and 11 not in reader
+        assert reader.get(11) is None
+        assert reader.build() == 0
+
+        os.remove(os.path.join(data_folder_path, '0', '3.json'))
+        sink.write({'id': 10, 'question': 'question 10', 'category': 'home'}, '1/10.json')
+        assert reader.build() == 1
+        assert len(reader) == 10
+        assert reader.get(3) is None
+        assert [record['id'] for record in reader.iter_records(category='home')] == [10]
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_reader_shards(tmpdir, compression):
+    data_folder_path = str(tmpdir.join('data'))
+    sink = JsonLinesSink(data_folder_path, max_records=30, batch_size=7, compression=compression, fsync=False)
+    articles = [get_article(i) for i in range(100)]
+    for article in articles:
+        sink.write(article)
+    sink.close()
+
+    index_path = str(tmpdir.join('index.sqlite'))
+    with CorpusReader(data_folder_path, index_path=index_path) as reader:
+        assert reader.build() == 4
+        assert len(reader) == 100
+        for i in (0, 13, 57, 99):
+            assert reader.get(f'/news/{i}/') == articles[i]
+
+        batches = list(reader.iter_batches(batch_size=40))
+        assert [len(batch) for batch in batches] == [40, 40, 20]
+        assert sorted(record['url'] for batch in batches for record in batch) == \
+            sorted(article['url'] for article in articles)
+
+        expected = [
+            article['url'] for article in articles
+            if article['category'] == 'economics' and '2018-01-05' <= normalize_date(article['date']) <= '2018-01-10'
+        ]
+        assert sorted(reader.keys(date_from='2018-01-05', date_to='2018-01-10', category='economics')) == \
+            sorted(expected)
+        records = reader.iter_records(date_from='2018-01-05', date_to='2018-01-10', category='economics')
+        assert sorted(record['url'] for record in records) == sorted(expected)
+
+    # index is kept between runs
+    with CorpusReader(data_folder_path, index_path=index_path) as reader:
+        assert reader.build() == 0
+        assert json.dumps(reader.get('/news/42/')) == json.dumps(articles[42])
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from data_loader import AdaptiveConcurrency, LentaRuLoader, RetryPolicy
+from tests.conftest import StubServer
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+    assert [policy.get_delay(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+    assert policy.get_delay(0, retry_after='3') == 3
+    assert policy.get_delay(0, retry_after='Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert policy.get_delay(0, retry_after='100') == 5
+    assert 0 <= RetryPolicy(base_delay=1).get_delay(3) <= 8
+    assert policy.is_retryable_status(503) and not policy.is_retryable_status(404)
+
+
+def test_adaptive_concurrency_aimd():
+    concurrency = AdaptiveConcurrency(initial=4, max_limit=10, latency_tolerance=None)
+    for _ in range(100):
+        concurrency.on_success(0.1)
+    assert concurrency.limit == 10
+
+    concurrency.on_overload()
+    concurrency.on_overload()
+    assert concurrency.limit == 5
+
+    for _ in range(10):
+        concurrency.on_success(0.1)
+    limit = concurrency.limit
+    concurrency.on_overload()
+    assert concurrency.limit == limit / 2
+
+
+def test_adaptive_concurrency_sustained_overload():
+    concurrency = AdaptiveConcurrency(initial=64, min_limit=2)
+    for _ in range(1000):
+        concurrency.on_overload()
+    assert concurrency.limit == 2
+
+
+def test_adaptive_concurrency_holds_on_slow_responses():
+    concurrency = AdaptiveConcurrency(initial=2, latency_tolerance=2)
+    concurrency.on_success(0.1)
+    limit = concurrency.limit
+    concurrency.on_success(1.0)
+    assert concurrency.limit == limit
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_limits_in_flight():
+    concurrency = AdaptiveConcurrency(initial=2)
+    in_flight = []
+
+    async def request():
+        await concurrency.acquire()
+        in_flight.append(concurrency.in_flight)
+        await asyncio.sleep(0.01)
+        await concurrency.release()
+
+    await asyncio.gather(*[request() for _ in range(10)])
+    assert max(in_flight) == 2
+    assert concurrency.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_loader_retries_bad_statuses():
+    attempts = []
+
+    async def handler(request):
+        attempts.append(request.path)
+        if len(attempts) < 3:
+            return web.Response(status=503, headers={'Retry-After': '0'})
+        return web.Response(text='<html></html>', content_type='text/html')
+
+    async with StubServer(handler) as server:
+        lenta_ru = LentaRuLoader(year=2018, save=False, host=server.host, n_processes=1,
+                                 concurrency=AdaptiveConcurrency(initial=1))
+        lenta_ru._get_all_dates = lambda: [('02', '07', '2018')]
+        await lenta_ru.run_async()
+
+    assert attempts == ['/news/2018/07/02/'] * 3
+    assert '/news/2018/07/02/' in lenta_ru.url_cache
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import math
+import sqlite3
+
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, RevisitIndex
+from data_loader.revisit import DAY, get_hash
+from tests.conftest import StubServer
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+def test_revisit_index(tmpdir):
+    index = RevisitIndex(str(tmpdir.join('revisit', 'pages.sqlite')), fields=('answers',), prior_rate=1 / DAY)
+    assert get_hash({'answers': [1], 'title': 'a'}, ['answers']) == get_hash({'answers': [1]}, ['answers'])
+
+    assert index.update(1, {'answers': ['a'], 'title': 'a'}, now=0) is None
+    assert index.update(2, {'answers': ['a']}, now=0) is None
+    assert index.update(3, {'answers': ['a']}, now=0) is None
+    assert index.update(1, {'answers': ['a', 'b'], 'title': 'a'}, now=DAY) is True
+    assert index.update(2, {'answers': ['a'], 'title': 'b'}, now=DAY) is False
+    assert index.get(1)['rate'] == pytest.approx(2 / (2 * DAY))
+    assert index.get(2)['rate'] == pytest.approx(1 / (2 * DAY))
+    assert index.get(1)['visits'] == 2 and index.get(1)['changes'] == 1
+
+    assert index.probability(1, now=2 * DAY) == pytest.approx(1 - math.exp(-1))
+    assert index.probability(4) is None
+    assert index.select(10, now=2 * DAY) == [3, 1, 2]
+    assert index.select(1, now=2 * DAY) == [3]
+    assert index.select(10, now=2 * DAY, min_probability=0.5) == [3, 1]
+
+    index.remove(3)
+    assert 3 not in index and 1 in index and len(index) == 2
+    index.close()
+    index = RevisitIndex(str(tmpdir.join('revisit', 'pages.sqlite')))
+    assert len(index) == 2
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_loader_revisit(tmpdir):
+    requested = []
+    changed_ids = set()
+
+    async def handler(request):
+        external_id = int(request.path.split('/')[-1])
+        requested.append(external_id)
+        if external_id == 9 and len(requested) > 10:
+            return web.Response(status=404)
+        page = MAIL_RU_PAGE
+        if external_id in changed_ids:
+            page += '<div class="a--atext atext">New answer</div>'
+        return web.Response(text=page, content_type='text/html')
+
+    kwargs = dict(save=False, data_folder_path=str(tmpdir), queue_maxsize=10, n_processes=2,
+                  index_path=str(tmpdir.join('ids.sqlite')), revisit_path=str(tmpdir.join('revisit.sqlite')),
+                  log_file_path=str(tmpdir.join('mail_ru.log')), progress_interval=None)
+    with pytest.raises(ValueError):
+        AnswerMailRuLoader(ids=[], revisit_budget=10, **dict(kwargs, revisit_path=None))
+
+    async with StubServer(handler) as server:
+        sub_url = f'{server.host}/question/{{external_id}}'
+        mail_ru = AnswerMailRuLoader(ids=range(10), sub_url=sub_url, **kwargs)
+        await mail_ru.run_async()
+        assert sorted(requested) == list(range(10))
+
+        changed_ids.update(range(5))
+        mail_ru = AnswerMailRuLoader(ids=range(10), sub_url=sub_url, revisit_budget=20, **kwargs)
+        await mail_ru.run_async()
+        assert sorted(requested[10:]) == list(range(10))
+        assert mail_ru._pending == 0
+        labels = dict(loader='data_external_id')
+        assert mail_ru.metrics.get('loader_revisits_total', changed=True, **labels) == 5
+        assert mail_ru.metrics.get('loader_revisits_total', changed=False, **labels) == 4
+        # own index of loader is closed after run
+        with pytest.raises(sqlite3.ProgrammingError):
+            mail_ru.revisit.connection.execute('SELECT 1')
+
+        index = RevisitIndex(str(tmpdir.join('revisit.sqlite')))
+        assert len(index) == 9 and 9 not in index
+        assert [index.get(external_id)['changes'] for external_id in range(9)] == [1] * 5 + [0] * 4
+        index.close()
+
+        requested.clear()
+        mail_ru = AnswerMailRuLoader(ids=range(10), sub_url=sub_url, revisit_budget=3, **kwargs)
+        await mail_ru.run_async()
+        assert len(requested) == 3
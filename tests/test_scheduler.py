@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from data_loader import BankiRuLoader, ConcurrencyBudget, CrawlScheduler, LentaRuLoader
+from data_loader.scheduler import create_scheduler, get_years
+from tests.conftest import StubServer
+from tests.test_parsing import lenta_handler
+
+
+@pytest.mark.asyncio
+async def test_concurrency_budget_is_fair():
+    budget = ConcurrencyBudget(2)
+    await budget.acquire('a')
+    await budget.acquire('a')
+    waiting_a = [asyncio.ensure_future(budget.acquire('a')) for _ in range(3)]
+    waiting_b = asyncio.ensure_future(budget.acquire('b'))
+    await asyncio.sleep(0)
+
+    budget.release('a')
+    await asyncio.sleep(0)
+    assert waiting_b.done() and not any(future.done() for future in waiting_a)
+    assert budget.in_flight_by_name == {'a': 1, 'b': 1}
+
+    waiting_a[0].cancel()
+    await asyncio.sleep(0)
+    budget.release('b')
+    await asyncio.sleep(0)
+    assert waiting_a[1].done() and not waiting_a[2].done()
+    assert budget.in_flight == 2
+    waiting_a[2].cancel()
+
+
+@pytest.mark.asyncio
+async def test_crawl_scheduler(tmpdir):
+    in_flight = {'now': 0, 'max': 0}
+
+    async def handler(request):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.01)
+        in_flight['now'] -= 1
+        return await lenta_handler(request)
+
+    async with StubServer(handler) as server:
+        scheduler = CrawlScheduler(concurrency=3)
+        loaders = [
+            scheduler.add(LentaRuLoader, year=2018, save=False, host=server.host, n_processes=5,
+                          start_date='2018-07-02', end_date='2018-07-02', log_file_path=str(tmpdir.join(f'{i}.log')))
+            for i in range(2)
+        ]
+        await scheduler.run_async()
+
+    assert in_flight['max'] <= 3
+    assert scheduler.http_client.closed
+    for loader in loaders:
+        assert len(loader.articles) == 5
+        assert all(article['text'] for article in loader.articles)
+    for i in range(2):
+        assert scheduler.metrics.get('loader_responses_total', loader='lenta', year=2018, instance=f'{i}:lenta',
+                                     status=200) == 6
+
+
+def test_get_years():
+    assert get_years({'year': 2018}) == [(2018, None, None)]
+    assert get_years({'years': [2017, 2018]}) == [(2017, None, None), (2018, None, None)]
+    assert get_years({'from': '2017-06-01', 'to': '2019-02-01'}) == [
+        (2017, '2017-06-01', None), (2018, None, None), (2019, None, '2019-02-01')
+    ]
+
+
+def test_create_scheduler(tmpdir):
+    config = {
+        'concurrency': 10,
+        'per_host': {'lenta.ru': [5, 2]},
+        'loaders': [
+            {'loader': 'lenta', 'years': [2017, 2018], 'data_folder_path': str(tmpdir.join('lenta', '{year}')),
+             'n_processes': 3},
+            {'loader': 'data_loader.banki_ru:BankiRuLoader', 'from': '2018-12-01', 'to': '2019-01-31',
+             'data_folder_path': str(tmpdir.join('banki', '{year}'))},
+        ],
+    }
+    scheduler = create_scheduler(config)
+
+    assert [(type(loader), loader.year) for loader in scheduler.loaders] == [
+        (LentaRuLoader, 2017), (LentaRuLoader, 2018), (BankiRuLoader, 2018), (BankiRuLoader, 2019)
+    ]
+    assert scheduler.loaders[1].data_path == str(tmpdir.join('lenta', '2018'))
+    assert tmpdir.join('banki', '2019').exists()
+    assert scheduler.rate_limiter.get_bucket('lenta.ru').rate == 5
+    assert [date[:2] for date in scheduler.loaders[2]._get_all_dates()][0] == ['01', '12']
+    assert len(scheduler.loaders[3]._get_all_dates()) == 31
+    assert all(loader.rate_limiter is scheduler.rate_limiter for loader in scheduler.loaders)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from data_loader import BloomFilter, IdBitmap, LentaRuLoader
+
+
+def test_id_bitmap(tmpdir):
+    bitmap = IdBitmap(chunk_bits=1024)
+    bitmap.update([0, 7, 1023, 1024, 10 ** 6, 7])
+    assert len(bitmap) == 5
+    assert 7 in bitmap and 10 ** 6 in bitmap
+    assert 8 not in bitmap and -1 not in bitmap and 'abc' not in bitmap
+    assert sorted(bitmap.chunks) == [0, 1, 976]
+    assert list(bitmap) == [0, 7, 1023, 1024, 10 ** 6]
+
+    path = str(tmpdir.join('ids.bitmap'))
+    bitmap.save(path)
+    loaded = IdBitmap.load(path)
+    assert len(loaded) == 5
+    assert list(loaded) == list(bitmap)
+
+
+def test_bloom_filter(tmpdir):
+    urls = [f'/news/2018/07/02/{i}/' for i in range(1000)]
+    bloom_filter = BloomFilter(capacity=1000, error_rate=1e-4)
+    bloom_filter.update(urls)
+    assert all(url in bloom_filter for url in urls)
+    assert sum(f'/news/2019/{i}/' in bloom_filter for i in range(10000)) <= 10
+    assert len(bloom_filter.bits) * 8 < 1000 * 20
+
+    path = str(tmpdir.join('urls.bloom'))
+    bloom_filter.save(path)
+    loaded = BloomFilter.load(path)
+    assert all(url in loaded for url in urls)
+    assert (loaded.n_bits, loaded.n_hashes, len(loaded)) == (bloom_filter.n_bits, bloom_filter.n_hashes, 1000)
+
+
+def test_loader_loads_url_cache(tmpdir):
+    path = str(tmpdir.join('urls.bloom'))
+    bloom_filter = BloomFilter()
+    bloom_filter.add('/news/2018/07/02/')
+    bloom_filter.save(path)
+
+    lenta_ru = LentaRuLoader(year=2018, save=False, seen_path=path)
+    assert '/news/2018/07/02/' in lenta_ru.url_cache
+    assert '/news/2018/07/03/' not in lenta_ru.url_cache
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, CompletionIndex, ShardedRunner
+from data_loader.sharding import get_shard_path, split_ids
+from tests.conftest import StubServer
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+async def mail_ru_handler(request):
+    external_id = int(request.path.rsplit('/', 1)[-1])
+    if external_id % 5 == 0:
+        return web.Response(status=404)
+    return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+
+def test_split_ids():
+    shards = split_ids(range(10), 3)
+    assert shards == [range(0, 10, 3), range(1, 10, 3), range(2, 10, 3)]
+    assert sorted(i for shard in split_ids(iter(range(10)), 4) for i in shard) == list(range(10))
+    assert get_shard_path('index.sqlite', 1, 4) == 'index.sqlite.shard-1-of-4'
+    assert get_shard_path(None, 1, 4) is None
+
+
+@pytest.mark.asyncio
+async def test_sharded_runner(tmpdir):
+    index_path = str(tmpdir.join('index.sqlite'))
+    async with StubServer(mail_ru_handler) as server:
+        runner = ShardedRunner(
+            AnswerMailRuLoader, ids=range(40), n_workers=2, rate_limit=1000, index_path=index_path,
+            log_file_path=str(tmpdir.join('mail.log')), report_interval=0.1, progress_interval=None,
+            save=True, data_folder_path=str(tmpdir.join('data')), queue_maxsize=10, n_processes=4,
+            sub_url=f'{server.host}/question/{{external_id}}', fast_parse=True,
+        )
+        assert runner.get_loader_kwargs(1)['rate_limit'] == 500
+        total = await runner.run_async()
+
+    assert total['items'] == {'done': 32, 'failed': 8}
+    assert total['responses'] == {'200': 32, '404': 8}
+    assert runner.finished == {0, 1} and not runner.errors
+    assert len(tmpdir.join('data').listdir()) == 1
+
+    index = CompletionIndex(index_path)
+    assert list(index.iter_ids((CompletionIndex.DONE,))) == [i for i in range(40) if i % 5]
+    assert list(index.iter_ids((CompletionIndex.NOT_FOUND,))) == list(range(0, 40, 5))
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_sharded_runner_reports_errors(tmpdir):
+    runner = ShardedRunner(AnswerMailRuLoader, ids=range(4), n_workers=2, progress_interval=None, save=False,
+                           data_folder_path=str(tmpdir), queue_maxsize=1, n_processes=1, unknown_param=True)
+    with pytest.raises(RuntimeError, match='unknown_param'):
+        await runner.run_async()
+    assert set(runner.errors) == {0, 1}
+
+
+@pytest.mark.asyncio
+async def test_sharded_runner_resumes_with_other_count_of_workers(tmpdir):
+    requested = []
+
+    async def handler(request):
+        requested.append(request.path)
+        return await mail_ru_handler(request)
+
+    index_path = str(tmpdir.join('index.sqlite'))
+    kwargs = dict(rate_limit=1000, index_path=index_path, log_file_path=str(tmpdir.join('mail.log')),
+                  report_interval=0.1, progress_interval=None, save=False, data_folder_path=str(tmpdir.join('data')),
+                  queue_maxsize=10, n_processes=4)
+    async with StubServer(handler) as server:
+        kwargs['sub_url'] = f'{server.host}/question/{{external_id}}'
+        await ShardedRunner(AnswerMailRuLoader, ids=range(20), n_workers=2, **kwargs).run_async()
+        assert len(requested) == 20
+
+        requested.clear()
+        total = await ShardedRunner(AnswerMailRuLoader, ids=range(30), n_workers=3, **kwargs).run_async()
+
+    assert sorted(requested) == [f'/question/{i}' for i in range(20, 30)]
+    assert total['items'] == {'done': 8, 'failed': 2, 'skipped': 20}
+    index = CompletionIndex(index_path)
+    assert list(index.iter_ids()) == list(range(30))
+    index.close()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import json
+from glob import glob
+from os.path import exists, join
+
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, JsonFileSink, JsonLinesSink
+from data_loader.sinks import iter_records, PART
+from tests.conftest import StubServer
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+def read_all(folder):
+    return [record for path in sorted(glob(join(folder, '*.jsonl*'))) for record in iter_records(path)]
+
+
+def test_json_file_sink_creates_sub_folders(tmpdir):
+    sink = JsonFileSink(str(tmpdir))
+    sink.write({'id': '1001', 'title': 'тест'}, join('0', '1', '1001.json'))
+    sink.close()
+    with open(join(str(tmpdir), '0', '1', '1001.json')) as file:
+        assert json.load(file) == {'id': '1001', 'title': 'тест'}
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'zstd'])
+def test_json_lines_sink_rotates_shards(tmpdir, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    sink = JsonLinesSink(str(tmpdir), max_records=10, batch_size=4, compression=compression)
+    for i in range(25):
+        sink.write({'url': f'/news/{i}/', 'text': 'текст'})
+    sink.close()
+
+    assert len(sink.shards) == 3
+    assert not glob(join(str(tmpdir), f'*{PART}'))
+    assert [record['url'] for record in read_all(str(tmpdir))] == [f'/news/{i}/' for i in range(25)]
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_json_lines_sink_recovers_killed_shard(tmpdir, compression):
+    sink = JsonLinesSink(str(tmpdir), batch_size=5, compression=compression)
+    for i in range(10):
+        sink.write({'id': i})
+    sink.close()
+    shard, = sink.shards
+
+    # emulate killed run: shard is not renamed and the last batch is written partly
+    with open(shard, 'rb') as file:
+        data = file.read()
+    with open(f'{shard}{PART}', 'wb') as file:
+        file.write(data[:-7])
+
+    JsonLinesSink(str(tmpdir), compression=compression).close()
+
+    assert not glob(join(str(tmpdir), f'*{PART}'))
+    assert [record['id'] for record in iter_records(shard)] == list(range(5 if compression else 9))
+
+
+def test_json_lines_sink_keeps_shards_of_live_writers(tmpdir):
+    live = JsonLinesSink(str(tmpdir), prefix='data')
+    shard = join(str(tmpdir), f'data-{live.run_id}-00000.jsonl{PART}')
+    with open(shard, 'w') as file:
+        file.write('{"id": 1}\n{"id"')
+
+    JsonLinesSink(str(tmpdir), prefix='data').close()
+    assert exists(shard)
+    live.close()
+    JsonLinesSink(str(tmpdir), prefix='data').close()
+    assert not exists(shard) and [record['id'] for record in iter_records(shard[:-len(PART)])] == [1]
+    assert not glob(join(str(tmpdir), '*.lock'))
+
+
+@pytest.mark.asyncio
+async def test_mail_ru_loader_with_json_lines_sink(tmpdir):
+    async def handler(request):
+        if int(request.match_info['tail'].split('/')[-1]) % 2:
+            return web.Response(status=404)
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+    sink = JsonLinesSink(str(tmpdir.join('shards')), compression='gzip')
+    async with StubServer(handler) as server:
+        mail_ru = AnswerMailRuLoader(ids=range(10), save=True, data_folder_path=str(tmpdir), queue_maxsize=5,
+                                     n_processes=3, sub_url=f'{server.host}/question/{{external_id}}', sink=sink,
+                                     log_file_path=str(tmpdir.join('mail_ru.log')))
+        await mail_ru.run_async()
+    sink.close()
+
+    assert sorted(int(record['id']) for record in read_all(str(tmpdir.join('shards')))) == [0, 2, 4, 6, 8]
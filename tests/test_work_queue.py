@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from collections import Counter
+
+import pytest
+from aiohttp import web
+
+from data_loader import AnswerMailRuLoader, LentaRuLoader, MemoryWorkQueue, RetryPolicy, SqliteWorkQueue
+from tests.conftest import StubServer
+from tests.test_checkpoint import Site
+from tests.test_parsing import MAIL_RU_PAGE
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def work_queue(request, tmpdir):
+    if request.param == 'memory':
+        work_queue = MemoryWorkQueue(max_attempts=2)
+    else:
+        work_queue = SqliteWorkQueue(str(tmpdir.join('queue', 'work.sqlite')), max_attempts=2)
+    yield work_queue
+    work_queue.close()
+
+
+def test_work_queue(work_queue):
+    assert work_queue.put('ids', [(str(i), [i]) for i in range(5)]) == 5
+    assert work_queue.put('ids', [('0', [0]), ('5', [5])]) == 1
+    assert work_queue.is_finished('other')
+
+    assert work_queue.lease('ids', 'a', 2, lease_seconds=10, now=0) == [('0', [0]), ('1', [1])]
+    assert work_queue.lease('ids', 'b', 3, lease_seconds=10, now=0) == [('2', [2]), ('3', [3]), ('4', [4])]
+    work_queue.ack('ids', '0')
+    assert work_queue.heartbeat('a', lease_seconds=10, now=5) == 1
+    assert work_queue.counts('ids') == {'pending': 1, 'leased': 4, 'done': 1, 'failed': 0}
+
+    # leases of "b" are expired, lease of "a" is extended
+    assert sorted(work_queue.lease('ids', 'c', 10, lease_seconds=10, now=12)) == [('2', [2]), ('3', [3]), ('4', [4]),
+                                                                                  ('5', [5])]
+    work_queue.release('c')
+    assert work_queue.counts('ids') == {'pending': 4, 'leased': 1, 'done': 1, 'failed': 0}
+
+    assert len(work_queue.lease('ids', 'd', 10, lease_seconds=10, now=20)) == 5
+    assert work_queue.lease('ids', 'e', 10, lease_seconds=10, now=40) == [('5', [5])]
+    assert work_queue.counts('ids') == {'pending': 0, 'leased': 1, 'done': 1, 'failed': 4}
+    work_queue.ack('ids', '5')
+    assert work_queue.is_finished('ids')
+
+
+def test_work_queue_nack(work_queue):
+    work_queue.put('ids', [('0', [0])])
+    assert work_queue.lease('ids', 'a', 10, now=0) == [('0', [0])]
+    work_queue.nack('ids', '0')
+    assert work_queue.counts('ids') == {'pending': 1, 'leased': 0, 'done': 0, 'failed': 0}
+    assert work_queue.lease('ids', 'b', 10, now=0) == [('0', [0])]
+    work_queue.nack('ids', '0')
+    assert work_queue.counts('ids') == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+    assert work_queue.lease('ids', 'c', 10, now=0) == []
+
+
+def test_work_queue_put_reset(work_queue):
+    work_queue.put('ids', [(str(i), [i]) for i in range(3)])
+    for key, _ in work_queue.lease('ids', 'a', 2, now=0):
+        work_queue.ack('ids', key)
+    assert work_queue.put('ids', [('0', [0]), ('1', [1]), ('2', [2])]) == 0
+    assert work_queue.put('ids', [('0', [10]), ('2', [2]), ('3', [3])], reset=True) == 2
+    assert work_queue.counts('ids') == {'pending': 3, 'leased': 0, 'done': 1, 'failed': 0}
+    assert sorted(work_queue.lease('ids', 'b', 10, now=0)) == [('0', [10]), ('2', [2]), ('3', [3])]
+
+
+def test_sqlite_work_queue_workers(tmpdir):
+    path = str(tmpdir.join('work.sqlite'))
+    first, second = SqliteWorkQueue(path), SqliteWorkQueue(path)
+    first.put('ids', [(str(i), [i]) for i in range(10)])
+    leased = first.lease('ids', 'a', 4) + second.lease('ids', 'b', 4) + first.lease('ids', 'a', 4)
+    assert sorted(key for key, _ in leased) == sorted(str(i) for i in range(10))
+    first.close()
+    second.close()
+
+
+@pytest.mark.asyncio
+async def test_loader_workers(tmpdir):
+    requested = Counter()
+
+    async def handler(request):
+        external_id = int(request.path.split('/')[-1])
+        requested[external_id] += 1
+        await asyncio.sleep(0.001)
+        if external_id % 10 == 0:
+            return web.Response(status=404)
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+    work_queue_path = str(tmpdir.join('work.sqlite'))
+    dead = SqliteWorkQueue(work_queue_path)
+    dead.put('data_external_id:load', [(str(i), [i]) for i in range(10)])
+    dead.lease('data_external_id:load', 'dead', 10, lease_seconds=0.5)
+    dead.close()
+
+    async with StubServer(handler) as server:
+        workers = [
+            AnswerMailRuLoader(ids=range(100), sub_url=f'{server.host}/question/{{external_id}}', save=False,
+                               data_folder_path=str(tmpdir), queue_maxsize=10, n_processes=2,
+                               work_queue_path=work_queue_path, worker_id=f'worker-{i}', lease_size=5,
+                               poll_interval=0.1, log_file_path=str(tmpdir.join(f'mail_ru-{i}.log')),
+                               progress_interval=None)
+            for i in range(3)
+        ]
+        await asyncio.gather(*[worker.run_async() for worker in workers])
+
+    assert requested == Counter(range(100))
+    assert sum(worker.loading_progress for worker in workers) == 100
+    assert all(worker.loading_progress for worker in workers)
+    assert all(worker._pending == 0 for worker in workers)
+    work_queue = SqliteWorkQueue(work_queue_path)
+    assert work_queue.counts('data_external_id:load') == {'pending': 0, 'leased': 0, 'done': 100, 'failed': 0}
+    work_queue.close()
+
+    with pytest.raises(ValueError):
+        AnswerMailRuLoader(ids=range(100), save=False, data_folder_path=str(tmpdir), queue_maxsize=10, n_processes=2,
+                           work_queue=MemoryWorkQueue(), probe_block_size=10,
+                           log_file_path=str(tmpdir.join('mail_ru.log')))
+
+
+@pytest.mark.asyncio
+async def test_loader_nacks_failed_tasks(tmpdir):
+    requested = Counter()
+
+    async def handler(request):
+        external_id = int(request.path.split('/')[-1])
+        requested[external_id] += 1
+        if external_id == 1 or external_id == 2 and requested[2] == 1:
+            return web.Response(status=500)
+        if external_id == 3:
+            return web.Response(status=404)
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+    work_queue = MemoryWorkQueue(max_attempts=3)
+    kwargs = dict(save=False, data_folder_path=str(tmpdir), queue_maxsize=10, n_processes=1,
+                  work_queue=work_queue, retry_policy=RetryPolicy(max_retries=0), poll_interval=0.1,
+                  log_file_path=str(tmpdir.join('mail_ru.log')), progress_interval=None)
+    async with StubServer(handler) as server:
+        mail_ru = AnswerMailRuLoader(ids=range(4), sub_url=f'{server.host}/question/{{external_id}}', **kwargs)
+        await mail_ru.run_async()
+
+    # tasks of status 500 are leased again, 2 is loaded at the second attempt, 1 is failed after 3 attempts
+    assert requested == {0: 1, 1: 3, 2: 2, 3: 1}
+    assert work_queue.counts('data_external_id:load') == {'pending': 0, 'leased': 0, 'done': 3, 'failed': 1}
+    assert mail_ru.metrics.get('loader_work_tasks_total', loader='data_external_id', result='nacked') == 4
+
+
+@pytest.mark.asyncio
+async def test_loader_revisit_with_work_queue(tmpdir):
+    requested = []
+
+    async def handler(request):
+        requested.append(int(request.path.split('/')[-1]))
+        return web.Response(text=MAIL_RU_PAGE, content_type='text/html')
+
+    kwargs = dict(ids=range(5), save=False, data_folder_path=str(tmpdir), queue_maxsize=10, n_processes=2,
+                  index_path=str(tmpdir.join('ids.sqlite')), revisit_path=str(tmpdir.join('revisit.sqlite')),
+                  work_queue_path=str(tmpdir.join('work.sqlite')), poll_interval=0.1,
+                  log_file_path=str(tmpdir.join('mail_ru.log')), progress_interval=None)
+    async with StubServer(handler) as server:
+        for revisit_budget in (None, 10, 10):
+            mail_ru = AnswerMailRuLoader(sub_url=f'{server.host}/question/{{external_id}}',
+                                         revisit_budget=revisit_budget, **kwargs)
+            await mail_ru.run_async()
+            assert sorted(requested) == list(range(5))
+            requested.clear()
+
+
+@pytest.mark.asyncio
+async def test_article_loader_workers(tmpdir):
+    site = Site()
+    work_queue = MemoryWorkQueue()
+    async with StubServer(site.handler) as server:
+        workers = [
+            LentaRuLoader(year=2018, save=False, host=server.host, n_processes=2, start_date='2018-07-01',
+                          end_date='2018-07-05', work_queue=work_queue, worker_id=f'worker-{i}', lease_size=1,
+                          poll_interval=0.01, log_file_path=str(tmpdir.join(f'lenta-{i}.log')), progress_interval=None)
+            for i in range(2)
+        ]
+        await asyncio.gather(*[worker.run_async() for worker in workers])
+
+    assert len(site.requested) == len(set(site.requested)) == 5 + 10
+    assert work_queue.counts('lenta:2018:prepare')['done'] == 5
+    assert work_queue.counts('lenta:2018:load')['done'] == 10
+    assert all(worker.loading_progress for worker in workers)
+
+
+@pytest.mark.asyncio
+async def test_article_loader_refetches_recent_days_with_work_queue(tmpdir):
+    site = Site()
+    kwargs = dict(year=2018, save=False, n_processes=2, start_date='2018-07-01', end_date='2018-07-05',
+                  checkpoint_path=str(tmpdir.join('checkpoint.sqlite')), recent_days=1,
+                  work_queue_path=str(tmpdir.join('work.sqlite')), poll_interval=0.01,
+                  log_file_path=str(tmpdir.join('lenta.log')), progress_interval=None)
+    async with StubServer(site.handler) as server:
+        await LentaRuLoader(host=server.host, **kwargs).run_async()
+        site.requested = []
+        await LentaRuLoader(host=server.host, **kwargs).run_async()
+
+    assert sorted(site.requested) == ['/news/2018/07/03/b/', '/news/2018/07/04/', '/news/2018/07/05/']